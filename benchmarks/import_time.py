@@ -0,0 +1,79 @@
+"""
+Measure how long ``import mobilemoney`` takes in a fresh interpreter
+
+Every run starts a new process so nothing is cached in ``sys.modules``. The
+script fails when the median is above ``--max-ms`` or when a module that must
+stay out of the import path (``requests``, ``aiohttp``...) gets loaded.
+
+    python benchmarks/import_time.py --runs 20 --max-ms 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORBIDDEN = ('requests', 'urllib3', 'aiohttp', 'mobilemoney.request.collection', 'mobilemoney.request.disbursements')
+
+PROBE = '''
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "modules": sorted(sys.modules)}}))
+'''
+
+
+def measure(module: str, runs: int) -> Dict[str, object]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get('PYTHONPATH')))))
+    timings: List[float] = []
+    modules: Sequence[str] = ()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', PROBE.format(module=module)],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(out)
+        timings.append(result['ms'])
+        modules = result['modules']
+
+    return {
+        'module': module,
+        'runs': runs,
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'max_ms': max(timings),
+        'forbidden': [name for name in FORBIDDEN if name in modules],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='mobilemoney')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None, help='fail when the median is above this')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    args = parser.parse_args()
+
+    result = measure(args.module, args.runs)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print('import {module}: median {median_ms:.1f} ms, min {min_ms:.1f} ms, max {max_ms:.1f} ms over {runs} runs'.format(**result))
+        if result['forbidden']:
+            print('loaded at import time: ' + ', '.join(result['forbidden']))
+
+    if result['forbidden']:
+        return 1
+    if args.max_ms is not None and result['median_ms'] > args.max_ms:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
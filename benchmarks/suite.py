@@ -0,0 +1,271 @@
+"""
+Benchmark every Collection and Disbursements call against the mock server
+
+The mock runs in a background thread with its own event loop, the client runs
+on the main thread. For each operation and concurrency level the suite
+reports requests per second, p50/p95/p99 latency, client CPU time per call
+(time.thread_time of the main thread) and memory allocated per call.
+
+Allocations are measured with tracemalloc in a separate sequential pass, as
+the peak reached during a call minus the peak of a bare aiohttp request to
+the same mock: the asyncio socket read buffer and the in-process mock weigh
+the same on both sides, what remains is the cost of the library.
+
+    python benchmarks/suite.py --concurrency 1 10 50 --calls 500 --output results.json
+    python benchmarks/suite.py --compare results-0.1.2.json --output results.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp  # noqa: E402
+
+import mobilemoney  # noqa: E402
+from mobilemoney.mock import MockServer  # noqa: E402
+from mobilemoney.request.collection import Collection  # noqa: E402
+from mobilemoney.request.disbursements import Disbursements  # noqa: E402
+from mobilemoney.utils.utils import get_reference_id, json_codec  # noqa: E402
+
+TARGET = 'sandbox'
+MSISDN = '46733123455'
+
+Call = Callable[[Any], Awaitable[Any]]
+
+
+def payment_body(party: str) -> Dict[str, Any]:
+    return {
+        'amount': '10',
+        'currency': 'EUR',
+        'externalId': '1',
+        party: {'partyIdType': 'MSISDN', 'partyId': MSISDN},
+        'payerMessage': 'benchmark',
+        'payeeNote': 'benchmark'
+    }
+
+
+class Fixture:
+    """Clients and reference ids shared by the operations"""
+
+    def __init__(self, client: mobilemoney.Client, apiuser: str, apikey: str) -> None:
+        self.client = client
+        self.basic = client.basic_token(apiuser, apikey)
+        self.collection: Collection = client.collection('benchmark', apiuser, apikey)
+        self.disbursements: Disbursements = client.disbursements('benchmark', apiuser, apikey)
+        self.references: Dict[str, Iterator[str]] = {}
+
+    async def prepare(self, kind: str, send: Callable[[str], Awaitable[Any]], count: int = 50) -> None:
+        """Create transactions whose status the status operations read"""
+        references = [get_reference_id() for _ in range(count)]
+        for reference_id in references:
+            await send(reference_id)
+        self.references[kind] = itertools.cycle(references)
+
+    def reference(self, kind: str) -> str:
+        return next(self.references[kind])
+
+
+def operations(f: Fixture) -> Dict[str, Call]:
+    c, d = f.collection, f.disbursements
+    refund = payment_body('payee')
+    return {
+        'collection.create_access_token': lambda _: c.create_access_token(f.basic),
+        'collection.get_account_balance': lambda _: c.get_account_balance(None, TARGET),
+        'collection.get_account_balance_in': lambda _: c.get_account_balance_in('EUR', None, TARGET),
+        'collection.get_basic_user_info': lambda _: c.get_basic_user_info(MSISDN, None, TARGET),
+        'collection.ask_user_info': lambda _: c.ask_user_info(None, TARGET),
+        'collection.isActive': lambda _: c.isActive(MSISDN, 'msisdn', None, TARGET),
+        'collection.request_to_pay': lambda _: c.request_to_pay(None, get_reference_id(), TARGET, payment_body('payer')),
+        'collection.get_request_to_pay_status': lambda _: c.get_request_to_pay_status(None, f.reference('request_to_pay'), TARGET),
+        'collection.withdraw': lambda _: c.withdraw(None, get_reference_id(), TARGET, payment_body('payer')),
+        'collection.get_withdraw_status': lambda _: c.get_withdraw_status(None, f.reference('withdraw'), TARGET),
+        'disbursements.create_access_token': lambda _: d.create_access_token(f.basic),
+        'disbursements.get_account_balance': lambda _: d.get_account_balance(None, TARGET),
+        'disbursements.get_account_balance_in': lambda _: d.get_account_balance_in('EUR', None, TARGET),
+        'disbursements.get_basic_user_info': lambda _: d.get_basic_user_info(MSISDN, None, TARGET),
+        'disbursements.ask_user_info': lambda _: d.ask_user_info(None, TARGET),
+        'disbursements.isActive': lambda _: d.isActive(MSISDN, None, 'msisdn', TARGET),
+        'disbursements.transfer': lambda _: d.transfer(get_reference_id(), None, TARGET, payment_body('payee')),
+        'disbursements.get_transfer_status': lambda _: d.get_transfer_status(f.reference('transfer'), None, TARGET),
+        'disbursements.deposit': lambda _: d.deposit(get_reference_id(), None, TARGET, payment_body('payee')),
+        'disbursements.get_deposit_status': lambda _: d.get_deposit_status(f.reference('deposit'), None, TARGET),
+        'disbursements.refund': lambda _: d.refund(get_reference_id(), None, TARGET, dict(refund, referenceIdToRefund=f.reference('transfer'))),
+        'disbursements.get_refund_status': lambda _: d.get_refund_status(f.reference('refund'), None, TARGET),
+    }
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(p * len(values)) - 1))]
+
+
+async def run_level(call: Call, calls: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker() -> None:
+        nonlocal errors
+        while next(counter) < calls:
+            start = time.perf_counter()
+            try:
+                await call(None)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    cpu = time.thread_time()
+    wall = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - wall
+    cpu = time.thread_time() - cpu
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'calls': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'cpu_us_per_call': round(cpu / len(latencies) * 1e6, 1) if latencies else 0.0,
+    }
+
+
+async def allocations(call: Call, calls: int) -> float:
+    """KiB allocated at peak per call, calls run one after the other"""
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(calls):
+            current, _ = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            try:
+                await call(None)
+            except Exception:
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            total += max(0, peak - current)
+    finally:
+        tracemalloc.stop()
+    return round(total / calls / 1024, 2)
+
+
+def start_mock(**options: Any) -> MockServer:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='mock', daemon=True).start()
+    server = MockServer(**options)
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    return server
+
+
+async def bench(args: argparse.Namespace, server: MockServer) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    async with mobilemoney.Client(base_url=server.url, limit=max(args.concurrency) * 2) as client:
+        client.is_sandbox()
+        apiuser = get_reference_id()
+        await client.create_api_user(apiuser, 'benchmark')
+        _, data = await client.create_api_key(apiuser, 'benchmark')
+        fixture = Fixture(client, apiuser, data['apiKey'])
+
+        c, d = fixture.collection, fixture.disbursements
+        await fixture.prepare('request_to_pay', lambda r: c.request_to_pay(None, r, TARGET, payment_body('payer')))
+        await fixture.prepare('withdraw', lambda r: c.withdraw(None, r, TARGET, payment_body('payer')))
+        await fixture.prepare('transfer', lambda r: d.transfer(r, None, TARGET, payment_body('payee')))
+        await fixture.prepare('deposit', lambda r: d.deposit(r, None, TARGET, payment_body('payee')))
+        await fixture.prepare('refund', lambda r: d.refund(r, None, TARGET, dict(payment_body('payee'), referenceIdToRefund=fixture.reference('transfer'))))
+
+        async with aiohttp.ClientSession() as session:
+            url = server.url + '/collection/v1_0/account/balance'
+            headers = {'Ocp-Apim-Subscription-Key': 'benchmark', 'Authorization': 'Bearer benchmark', 'X-Target-Environment': TARGET}
+
+            async def bare(_: Any) -> Any:
+                async with session.get(url, headers=headers) as response:
+                    return await response.json()
+
+            await run_level(bare, 20, 5)
+            baseline = await allocations(bare, min(args.calls, 100))
+
+        for name, call in operations(fixture).items():
+            if args.operations and not any(pattern in name for pattern in args.operations):
+                continue
+            # warm up the pool, the token and the caches of the code paths
+            await run_level(call, min(20, args.calls), 5)
+            alloc = round(await allocations(call, min(args.calls, 100)) - baseline, 2)
+            for concurrency in args.concurrency:
+                result = await run_level(call, args.calls, concurrency)
+                result['operation'] = name
+                result['alloc_kib_per_call'] = alloc
+                results.append(result)
+                print('{operation:40} c={concurrency:<4} {rps:>9.1f} req/s  p50 {p50_ms:7.2f} ms  p95 {p95_ms:7.2f} ms  '
+                    'p99 {p99_ms:7.2f} ms  cpu {cpu_us_per_call:7.1f} us  alloc {alloc_kib_per_call:6.2f} KiB  errors {errors}'.format(**result))
+
+    return {
+        'meta': {
+            'version': mobilemoney.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'aiohttp': aiohttp.__version__,
+            'json_codec': json_codec(),
+            'calls': args.calls,
+            'latency_ms': args.latency * 1000,
+            'bare_aiohttp_alloc_kib': baseline,
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print the change of throughput and p99 against a previous run"""
+    old = {(r['operation'], r['concurrency']): r for r in previous['results']}
+    print(f"\ncompared with {previous['meta']['version']} ({previous['meta']['date']})")
+    for result in current['results']:
+        before = old.get((result['operation'], result['concurrency']))
+        if before is None or not before['rps'] or not before['p99_ms']:
+            continue
+        rps = (result['rps'] / before['rps'] - 1) * 100
+        p99 = (result['p99_ms'] / before['p99_ms'] - 1) * 100
+        print(f"{result['operation']:40} c={result['concurrency']:<4} rps {rps:+6.1f}%  p99 {p99:+6.1f}%")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--calls', type=int, default=500, help='calls per operation and concurrency level')
+    parser.add_argument('--latency', type=float, default=0.0, help='constant mock latency in seconds')
+    parser.add_argument('--operations', nargs='*', help='only run operations containing one of these strings')
+    parser.add_argument('--output', help='JSON file the results are written to')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    args = parser.parse_args()
+
+    latency = (lambda: args.latency) if args.latency else None
+    server = start_mock(latency=latency)
+    report = asyncio.run(bench(args, server))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,6 +12,35 @@ __license__ = 'MIT'
 __copyright__ = 'Copyright 2022 rewriteapi'
 __version__ = '0.1.2'
 
-from .client import Client
+from typing import Any, List, TYPE_CHECKING
+
 from .errors.errors import *
 
+if TYPE_CHECKING:
+    from .client import Client
+    from .sync import SyncClient
+    from .registry import ClientRegistry
+
+#the client pulls in aiohttp, it is only imported when first used so
+#``import mobilemoney`` stays cheap for short lived processes
+_LAZY = {
+    'Client': '.client',
+    'SyncClient': '.sync',
+    'ClientRegistry': '.registry',
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    from importlib import import_module
+
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + list(_LAZY))
+
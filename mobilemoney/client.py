@@ -21,44 +21,74 @@ DEALINGS IN THE SOFTWARE.
 import asyncio
 import datetime
 import logging
-from typing import Any, Optional, Dict, Tuple
-import aiohttp
+from typing import Any, Optional, Dict, Tuple, TYPE_CHECKING
 
 
 from .request.request import Request
 from .utils.utils import get_reference_id, b64_encode
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
 class Client:
     """
     client agent
+
+    The client keeps a pool of connections open between requests, use it as an
+    async context manager or call :meth:`close` when you are done with it.
+
+    Arguments:
+        connector [optional]: aiohttp.BaseConnector
+        limit [optional]: integer, total number of pooled connections
+        limit_per_host [optional]: integer, pooled connections per host
+        keepalive_timeout [optional]: float, seconds an idle connection is kept open
+        ttl_dns_cache [optional]: integer, seconds DNS lookups are cached
+        base_url [optional]: string or dictionary per environment, e.g. the url of a MockServer
     """
 
-    def __init__(self) -> None:
-        self.request = Request()
+    def __init__(self, connector: Optional['aiohttp.BaseConnector'] = None, **options: Any) -> None:
+        self.request = Request(connector=connector, **options)
         self.http = self.request.http()
 
-    def collection(self, subscription_key: str) -> Any:
+    async def __aenter__(self) -> 'Client':
+        await self.http.login()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Method to close the pooled connections of the client"""
+        await self.http.close()
+
+    def collection(self, subscription_key: str, apiuser: Optional[str] = None, apikey: Optional[str] = None) -> Any:
         """
         Method to get the collection client
 
         Arguments:
             subscription_key: string
+            apiuser [optional]: string, with apikey the client manages its own access token
+            apikey [optional]: string
         
         Returns:
             Collection client : Collection
         """
-        return self.request.collection(subscription_key, self.http)
+        return self.request.collection(subscription_key, self.http, apiuser, apikey)
 
-    def disbursements(self, subscription_key: str)-> Any:
+    def disbursements(self, subscription_key: str, apiuser: Optional[str] = None, apikey: Optional[str] = None)-> Any:
         """
         Method to get the Disbursements client
 
         Arguments:
             subscription_key: string
+            apiuser [optional]: string, with apikey the client manages its own access token
+            apikey [optional]: string
         
         Returns:
             Disbursements client : Disbursements
         """
-        return self.request.disbursements(subscription_key, self.http)
+        return self.request.disbursements(subscription_key, self.http, apiuser, apikey)
 
     async def create_api_user(self, uuid: str, subscription_key: str, url_callback : Optional[str] = None)->bool:
         """
@@ -21,15 +21,20 @@ DEALINGS IN THE SOFTWARE.
 from __future__ import annotations
 from typing import Optional, Any, Dict, TYPE_CHECKING, Union, List, Tuple
 
+if TYPE_CHECKING:
+    from aiohttp import ClientResponse
+    from requests import Response
+    from ..request.response import MomoResponse
 
-from aiohttp import ClientResponse, ClientWebSocketResponse
-from requests import Response
-
-_ResponseType = Union[ClientResponse, Response]
+    _ResponseType = Union[MomoResponse, ClientResponse, Response]
 
 __all__ = (
     'MomoException',
     'HTTPException',
+    'MomoConnectionError',
+    'CircuitOpen',
+    'DuplicatePayment',
+    'InvalidPayment',
     'Unauthorized',
     'MomoServerError',
     'InvalidData',
@@ -67,10 +72,10 @@ class HTTPException(MomoException):
     """Exception that's raised when an HTTP request operation fails.
     Attributes
     ------------
-    response: :class:`aiohttp.ClientResponse`
-        The response of the failed HTTP request. This is an
-        instance of :class:`aiohttp.ClientResponse`. In some cases
-        this could also be a :class:`requests.Response`.
+    response: :class:`MomoResponse`
+        The response of the failed HTTP request. This is usually an
+        instance of :class:`mobilemoney.request.response.MomoResponse`. In some cases
+        this could also be a :class:`aiohttp.ClientResponse` or a :class:`requests.Response`.
     text: :class:`str`
         The text of the error. Could be an empty string.
     status: :class:`int`
@@ -106,6 +111,57 @@ class HTTPException(MomoException):
         super().__init__(fmt.format(self.response, self.code, self.text))
     pass
 
+class MomoConnectionError(MomoException):
+    """Exception that's raised when MTN could not be reached, after every retry.
+    Subclass of :exc:`MomoException`.
+    """
+    pass
+class CircuitOpen(MomoException):
+    """Exception that's raised when a route failed too often and calls to it fail fast.
+    Subclass of :exc:`MomoException`.
+    Attributes
+    ------------
+    name: :class:`str`
+        The circuit, made of the environment and the route key.
+    retry_after: :class:`float`
+        Seconds before a probe call is let through again.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        self.name: str = name
+        self.retry_after: float = retry_after
+        super().__init__(f'Circuit {name} is open, retry in {retry_after:.1f}s')
+class DuplicatePayment(MomoException):
+    """Exception that's raised when a payment with the same business key was already sent.
+    Subclass of :exc:`MomoException`.
+    Attributes
+    ------------
+    key: :class:`str`
+        The business key of the payment.
+    reference_id: Optional[:class:`str`]
+        The X-Reference-Id of the first payment, use it to read its status.
+        None when the key was only found in the Bloom filter.
+    probable: :class:`bool`
+        True when the key was only found in the Bloom filter, which may be a false positive.
+    """
+
+    def __init__(self, key: str, reference_id: Optional[str], probable: bool = False):
+        self.key: str = key
+        self.reference_id: Optional[str] = reference_id
+        self.probable: bool = probable
+        super().__init__(f'Payment {key} was already sent as {reference_id}' if not probable else f'Payment {key} was probably already sent')
+class InvalidPayment(MomoException):
+    """Exception that's raised when a payment is refused before being sent.
+    Subclass of :exc:`MomoException`.
+    Attributes
+    ------------
+    errors: List[Tuple[:class:`str`, :class:`str`]]
+        The (field, message) of every problem found, e.g. ('payee.partyId', 'invalid MSISDN').
+    """
+
+    def __init__(self, errors: List[Tuple[str, str]]):
+        self.errors: List[Tuple[str, str]] = errors
+        super().__init__('; '.join(f'{field}: {message}' for field, message in errors))
 class Unauthorized(HTTPException):
     """Exception that's raised for when status code 401 occurs.
     Subclass of :exc:`HTTPException`
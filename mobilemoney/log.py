@@ -0,0 +1,204 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+#fields the library adds to its records, e.g. record.route
+FIELDS: Tuple[str, ...] = ('route', 'env', 'reference_id', 'status', 'latency_ms', 'attempt', 'delay')
+
+logger = logging.getLogger('mobilemoney')
+#nothing is written anywhere until the application configures logging
+logger.addHandler(logging.NullHandler())
+
+"""
+Note : the library only creates records. Writing them is the job of the
+application, call configure_logging to have them written by a background
+thread instead of the event loop. While it is set up the records do not
+propagate to the root logger, whose handlers would write them a second time,
+on the loop.
+"""
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most ``burst`` similar records every ``period`` seconds
+
+    Records are similar when they share their message template, route and
+    status. The first record let through after some were dropped carries the
+    number dropped in its ``suppressed`` attribute.
+
+    Arguments:
+        burst [optional]: integer, records let through per period
+        period [optional]: float, seconds
+        max_keys [optional]: integer, number of kinds of record tracked
+    """
+
+    def __init__(self, burst: int = 10, period: float = 60.0, max_keys: int = 1024) -> None:
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.max_keys = max_keys
+        self.__windows: 'OrderedDict[Tuple[Any, ...], list]' = OrderedDict()
+        #the filter may run in every thread logging through the handler
+        self.__lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.msg, getattr(record, 'route', None), getattr(record, 'status', None))
+        now = time.monotonic()
+        with self.__lock:
+            window = self.__windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                #[window start, records let through, records dropped]
+                suppressed = window[2] if window is not None else 0
+                window = self.__windows[key] = [now, 0, 0]
+                self.__windows.move_to_end(key)
+                while len(self.__windows) > self.max_keys:
+                    self.__windows.popitem(last=False)
+            else:
+                suppressed = 0
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+        record.suppressed = suppressed
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Append the library fields of a record as key=value pairs, or write one JSON object per record
+
+    Arguments:
+        json [optional]: boolean, one JSON object per line
+        fmt [optional]: string, format of the message part when json is False
+    """
+
+    def __init__(self, json: bool = False, fmt: str = '%(asctime)s %(levelname)s %(name)s: %(message)s') -> None:
+        super().__init__(fmt)
+        self.json = json
+
+    def fields(self, record: logging.LogRecord) -> Dict[str, Any]:
+        """Method to get the library fields set on a record"""
+        fields = {name: getattr(record, name) for name in FIELDS if getattr(record, name, None) is not None}
+        if getattr(record, 'suppressed', 0):
+            fields['suppressed'] = record.suppressed
+        return fields
+
+    def format(self, record: logging.LogRecord) -> str:
+        if self.json:
+            from .utils.utils import _to_json
+
+            data: Dict[str, Any] = {
+                'time': self.formatTime(record),
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
+            }
+            data.update(self.fields(record))
+            if record.exc_info:
+                data['exception'] = self.formatException(record.exc_info)
+            elif record.exc_text:
+                data['exception'] = record.exc_text
+            return _to_json(data).decode('utf-8')
+        line = super().format(record)
+        fields = self.fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.handlers.QueueHandler] = None
+#propagate flag of the logger before configure_logging
+_propagate: Optional[bool] = None
+
+
+def configure_logging(
+    handlers: Optional[Sequence[logging.Handler]] = None,
+    level: int = logging.INFO,
+    *,
+    json: bool = False,
+    burst: Optional[int] = 10,
+    period: float = 60.0
+    ) -> logging.handlers.QueueListener:
+    """
+    Function to write the records of the library from a background thread
+
+    The event loop only puts records on a queue, a QueueListener thread
+    formats and writes them. The records stop propagating to the root logger
+    until stop_logging, pass the root handlers as ``handlers`` to keep them
+    written there. Calling it again replaces the previous setup.
+
+    Arguments:
+        handlers [optional]: handlers writing the records, stderr by default
+        level [optional]: integer, lowest level kept
+        json [optional]: boolean, one JSON object per line with the default handler
+        burst [optional]: integer, similar records kept per period, None to keep every record
+        period [optional]: float, seconds
+
+    Returns:
+        logging.handlers.QueueListener, stopped at exit
+    """
+    global _listener, _handler, _propagate
+
+    stop_logging()
+    if handlers is None:
+        stream = logging.StreamHandler()
+        stream.setFormatter(StructuredFormatter(json=json))
+        handlers = [stream]
+
+    records: 'queue.SimpleQueue[logging.LogRecord]' = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)  # type: ignore
+    if burst is not None:
+        #dropped before being queued, a failing minute costs the loop almost nothing
+        handler.addFilter(RateLimitFilter(burst, period))
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)  # type: ignore
+    listener.start()
+
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    #root handlers, e.g. of logging.basicConfig, would write every record again from the loop
+    _propagate, logger.propagate = logger.propagate, False
+    _listener, _handler = listener, handler
+    return listener
+
+
+def stop_logging() -> None:
+    """Function to write the queued records and stop the thread started by configure_logging"""
+    global _listener, _handler, _propagate
+
+    if _handler is not None:
+        logger.removeHandler(_handler)
+        _handler = None
+    if _propagate is not None:
+        logger.propagate, _propagate = _propagate, None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,481 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import argparse
+import asyncio
+import base64
+import math
+import random
+import secrets
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from typing import Any, Awaitable, Callable, Dict, Iterable, Mapping, Optional, Set, Tuple, Union
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+from .request.route import Endpoint, EndpointTable, Route
+from .utils.utils import is_valid_id_4, _from_json, _to_json
+
+"""
+Note : the mock answers like the MTN sandbox, including its magic payer and
+payee numbers (46733123450 fails, 46733123451 is rejected, 46733123452 times
+out, 46733123453 and 46733123454 stay pending), so the same scenarios can be
+played offline and under load.
+"""
+
+Delay = Callable[[], float]
+PerRoute = Union[Any, Mapping[str, Any]]
+
+PAYMENTS: Dict[Tuple[str, str], str] = {
+    ('collection', 'request_to_pay'): 'payer',
+    ('collection', 'withdraw'): 'payer',
+    ('disbursement', 'deposit'): 'payee',
+    ('disbursement', 'transfer'): 'payee',
+    ('disbursement', 'refund'): 'payee',
+}
+
+STATUSES: Dict[Tuple[str, str], Tuple[str, str]] = {
+    ('collection', 'request_to_pay_status'): ('collection', 'request_to_pay'),
+    ('collection', 'withdraw_status'): ('collection', 'withdraw'),
+    ('disbursement', 'get_deposit_status'): ('disbursement', 'deposit'),
+    ('disbursement', 'get_transfer_status'): ('disbursement', 'transfer'),
+    ('disbursement', 'get_refund_status'): ('disbursement', 'refund'),
+}
+
+#sandbox test numbers, (status, reason); a None status never settles
+SANDBOX_NUMBERS: Dict[str, Tuple[Optional[str], Optional[str]]] = {
+    '46733123450': ('FAILED', 'INTERNAL_PROCESSING_ERROR'),
+    '46733123451': ('FAILED', 'APPROVAL_REJECTED'),
+    '46733123452': ('FAILED', 'EXPIRED'),
+    '46733123453': (None, None),
+    '46733123454': (None, None),
+}
+
+
+def constant(seconds: float) -> Delay:
+    """Latency distribution always waiting ``seconds``"""
+    return lambda: seconds
+
+
+def uniform(low: float, high: float) -> Delay:
+    """Latency distribution picking a delay between ``low`` and ``high`` seconds"""
+    return lambda: random.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5, cap: Optional[float] = None) -> Delay:
+    """Latency distribution with a long tail, ``median`` seconds half of the time"""
+    mu = math.log(median) if median > 0 else 0.0
+
+    def delay() -> float:
+        value = random.lognormvariate(mu, sigma) if median > 0 else 0.0
+        return min(value, cap) if cap is not None else value
+    return delay
+
+
+def _error(status: int, code: str, message: str) -> web.Response:
+    return web.Response(status=status, body=_to_json({'code': code, 'message': message}), content_type='application/json')
+
+
+def _json(data: Any, status: int = 200) -> web.Response:
+    return web.Response(status=status, body=_to_json(data), content_type='application/json')
+
+
+class MockServer:
+    """
+    Stand-in for the MoMo API, to develop and load test without the sandbox
+
+    Every route of ``PATH``, ``COLLECTION_PATH`` and ``DISBURSEMENTS_PATH`` is
+    served with the status codes MTN uses. API users, keys, access tokens and
+    transactions are kept in memory: a transaction is PENDING until it settles
+    ``settle_after`` seconds later, then its callback is delivered if it was
+    sent with an X-Callback-Url.
+
+    ``latency``, ``error_rate`` and ``callback_delay`` take one value for every
+    route or a dictionary keyed by route key (e.g. ``{'create_access_token':
+    lognormal(0.4)}``), latencies and callback delays are callables returning
+    seconds.
+
+    Arguments:
+        host [optional]: string
+        port [optional]: integer, 0 picks a free port
+        latency [optional]: callable or dictionary of callables
+        error_rate [optional]: float or dictionary of floats, share of calls answered 500
+        settle_after [optional]: float, seconds a transaction stays PENDING
+        callback_delay [optional]: callable or dictionary of callables, seconds before a callback is sent
+        callback_method [optional]: string, 'PUT' like MTN or 'POST'
+        inactive_accounts [optional]: iterable of numbers answered as inactive
+        unknown_accounts [optional]: iterable of numbers answered 404
+        strict_auth [optional]: boolean, only accept credentials and tokens issued by the mock
+        token_ttl [optional]: integer, expires_in of the access tokens
+        balance [optional]: string, starting balance of every product
+        currency [optional]: string
+        seed [optional]: integer, makes injected errors and transaction ids reproducible
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: Optional[PerRoute] = None,
+        error_rate: PerRoute = 0.0,
+        settle_after: float = 0.0,
+        callback_delay: Optional[PerRoute] = None,
+        callback_method: str = 'PUT',
+        inactive_accounts: Iterable[str] = (),
+        unknown_accounts: Iterable[str] = (),
+        strict_auth: bool = False,
+        token_ttl: int = 3600,
+        balance: str = '1000000',
+        currency: str = 'EUR',
+        seed: Optional[int] = None
+        ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.settle_after = settle_after
+        self.callback_delay = callback_delay
+        self.callback_method = callback_method
+        self.inactive_accounts: Set[str] = set(inactive_accounts)
+        self.unknown_accounts: Set[str] = set(unknown_accounts)
+        self.strict_auth = strict_auth
+        self.token_ttl = token_ttl
+        self.currency = currency
+        self.random = random.Random(seed)
+
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.keys: Dict[str, str] = {}
+        self.tokens: Set[str] = set()
+        self.balances: Dict[str, Decimal] = {'collection': Decimal(balance), 'disbursement': Decimal(balance)}
+        self.transactions: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self.requests: 'Counter[str]' = Counter()
+        self.callbacks_sent = 0
+
+        self.__runner: Optional[web.AppRunner] = None
+        self.__session: Optional[ClientSession] = None
+        self.__tasks: Set['asyncio.Future[Any]'] = set()
+        self.url: str = ''
+
+    async def __aenter__(self) -> 'MockServer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    @property
+    def base_url(self) -> Dict[str, str]:
+        """Base URL of both environments, to give to ``Client(base_url=...)``"""
+        return {env: self.url for env in Route.BASE}
+
+    def application(self) -> web.Application:
+        """
+        Method to get the aiohttp application, to mount it in an existing server
+
+        Returns:
+            aiohttp.web.Application
+        """
+        app = web.Application()
+        table = EndpointTable({env: '' for env in Route.BASE})
+        for product in ('provisioning', 'collection', 'disbursement'):
+            for endpoint in table[product].values():
+                handler = self.__handler(endpoint)
+                for path in set(endpoint.paths):
+                    if path:
+                        app.router.add_route(endpoint.method, path, handler)
+        return app
+
+    async def start(self) -> None:
+        """Method to start serving, ``url`` is set once the port is known"""
+        if self.__runner is not None:
+            return
+        self.__session = ClientSession(timeout=ClientTimeout(total=10))
+        runner = web.AppRunner(self.application())
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        port = runner.addresses[0][1] if runner.addresses else self.port
+        self.url = f'http://{self.host}:{port}'
+        self.__runner = runner
+
+    async def stop(self) -> None:
+        """Method to stop serving, pending settlements and callbacks are cancelled"""
+        for task in list(self.__tasks):
+            task.cancel()
+        self.__tasks.clear()
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    def __pick(self, setting: Optional[PerRoute], key: str) -> Any:
+        if isinstance(setting, Mapping):
+            return setting.get(key)
+        return setting
+
+    def __handler(self, endpoint: Endpoint) -> Callable[[web.Request], Awaitable[web.StreamResponse]]:
+        route = getattr(self, f'_MockServer__{endpoint.key}', None)
+        if route is None:
+            if (endpoint.product, endpoint.key) in PAYMENTS:
+                route = self.__payment
+            elif (endpoint.product, endpoint.key) in STATUSES:
+                route = self.__status
+            else:
+                raise ValueError(f'No mock for {endpoint!r}')
+
+        name = f'{endpoint.product}.{endpoint.key}'
+
+        async def handle(request: web.Request) -> web.StreamResponse:
+            self.requests[name] += 1
+            latency = self.__pick(self.latency, endpoint.key)
+            if latency is not None:
+                await asyncio.sleep(latency())
+            rate = self.__pick(self.error_rate, endpoint.key) or 0.0
+            if rate and self.random.random() < rate:
+                return _error(500, 'INTERNAL_PROCESSING_ERROR', 'An internal error occurred while processing.')
+            if 'Ocp-Apim-Subscription-Key' not in request.headers:
+                return _error(401, 'MISSING_SUBSCRIPTION_KEY', 'Access denied due to missing subscription key.')
+            if endpoint.product != 'provisioning' and endpoint.key != 'create_access_token':
+                denied = self.__check_bearer(request)
+                if denied is not None:
+                    return denied
+                if 'X-Target-Environment' not in request.headers:
+                    return _error(400, 'INVALID_TARGET_ENVIRONMENT', 'Missing X-Target-Environment.')
+            return await route(request, endpoint)
+
+        return handle
+
+    def __check_bearer(self, request: web.Request) -> Optional[web.Response]:
+        authorization = request.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer '):
+            return _error(401, 'UNAUTHORIZED', 'Missing or invalid access token.')
+        if self.strict_auth and authorization[7:] not in self.tokens:
+            return _error(401, 'UNAUTHORIZED', 'Access token expired or unknown.')
+        return None
+
+    async def __body(self, request: web.Request) -> Optional[Dict[str, Any]]:
+        data = await request.read()
+        if not data:
+            return {}
+        try:
+            body = _from_json(data)
+        except ValueError:
+            return None
+        return body if isinstance(body, dict) else None
+
+    # provisioning
+
+    async def __create_apiuser(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        reference_id = request.headers.get('X-Reference-Id', '')
+        if not is_valid_id_4(reference_id):
+            return _error(400, 'INVALID_REFERENCE_ID', 'X-Reference-Id must be a UUID version 4.')
+        body = await self.__body(request)
+        if body is None:
+            return _error(400, 'INVALID_DATA', 'Invalid JSON body.')
+        if reference_id in self.users:
+            return _error(409, 'RESOURCE_ALREADY_EXIST', 'Duplicated reference id. Creation of resource failed.')
+        self.users[reference_id] = {
+            'providerCallbackHost': body.get('providerCallbackHost', ''),
+            'targetEnvironment': 'sandbox'
+        }
+        return web.Response(status=201)
+
+    async def __get_apiuser(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        user = self.users.get(request.match_info['uuid'])
+        if user is None:
+            return _error(404, 'RESOURCE_NOT_FOUND', 'Requested resource was not found.')
+        return _json(user)
+
+    async def __create_apikey(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        apiuser = request.match_info['apiuser']
+        if apiuser not in self.users:
+            return _error(404, 'RESOURCE_NOT_FOUND', 'Requested resource was not found.')
+        key = secrets.token_hex(16)
+        self.keys[apiuser] = key
+        return _json({'apiKey': key}, 201)
+
+    async def __create_access_token(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        authorization = request.headers.get('Authorization', '')
+        if not authorization.startswith('Basic '):
+            return _error(401, 'UNAUTHORIZED', 'Missing Basic authorization.')
+        if self.strict_auth:
+            try:
+                apiuser, _, apikey = base64.b64decode(authorization[6:]).decode().partition(':')
+            except ValueError:
+                return _error(401, 'UNAUTHORIZED', 'Invalid Basic authorization.')
+            if self.keys.get(apiuser) != apikey:
+                return _error(401, 'UNAUTHORIZED', 'Invalid API user or API key.')
+        token = secrets.token_urlsafe(24)
+        self.tokens.add(token)
+        return _json({'access_token': token, 'token_type': 'access_token', 'expires_in': self.token_ttl})
+
+    # accounts
+
+    async def __get_account_balance(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        return _json({'availableBalance': str(self.balances[endpoint.product]), 'currency': self.currency})
+
+    async def __get_account_balance_in(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        currency = request.match_info['currency'].upper()
+        if len(currency) != 3 or not currency.isalpha():
+            return _error(400, 'INVALID_CURRENCY', 'Currency not supported.')
+        return _json({'availableBalance': str(self.balances[endpoint.product]), 'currency': currency})
+
+    async def __get_basic_info(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        msisdn = request.match_info['MSISDN']
+        if msisdn in self.unknown_accounts:
+            return _error(404, 'RESOURCE_NOT_FOUND', 'Requested resource was not found.')
+        return _json({
+            'given_name': 'Sand',
+            'family_name': f'Box {msisdn[-4:]}',
+            'birthdate': '1976-08-13',
+            'locale': 'sv_SE',
+            'gender': 'MALE',
+            'status': 'INACTIVE' if msisdn in self.inactive_accounts else 'ACTIVE'
+        })
+
+    async def __get_user_info(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        return _json({'sub': '0', 'name': 'Sand Box', 'given_name': 'Sand', 'family_name': 'Box', 'locale': 'sv_SE'})
+
+    async def __is_active(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        account = request.match_info['accountHolderId']
+        if account in self.unknown_accounts:
+            return _error(404, 'RESOURCE_NOT_FOUND', 'Requested resource was not found.')
+        return _json({'result': account not in self.inactive_accounts})
+
+    # transactions
+
+    async def __payment(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        reference_id = request.headers.get('X-Reference-Id', '')
+        if not is_valid_id_4(reference_id):
+            return _error(400, 'INVALID_REFERENCE_ID', 'X-Reference-Id must be a UUID version 4.')
+        body = await self.__body(request)
+        if body is None:
+            return _error(400, 'INVALID_DATA', 'Invalid JSON body.')
+
+        party = PAYMENTS[(endpoint.product, endpoint.key)]
+        try:
+            amount = Decimal(str(body.get('amount')))
+        except InvalidOperation:
+            amount = Decimal(0)
+        party_id = (body.get(party) or {}).get('partyId') if isinstance(body.get(party), dict) else None
+        if amount <= 0 or not body.get('currency') or (endpoint.key != 'refund' and not party_id):
+            return _error(400, 'INVALID_DATA', f'amount, currency and {party}.partyId are required.')
+        if endpoint.key == 'refund' and not body.get('referenceIdToRefund'):
+            return _error(400, 'INVALID_DATA', 'referenceIdToRefund is required.')
+
+        key = (endpoint.product, endpoint.key, reference_id)
+        if key in self.transactions:
+            return _error(409, 'RESOURCE_ALREADY_EXIST', 'Duplicated reference id. Creation of resource failed.')
+
+        transaction = dict(body)
+        transaction['status'] = 'PENDING'
+        transaction['referenceId'] = reference_id
+        self.transactions[key] = transaction
+
+        status, reason = SANDBOX_NUMBERS.get(str(party_id), ('SUCCESSFUL', None))
+        if party_id in self.inactive_accounts or party_id in self.unknown_accounts:
+            status, reason = 'FAILED', 'PAYEE_NOT_FOUND'
+        if status is not None:
+            self.__spawn(self.__settle(endpoint, transaction, amount, status, reason, request.headers.get('X-Callback-Url')))
+        return web.Response(status=202)
+
+    async def __settle(self, endpoint: Endpoint, transaction: Dict[str, Any], amount: Decimal, status: str, reason: Optional[str], callback: Optional[str]) -> None:
+        if self.settle_after:
+            await asyncio.sleep(self.settle_after)
+        transaction['status'] = status
+        if status == 'SUCCESSFUL':
+            transaction['financialTransactionId'] = str(self.random.randrange(10 ** 8, 10 ** 9))
+            if endpoint.product == 'collection' and endpoint.key == 'request_to_pay':
+                self.balances['collection'] += amount
+            elif endpoint.product == 'collection':
+                self.balances['collection'] -= amount
+            else:
+                self.balances['disbursement'] -= amount
+        elif reason is not None:
+            transaction['reason'] = reason
+
+        if callback:
+            delay = self.__pick(self.callback_delay, endpoint.key)
+            if delay is not None:
+                await asyncio.sleep(delay())
+            await self.__deliver(callback, transaction)
+
+    async def __deliver(self, url: str, data: Dict[str, Any]) -> None:
+        if self.__session is None:
+            return
+        try:
+            async with self.__session.request(self.callback_method, url, data=_to_json(data), headers={
+                'Content-Type': 'application/json',
+                'X-Reference-Id': data['referenceId']
+            }) as response:
+                await response.read()
+            self.callbacks_sent += 1
+        except Exception:
+            # MTN does not retry callbacks either
+            pass
+
+    async def __status(self, request: web.Request, endpoint: Endpoint) -> web.Response:
+        product, key = STATUSES[(endpoint.product, endpoint.key)]
+        reference_id = request.match_info['referenceId']
+        transaction = self.transactions.get((product, key, reference_id))
+        if transaction is None:
+            return _error(404, 'RESOURCE_NOT_FOUND', 'Requested resource was not found.')
+        return _json(transaction)
+
+    def __spawn(self, coro: Awaitable[Any]) -> None:
+        task = asyncio.ensure_future(coro)
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the MoMo API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='median latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of calls answered 500')
+    parser.add_argument('--settle-after', type=float, default=1.0, help='seconds a transaction stays PENDING')
+    parser.add_argument('--strict-auth', action='store_true')
+    args = parser.parse_args()
+
+    async def serve() -> None:
+        server = MockServer(
+            host=args.host,
+            port=args.port,
+            latency=lognormal(args.latency) if args.latency else None,
+            error_rate=args.error_rate,
+            settle_after=args.settle_after,
+            strict_auth=args.strict_auth
+        )
+        async with server:
+            print(f'MoMo mock listening on {server.url}')
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+
+import aiohttp
+
+from .request.http import HTTPClient
+from .request.ratelimit import RateLimiter
+from .request.retry import RetryPolicy
+from .request.breaker import CircuitBreakers
+from .request.cache import TTLCache
+from .request.metrics import MetricsSink
+from .request.route import Route
+
+if TYPE_CHECKING:
+    from .request.product import Product
+    from .request.collection import Collection
+    from .request.disbursements import Disbursements
+
+RegistryKey = Tuple[str, str, str]
+
+"""
+Note : tenants only own what is really theirs (subscription key, credentials,
+access token). Sockets, the rate limit budget, retries and circuit breakers
+belong to the registry, so their cost follows the traffic, not the number of
+merchants. Metrics are labelled by route, not by tenant, for the same reason.
+"""
+
+
+class ClientRegistry:
+    """
+    Hand out product clients for many tenants over one connection pool
+
+    Clients are keyed by (product, subscription key, environment) and kept in
+    an LRU: once ``max_size`` clients exist, the least recently used one is
+    dropped, its access token refresh stopped (calls still holding it
+    finish normally, fetching a token if they need one) and its rate limiter
+    buckets forgotten once no other client uses its subscription key. Every client shares the
+    same connector, :class:`RateLimiter`, :class:`RetryPolicy`,
+    :class:`CircuitBreakers` and metrics sink; the rate limiter still counts each subscription
+    key on its own.
+
+    The connector is created on first use, so call :meth:`get` from inside the
+    running event loop.
+
+    Arguments:
+        max_size [optional]: integer, number of product clients kept
+        connector [optional]: aiohttp.BaseConnector, never closed by the registry
+        limit [optional]: integer, total number of pooled connections
+        limit_per_host [optional]: integer, pooled connections per host
+        keepalive_timeout [optional]: float, seconds an idle connection is kept open
+        ttl_dns_cache [optional]: integer, seconds DNS lookups are cached
+        rate_limiter [optional]: RateLimiter shared by every tenant
+        retry_policy [optional]: RetryPolicy shared by every tenant
+        circuit_breakers [optional]: CircuitBreakers shared by every tenant
+        account_cache [optional]: TTLCache of account holder lookups shared by every tenant
+        metrics [optional]: MetricsSink receiving the timings of every tenant
+        on_evict [optional]: callable receiving (key, client) when a client is dropped
+        options [optional]: other HTTPClient options, e.g. timeout
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        connector: Optional[aiohttp.BaseConnector] = None,
+        *,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 30.0,
+        ttl_dns_cache: Optional[int] = 300,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breakers: Optional[CircuitBreakers] = None,
+        account_cache: Optional[TTLCache] = None,
+        metrics: Optional[MetricsSink] = None,
+        on_evict: Optional[Callable[[RegistryKey, 'Product'], None]] = None,
+        **options: Any
+        ) -> None:
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        self.max_size = max_size
+        self.connector = connector
+        self.__connector_owner = connector is None
+        self.__connector_options: Dict[str, Any] = {
+            'limit': limit,
+            'limit_per_host': limit_per_host,
+            'keepalive_timeout': keepalive_timeout,
+            'ttl_dns_cache': ttl_dns_cache,
+        }
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.circuit_breakers = circuit_breakers if circuit_breakers is not None else CircuitBreakers()
+        self.account_cache = account_cache
+        self.metrics = metrics
+        self.on_evict = on_evict
+        self.__options = options
+        self.__http: Dict[str, HTTPClient] = {}
+        self.__clients: 'OrderedDict[RegistryKey, Product]' = OrderedDict()
+
+    async def __aenter__(self) -> 'ClientRegistry':
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self.__clients)
+
+    def __contains__(self, key: RegistryKey) -> bool:
+        return key in self.__clients
+
+    def http(self, environment: str) -> HTTPClient:
+        """
+        Method to get the HTTP client of an environment
+
+        Arguments:
+            environment: string, 'sandbox' or 'live'
+
+        Returns:
+            HTTP client : HTTPClient
+        """
+        http = self.__http.get(environment)
+        if http is None:
+            if environment not in Route.ENV.values():
+                raise ValueError(f'environment must be one of {tuple(Route.ENV.values())}')
+            if self.connector is None or self.connector.closed:
+                self.connector = aiohttp.TCPConnector(**self.__connector_options)
+            http = HTTPClient(
+                self.connector,
+                rate_limiter=self.rate_limiter,
+                retry_policy=self.retry_policy,
+                circuit_breakers=self.circuit_breakers,
+                metrics=self.metrics,
+                **self.__options
+            )
+            if environment == Route.ENV[False]:
+                http.is_sandbox()
+            self.__http[environment] = http
+        return http
+
+    def get(
+        self,
+        product: str,
+        subscription_key: str,
+        environment: str = 'sandbox',
+        apiuser: Optional[str] = None,
+        apikey: Optional[str] = None
+        ) -> 'Product':
+        """
+        Method to get the client of a tenant, created on first use
+
+        Arguments:
+            product: string, 'collection' or 'disbursement'
+            subscription_key: string
+            environment [optional]: string, 'sandbox' or 'live'
+            apiuser [optional]: string, with apikey the client manages its own access token
+            apikey [optional]: string
+
+        Returns:
+            Collection or Disbursements client
+        """
+        key = (product, subscription_key, environment)
+        client = self.__clients.get(key)
+        if client is None:
+            client = self.__create(product, subscription_key, environment)
+            self.__clients[key] = client
+            while len(self.__clients) > self.max_size:
+                self.__drop(*self.__clients.popitem(last=False))
+        else:
+            self.__clients.move_to_end(key)
+
+        if apiuser is not None and apikey is not None:
+            #a no-op when the credentials did not change
+            client.set_credentials(apiuser, apikey)
+        return client
+
+    def collection(self, subscription_key: str, environment: str = 'sandbox', apiuser: Optional[str] = None, apikey: Optional[str] = None) -> 'Collection':
+        """Method to get the collection client of a tenant, see :meth:`get`"""
+        return self.get('collection', subscription_key, environment, apiuser, apikey)  # type: ignore
+
+    def disbursements(self, subscription_key: str, environment: str = 'sandbox', apiuser: Optional[str] = None, apikey: Optional[str] = None) -> 'Disbursements':
+        """Method to get the Disbursements client of a tenant, see :meth:`get`"""
+        return self.get('disbursement', subscription_key, environment, apiuser, apikey)  # type: ignore
+
+    def evict(self, product: str, subscription_key: str, environment: str = 'sandbox') -> bool:
+        """
+        Method to drop the client of a tenant, e.g. after its credentials were revoked
+
+        Returns:
+            True when a client was dropped
+        """
+        key = (product, subscription_key, environment)
+        client = self.__clients.pop(key, None)
+        if client is None:
+            return False
+        self.__drop(key, client)
+        return True
+
+    async def close(self) -> None:
+        """Method to drop every client and close the pooled connections"""
+        while self.__clients:
+            self.__drop(*self.__clients.popitem(last=False))
+        for http in self.__http.values():
+            await http.close()
+        self.__http.clear()
+        if self.__connector_owner and self.connector is not None:
+            await self.connector.close()
+            self.connector = None
+
+    def __create(self, product: str, subscription_key: str, environment: str) -> 'Product':
+        http = self.http(environment)
+        client: 'Product'
+        if product == 'collection':
+            from .request.collection import Collection
+            client = Collection(http, subscription_key)
+        elif product == 'disbursement':
+            from .request.disbursements import Disbursements
+            client = Disbursements(http, subscription_key)
+        else:
+            raise ValueError(f'Unknown product {product!r}')
+        if self.account_cache is not None:
+            client.use_account_cache(self.account_cache)
+        return client
+
+    def __drop(self, key: RegistryKey, client: 'Product') -> None:
+        #no more background refreshes for a tenant that is gone
+        client.token.close()
+        #the buckets must follow the live tenants, not every tenant ever seen
+        subscription_key = key[1]
+        if not any(other[1] == subscription_key for other in self.__clients):
+            self.rate_limiter.forget(subscription_key)
+        if self.on_evict is not None:
+            self.on_evict(key, client)
@@ -0,0 +1,158 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+from typing import Callable, Dict, List, Optional
+
+from .route import Route
+from ..errors.errors import CircuitOpen
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+StateListener = Callable[[str, str, str], None]
+
+
+class CircuitBreaker:
+    """
+    Stop sending calls to a route that keeps failing
+
+    After ``failure_threshold`` failures in a row (errors, timeouts, 5xx, or
+    calls slower than ``slow_call_threshold``) the circuit opens and calls fail
+    at once with :exc:`CircuitOpen`. After ``recovery_timeout`` seconds up to
+    ``half_open_max_calls`` probe calls are let through: a success closes the
+    circuit, a failure opens it again.
+
+    Arguments:
+        name: string, e.g. 'sandbox:collection.request_to_pay'
+        failure_threshold [optional]: integer
+        slow_call_threshold [optional]: float, seconds after which a call counts as failed
+        recovery_timeout [optional]: float, seconds the circuit stays open
+        half_open_max_calls [optional]: integer, probe calls allowed at once
+        listeners [optional]: list of callables receiving (name, old state, new state)
+    """
+
+    __slots__ = ('name', 'failure_threshold', 'slow_call_threshold', 'recovery_timeout',
+        'half_open_max_calls', 'listeners', 'state', 'failures', 'opened_at', 'probes')
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        slow_call_threshold: Optional[float] = None,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        listeners: Optional[List[StateListener]] = None
+        ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.listeners: List[StateListener] = listeners if listeners is not None else []
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+
+    def before_call(self) -> None:
+        """Method to let a call through, raise CircuitOpen when it must fail fast"""
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN:
+            remaining = self.opened_at + self.recovery_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpen(self.name, remaining)
+            self.__set_state(HALF_OPEN)
+        if self.probes >= self.half_open_max_calls:
+            raise CircuitOpen(self.name, 0.0)
+        self.probes += 1
+
+    def record(self, status: int, elapsed: float) -> None:
+        """Method to record the response of a call let through"""
+        slow = self.slow_call_threshold is not None and elapsed > self.slow_call_threshold
+        if status >= 500 or slow:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN:
+            self.__set_state(CLOSED)
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self.__open()
+            return
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            self.__open()
+
+    def release(self) -> None:
+        """Method to give back the probe of a call that ended without a result"""
+        if self.state == HALF_OPEN and self.probes:
+            self.probes -= 1
+
+    def __open(self) -> None:
+        self.opened_at = time.monotonic()
+        self.__set_state(OPEN)
+
+    def __set_state(self, state: str) -> None:
+        old, self.state = self.state, state
+        self.probes = 0
+        if state == CLOSED:
+            self.failures = 0
+        if old != state:
+            for listener in self.listeners:
+                listener(self.name, old, state)
+
+
+class CircuitBreakers:
+    """
+    Represent the circuit breakers of every route, keyed by environment and route key
+
+    Arguments:
+        listeners [optional]: list of callables receiving (name, old state, new state)
+        settings [optional]: CircuitBreaker settings shared by every route
+    """
+
+    def __init__(self, listeners: Optional[List[StateListener]] = None, **settings: float) -> None:
+        self.listeners: List[StateListener] = list(listeners or [])
+        self.settings = settings
+        self.__breakers: Dict[str, CircuitBreaker] = {}
+
+    def on_state_change(self, listener: StateListener) -> StateListener:
+        """Method to register a callable receiving (name, old state, new state), usable as a decorator"""
+        self.listeners.append(listener)
+        return listener
+
+    def get(self, route: Route) -> CircuitBreaker:
+        """Method to get the circuit breaker of a route"""
+        name = f'{Route.ENV[route.production]}:{route.product}.{route.key}'
+        breaker = self.__breakers.get(name)
+        if breaker is None:
+            breaker = self.__breakers[name] = CircuitBreaker(name, listeners=self.listeners, **self.settings)  # type: ignore
+        return breaker
+
+    def states(self) -> Dict[str, str]:
+        """Method to get the state of every circuit used so far"""
+        return {name: breaker.state for name, breaker in self.__breakers.items()}
@@ -0,0 +1,142 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class BulkResult:
+    """
+    Represent the outcome of one item of a bulk call
+
+    Attributes:
+        index: integer, position of the item in the input
+        reference_id: string, X-Reference-Id used for the item
+        status: integer, HTTP status code, None when no response was received
+        data: response body when the call succeeded
+        error: exception raised by the call, None when it succeeded
+    """
+
+    __slots__ = ('index', 'reference_id', 'status', 'data', 'error')
+
+    def __init__(
+        self,
+        index: int,
+        reference_id: Optional[str],
+        status: Optional[int] = None,
+        data: Any = None,
+        error: Optional[BaseException] = None
+        ) -> None:
+        self.index = index
+        self.reference_id = reference_id
+        self.status = status
+        self.data = data
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return f'<BulkResult index={self.index} reference_id={self.reference_id} status={self.status} ok={self.ok}>'
+
+
+class BulkReport:
+    """
+    Represent every outcome of a bulk call
+
+    Attributes:
+        results: list of BulkResult ordered like the input
+        elapsed: float, seconds the whole batch took
+    """
+
+    __slots__ = ('results', 'elapsed')
+
+    def __init__(self, results: List[BulkResult], elapsed: float) -> None:
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self) -> List[BulkResult]:
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> List[BulkResult]:
+        return [result for result in self.results if not result.ok]
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __repr__(self) -> str:
+        return f'<BulkReport total={len(self.results)} failed={len(self.failed)} elapsed={self.elapsed:.3f}s>'
+
+
+async def run_bulk(
+    items: Iterable[T],
+    call: Callable[[int, T], Awaitable[BulkResult]],
+    concurrency: int = 10
+    ) -> AsyncIterator[BulkResult]:
+    """
+    Run ``call`` on every item with at most ``concurrency`` calls in flight
+
+    Items are pulled from ``items`` only when a worker is free, so a lazy
+    iterable is never loaded in memory. Results are yielded as they complete.
+
+    Arguments:
+        items: iterable of items
+        call: coroutine function taking (index, item) and returning a BulkResult
+        concurrency [optional]: integer
+
+    Returns:
+        async iterator of BulkResult
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+
+    iterator = iter(enumerate(items))
+    queue: 'asyncio.Queue[Any]' = asyncio.Queue(maxsize=concurrency)
+    finished = object()
+    failures: List[BaseException] = []
+
+    async def worker() -> None:
+        try:
+            # every worker pulls from the same iterator, next() never runs concurrently
+            for index, item in iterator:
+                await queue.put(await call(index, item))
+        except Exception as e:
+            failures.append(e)
+        await queue.put(finished)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        running = len(workers)
+        while running:
+            result = await queue.get()
+            if result is finished:
+                running -= 1
+            else:
+                yield result
+        if failures:
+            raise failures[0]
+    finally:
+        for task in workers:
+            task.cancel()
@@ -0,0 +1,162 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Type
+
+
+class TTLCache:
+    """
+    Keep the answers of read-only calls for a while
+
+    Entries expire ``ttl`` seconds after they were stored and the least
+    recently used entry is dropped once ``max_size`` entries are kept.
+    Concurrent misses of the same key wait on a single call instead of each
+    sending their own. Negative answers (a value matching ``negative`` or one
+    of the ``errors`` given to :meth:`get_or_load`) are kept ``negative_ttl``
+    seconds, errors are raised again on every hit.
+
+    Arguments:
+        ttl: float, seconds an entry stays valid
+        max_size [optional]: integer, number of entries kept
+        negative_ttl [optional]: float, seconds a negative entry stays valid, ttl by default
+    """
+
+    def __init__(self, ttl: float, *, max_size: int = 10_000, negative_ttl: Optional[float] = None) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self.hits = 0
+        self.misses = 0
+        self.__entries: 'OrderedDict[Hashable, Tuple[float, Any, Optional[BaseException]]]' = OrderedDict()
+        self.__loads: Dict[Hashable, 'asyncio.Future[Any]'] = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def lookup(self, key: Hashable) -> Optional[Tuple[Any, Optional[BaseException]]]:
+        """
+        Method to get a valid entry without loading it
+
+        Arguments:
+            key: hashable
+
+        Returns:
+            Tuple: (value, cached error), None on a miss
+        """
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self.__entries[key]
+            return None
+        self.__entries.move_to_end(key)
+        return entry[1], entry[2]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Method to get a valid value without loading it, a cached error is raised"""
+        entry = self.lookup(key)
+        if entry is None:
+            return default
+        if entry[1] is not None:
+            raise entry[1]
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, error: Optional[BaseException] = None) -> None:
+        """Method to store a value (or an error to raise again), for ``ttl`` seconds or the cache ttl"""
+        self.__entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, error)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Method to drop an entry, or every entry when no key is given
+
+        Calls already in flight for the dropped keys still answer their callers
+        but their result is not stored, it may predate the invalidation.
+        """
+        if key is None:
+            self.__entries.clear()
+            self.__loads.clear()
+        else:
+            self.__entries.pop(key, None)
+            self.__loads.pop(key, None)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Any]],
+        negative: Optional[Callable[[Any], bool]] = None,
+        errors: Tuple[Type[BaseException], ...] = ()
+        ) -> Any:
+        """
+        Method to get an entry, calling ``load`` only on a miss
+
+        Arguments:
+            key: hashable
+            load: coroutine function returning the value to store
+            negative [optional]: callable telling if a value is a negative answer
+            errors [optional]: exception types cached as negative answers
+
+        Returns:
+            value
+        """
+        entry = self.lookup(key)
+        if entry is not None:
+            self.hits += 1
+            if entry[1] is not None:
+                raise entry[1]
+            return entry[0]
+
+        task = self.__loads.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(load())
+            self.__loads[key] = task
+            task.add_done_callback(functools.partial(self.__loaded, key, negative, errors))
+        else:
+            self.hits += 1
+        # a cancelled caller must not cancel the call the others wait on
+        return await asyncio.shield(task)
+
+    def __loaded(
+        self,
+        key: Hashable,
+        negative: Optional[Callable[[Any], bool]],
+        errors: Tuple[Type[BaseException], ...],
+        task: 'asyncio.Future[Any]'
+        ) -> None:
+        if self.__loads.get(key) is not task:
+            # invalidated while in flight
+            return
+        del self.__loads[key]
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            value = task.result()
+            negative_answer = negative is not None and negative(value)
+            self.set(key, value, self.negative_ttl if negative_answer else None)
+        elif errors and isinstance(error, errors):
+            self.set(key, None, self.negative_ttl, error)
@@ -0,0 +1,264 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import secrets
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Mapping, Optional, Set, Tuple, TYPE_CHECKING
+
+from .poller import TERMINAL_STATUSES
+from ..log import logger
+
+if TYPE_CHECKING:
+    from aiohttp import web
+    from .poller import StatusPoller
+
+_log = logger.getChild('callback')
+
+Fetch = Callable[[str], Awaitable[Tuple[bool, Any]]]
+
+"""
+Note : MTN calls the X-Callback-Url given when the transaction was created. The
+receiver hands out one URL per reference id (``url_for``) carrying a random
+token, and answers 404 to any other URL. The body of a callback is never
+trusted: it only triggers a read of the status from MTN.
+"""
+
+
+class _Issued:
+    __slots__ = ('token', 'fetch', 'task')
+
+    def __init__(self, token: str, fetch: Fetch) -> None:
+        self.token = token
+        self.fetch = fetch
+        self.task: Optional['asyncio.Future[None]'] = None
+
+
+class CallbackReceiver:
+    """
+    Receive MTN callbacks and resolve the calls waiting for them
+
+    The receiver runs a small :mod:`aiohttp.web` server. A callback is only
+    accepted on a URL given by :meth:`url_for`, and makes the receiver read
+    the status of its reference id from MTN. Statuses read this way fill a
+    bounded cache, so status lookups of finished transactions can skip the
+    network, and resolve the futures returned by :meth:`expect`.
+
+    Arguments:
+        public_url: string, URL MTN can reach the receiver at (e.g. https://example.com)
+        host [optional]: string, interface to listen on
+        port [optional]: integer, port to listen on
+        path [optional]: string, path of the callback route
+        cache_size [optional]: integer, number of statuses kept, and of URLs given out still accepted
+        terminal [optional]: set of statuses that are final
+    """
+
+    def __init__(
+        self,
+        public_url: str,
+        *,
+        host: str = '0.0.0.0',
+        port: int = 8080,
+        path: str = '/momo/callback',
+        cache_size: int = 100_000,
+        terminal: FrozenSet[str] = TERMINAL_STATUSES
+        ) -> None:
+        self.public_url = public_url.rstrip('/')
+        self.host = host
+        self.port = port
+        self.path = '/' + path.strip('/')
+        self.cache_size = cache_size
+        self.terminal = terminal
+        self.__statuses: 'OrderedDict[str, Mapping[str, Any]]' = OrderedDict()
+        self.__issued: 'OrderedDict[str, _Issued]' = OrderedDict()
+        self.__waiters: Dict[str, 'asyncio.Future[Mapping[str, Any]]'] = {}
+        self.__tasks: Set['asyncio.Future[None]'] = set()
+        self.__runner: Optional['web.AppRunner'] = None
+
+    async def __aenter__(self) -> 'CallbackReceiver':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    def url_for(self, reference_id: str, fetch: Fetch) -> str:
+        """
+        Method to get the X-Callback-Url to send with a transaction
+
+        Arguments:
+            reference_id: string
+            fetch: coroutine function taking the reference id and returning the
+                ``(boolean, data)`` tuple of its status method, called on each callback
+
+        Returns:
+            URL: string, the same for the same reference id
+        """
+        issued = self.__issued.get(reference_id)
+        if issued is None:
+            issued = self.__issued[reference_id] = _Issued(secrets.token_urlsafe(16), fetch)
+            while len(self.__issued) > self.cache_size:
+                self.__issued.popitem(last=False)
+        else:
+            issued.fetch = fetch
+        return f'{self.public_url}{self.path}/{reference_id}/{issued.token}'
+
+    def application(self) -> 'web.Application':
+        """
+        Method to get the aiohttp application, to mount it in an existing server
+
+        Returns:
+            aiohttp.web.Application
+        """
+        from aiohttp import web
+
+        app = web.Application()
+        for method in ('POST', 'PUT'):
+            app.router.add_route(method, self.path + '/{reference_id}/{token}', self.__handle)
+        return app
+
+    async def start(self) -> None:
+        """Method to start listening for callbacks"""
+        from aiohttp import web
+
+        if self.__runner is None:
+            runner = web.AppRunner(self.application())
+            await runner.setup()
+            await web.TCPSite(runner, self.host, self.port).start()
+            self.__runner = runner
+
+    async def stop(self) -> None:
+        """Method to stop listening, pending futures and status reads are cancelled"""
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+        tasks = list(self.__tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for future in self.__waiters.values():
+            future.cancel()
+        self.__waiters.clear()
+
+    def status(self, reference_id: str) -> Optional[Mapping[str, Any]]:
+        """
+        Method to get the last status read after a callback for a reference id
+
+        Arguments:
+            reference_id: string
+
+        Returns:
+            status data: dictionary, None when nothing was read
+        """
+        return self.__statuses.get(reference_id)
+
+    def final_status(self, reference_id: str) -> Optional[Mapping[str, Any]]:
+        """Method to get the status read after a callback of a reference id only when it is final"""
+        data = self.__statuses.get(reference_id)
+        if data is not None and data.get('status') in self.terminal:
+            return data
+        return None
+
+    def expect(self, reference_id: str) -> 'asyncio.Future[Mapping[str, Any]]':
+        """
+        Method to get a future resolved once a callback of a reference id gave its final status
+
+        Arguments:
+            reference_id: string
+
+        Returns:
+            Future of the status data
+        """
+        future = self.__waiters.get(reference_id)
+        if future is None or future.cancelled():
+            future = asyncio.get_event_loop().create_future()
+            data = self.final_status(reference_id)
+            if data is not None:
+                future.set_result(data)
+            else:
+                self.__waiters[reference_id] = future
+        return future
+
+    async def wait(self, reference_id: str, timeout: float, fallback: Optional['StatusPoller'] = None) -> Mapping[str, Any]:
+        """
+        Method to wait for the final status of a reference id
+
+        When no callback gives it within ``timeout`` seconds, the reference id is
+        handed to the ``fallback`` poller, otherwise ``asyncio.TimeoutError`` is raised.
+
+        Arguments:
+            reference_id: string
+            timeout: float
+            fallback [optional]: StatusPoller
+
+        Returns:
+            status data: dictionary
+        """
+        future = self.expect(reference_id)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if fallback is None:
+                #nobody waits for it any more, a later callback still fills the cache
+                if self.__waiters.get(reference_id) is future:
+                    del self.__waiters[reference_id]
+                raise
+        data = await fallback.wait(reference_id)
+        self.__store(reference_id, data)
+        return data
+
+    def __store(self, reference_id: str, data: Mapping[str, Any]) -> None:
+        self.__statuses[reference_id] = data
+        self.__statuses.move_to_end(reference_id)
+        while len(self.__statuses) > self.cache_size:
+            self.__statuses.popitem(last=False)
+
+        if data.get('status') in self.terminal:
+            self.__issued.pop(reference_id, None)
+            future = self.__waiters.pop(reference_id, None)
+            if future is not None and not future.done():
+                future.set_result(data)
+
+    async def __read(self, reference_id: str, issued: _Issued) -> None:
+        try:
+            _, data = await issued.fetch(reference_id)
+        except Exception as e:
+            #the next callback, or the fallback poller, tries again
+            _log.warning('status read after a callback failed: %r', e, extra={'reference_id': reference_id})
+            return
+        finally:
+            issued.task = None
+        if isinstance(data, Mapping):
+            self.__store(reference_id, data)
+
+    async def __handle(self, request: 'web.Request') -> 'web.Response':
+        from aiohttp import web
+
+        reference_id = request.match_info['reference_id']
+        issued = self.__issued.get(reference_id)
+        if issued is None or not secrets.compare_digest(issued.token.encode(), request.match_info['token'].encode()):
+            return web.Response(status=404)
+
+        #the body is not read: anyone knowing the URL could write it
+        if issued.task is None:
+            task = issued.task = asyncio.ensure_future(self.__read(reference_id, issued))
+            self.__tasks.add(task)
+            task.add_done_callback(self.__tasks.discard)
+        return web.Response(status=200)
@@ -18,13 +18,17 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
 
+import time
+from .bulk import BulkReport, BulkResult, run_bulk
 from .http import HTTPClient
-from .route import Route
-from typing import Dict, Optional, Tuple
-from ..utils.utils import is_valid_bearer_token, is_valid_basic_token, COLLECTION_PATH, errors_manager, is_valid_id_4
-from ..errors.errors import InvalidBasicToken, InvalidBearerToken, InvalidUniqueIDVersion
-
-class Collection:
+from .poller import StatusPoller
+from .product import Product
+from .validate import PaymentValidator
+from ..errors.errors import InvalidPayment
+from typing import Any, AsyncIterator, ClassVar, Dict, Iterable, Optional, Tuple, Union
+from ..utils.utils import get_reference_id
+
+class Collection(Product):
     """
     Represent Collection Client used by collection user
 
@@ -36,9 +40,11 @@ class Collection:
         None
     """
 
+    product: ClassVar[str] = 'collection'
+    STATUS_KEYS: ClassVar[Dict[str, str]] = {'request_to_pay': 'request_to_pay_status', 'withdraw': 'withdraw_status'}
+
     def __init__(self, http: HTTPClient,  subscription_key: str)->None:
-        self.subscription_key = subscription_key
-        self.http = http
+        super().__init__(http, subscription_key)
 
     async def create_access_token(self, authorization: str)-> Tuple:
         """
@@ -50,142 +56,68 @@ class Collection:
         Return:
             Tuple : (boolean, data)
         """
+        return await self._access_token(authorization)
 
-        if is_valid_basic_token(authorization):
-
-            headers = {'Authorization':authorization, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-            
-            response = await self.http.request(Route('POST', 
-            COLLECTION_PATH['create_access_token'][Route.ENV[self.http.isLive]],
-            self.http.isLive,
-            headers))
-
-            if response.status == 200:
-                #want to return a true cause anything can happen, just for a check purpose
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBasicToken('Invalid Basic Token Type given')
-
-    async def get_account_balance(self, authorization: str, target: str)->Tuple:
+    async def get_account_balance(self, authorization: Optional[str], target: str)->Tuple:
         """
         Method to get balance for collection user
 
         Arguments:
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
 
         Return
             Tuple : (boolean, data)
         """
+        return await self._get('get_account_balance', authorization, target)
 
-        if is_valid_bearer_token(authorization):
-
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET', 
-                COLLECTION_PATH['get_account_balance'][Route.ENV[self.http.isLive]],
-                self.http.isLive,
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def get_account_balance_in(self, currency: str, authorization: str, target: str)->Tuple:
+    async def get_account_balance_in(self, currency: str, authorization: Optional[str], target: str)->Tuple:
         """
         Method to get balance in specific currency for collection user
 
         Arguments:
             currency: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
 
         Return:
             Tuple: (boolean, data)
         """
+        return await self._get('get_account_balance_in', authorization, target, {'currency': currency})
 
-        if is_valid_bearer_token(authorization):
-
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET', 
-                COLLECTION_PATH['get_account_balance_in'][Route.ENV[self.http.isLive]].format(currency=currency),
-                self.http.isLive,
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-            
-        
-    async def get_basic_user_info(self, msisdn: str, authorization: str, target: str)-> Tuple:
+    async def get_basic_user_info(self, msisdn: str, authorization: Optional[str], target: str)-> Tuple:
         """
         Method to get basic user info without consent for collection user
 
         Arguments:
             msisdn: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
             
         Retruns:
             Tuple : (boolean, data)
         """
-        if is_valid_bearer_token(authorization):
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
+        return await self._get('get_basic_info', authorization, target, {'MSISDN': msisdn})
 
-            response = await self.http.request(Route('GET',
-                COLLECTION_PATH['get_basic_info'][Route.ENV[self.http.isLive]].format(MSISDN=msisdn),
-                self.http.isLive,
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def ask_user_info(self, authorization: str, target: str) -> Tuple:
+    async def ask_user_info(self, authorization: Optional[str], target: str) -> Tuple:
         """
         Method to get user info with consent for collection user
 
         Arguments:
-            authorization: string
+            authorization: string, None uses the managed access token
             target : string
         
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._get('get_user_info', authorization, target)
 
-        if is_valid_bearer_token(authorization):
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET',
-                COLLECTION_PATH['get_user_info'][Route.ENV[self.http.isLive]],
-                self.http.isLive, 
-                headers))
-            
-            if response.status == 200:
-                return(True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def request_to_pay(self, authorization: str, uuid: str, target: str, body: Dict, callback: Optional[str]=None) -> Tuple:
+    async def request_to_pay(self, authorization: Optional[str], uuid: str, target: str, body: Dict, callback: Optional[str]=None) -> Tuple:
         """
         Method to request a payment for collection user
 
         Arguments:
-            authorization: string
+            authorization: string, None uses the managed access token
             uuid: string
             target: string
             body: dictionary
@@ -194,77 +126,116 @@ class Collection:
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._payment('request_to_pay', authorization, uuid, target, body, callback)
 
-        if is_valid_bearer_token(authorization):
-
-            #check if uuid is valid and raise error if not
-            self.http.uuid_checker(uuid)
-            
-            #callback url is optional, check if parsed and replace the key to avoid any error if not
-            callkey = 'X-Callback-Url'
-            if callback is None:
-                callback = "No callback url given"
-                callkey = "No-callback-Url"
-
-            headers = {'Authorization':authorization, 
-                'X-Target-Environment':target, 
-                'Ocp-Apim-Subscription-Key':self.subscription_key,
-                'X-Reference-Id':uuid,
-                'Content-Type':'application/json',
-                callkey:callback
-                }
-            
-            response = await self.http.request(Route('POST', 
-                COLLECTION_PATH['request_to_pay'][Route.ENV[self.http.isLive]],
-                self.http.isLive, 
-                headers, 
-                body))
-
-            if response.status == 202:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-    
-    async def get_withdraw_status(self, authorization: str, uuid: str, target : str = 'sandbox') -> Tuple:
+    async def get_request_to_pay_status(self, authorization: Optional[str], uuid: str, target: str) -> Tuple:
         """
-        Method to get a withdrawal status for collection user
+        Method to get a request to pay status for collection user
 
         Arguments:
-            authorization: string
+            authorization: string, None uses the managed access token
             uuid: string
             target: string
-        
+
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._status('request_to_pay_status', authorization, uuid, target)
+
+    async def iter_request_to_pay(
+        self,
+        items: Iterable[Union[Dict, Tuple[str, Dict]]],
+        target: str,
+        authorization: Optional[str] = None,
+        callback: Optional[str] = None,
+        concurrency: int = 10,
+        validate: bool = True
+        ) -> AsyncIterator[BulkResult]:
+        """
+        Method to request many payments, yielding each outcome as soon as it is known
 
-        if is_valid_bearer_token(authorization):
-            
-            self.http.uuid_checker(uuid)
+        A failed item never stops the batch, its error is reported in its result.
+        Invalid items fail with InvalidPayment without being sent.
+
+        Arguments:
+            items: iterable of bodies, or of (uuid, body) tuples to choose the reference ids
+            target: string
+            authorization [optional]: string, None uses the managed access token
+            callback [optional]: string
+            concurrency [optional]: integer, maximum number of requests in flight
+            validate [optional]: boolean, check every item before sending it
 
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
+        Returns:
+            async iterator of BulkResult
+        """
+        validator = PaymentValidator('request_to_pay') if validate else None
 
-            response = await self.http.request(Route('GET', 
-                COLLECTION_PATH['withdraw_status'][Route.ENV[self.http.is_Live]].format(referenceId=uuid),
-                self.http.is_Live,
-                headers))
-            
-            if response.status == 200:
-                return (True, self.http.data)
+        async def call(index: int, item: Union[Dict, Tuple[str, Dict]]) -> BulkResult:
+            if isinstance(item, tuple):
+                uuid, body = item
+                problems = validator.check(body, uuid) if validator is not None else None
             else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-    
+                uuid, body = get_reference_id(), item
+                problems = validator.check(body) if validator is not None else None
+            if problems:
+                return BulkResult(index, uuid, error=InvalidPayment(problems))
+            try:
+                _, data = await self.request_to_pay(authorization, uuid, target, body, callback)
+            except Exception as e:
+                return BulkResult(index, uuid, getattr(e, 'status', None), error=e)
+            return BulkResult(index, uuid, 202, data)
+
+        async for result in run_bulk(items, call, concurrency):
+            yield result
+
+    async def request_to_pay_many(
+        self,
+        items: Iterable[Union[Dict, Tuple[str, Dict]]],
+        target: str,
+        authorization: Optional[str] = None,
+        callback: Optional[str] = None,
+        concurrency: int = 10,
+        validate: bool = True
+        ) -> BulkReport:
+        """
+        Method to request many payments over the pooled connections
+
+        Arguments:
+            items: iterable of bodies, or of (uuid, body) tuples to choose the reference ids
+            target: string
+            authorization [optional]: string, None uses the managed access token
+            callback [optional]: string
+            concurrency [optional]: integer, maximum number of requests in flight
+            validate [optional]: boolean, check every item before sending it
+
+        Returns:
+            BulkReport: per item results ordered like the input, and the batch duration
+        """
+        start = time.perf_counter()
+        results = [result async for result in self.iter_request_to_pay(items, target, authorization, callback, concurrency, validate)]
+        results.sort(key=lambda result: result.index)
+        return BulkReport(results, time.perf_counter() - start)
+
+    async def get_withdraw_status(self, authorization: Optional[str], uuid: str, target : str = 'sandbox') -> Tuple:
+        """
+        Method to get a withdrawal status for collection user
+
+        Arguments:
+            authorization: string, None uses the managed access token
+            uuid: string
+            target: string
+        
+        Returns:
+            Tuple: (boolean, data)
+        """
+        return await self._status('withdraw_status', authorization, uuid, target)
 
-    async def withdraw(self, authorization: str, uuid: str, target: str, body: Dict, callback: Optional[str]=None) -> Tuple:
+    async def withdraw(self, authorization: Optional[str], uuid: str, target: str, body: Dict, callback: Optional[str]=None) -> Tuple:
         """
         Method to withdraw money for collection user
 
         Arguments:
-            authorization: string
+            authorization: string, None uses the managed access token
             uuid: string
             target: srting
             body: dictionary
@@ -273,63 +244,44 @@ class Collection:
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._payment('withdraw', authorization, uuid, target, body, callback)
 
-        if is_valid_bearer_token(authorization):
-
-            #check if uuid is valid and raise error if not
-            self.http.uuid_checker(uuid)
-            
-            #callback url is optional, check if parsed and replace the key to avoid any error if not
-            callkey = 'X-Callback-Url'
-            if callback is None:
-                callback = "No callback url given"
-                callkey = "No-callback-Url"
-
-            headers = {'Authorization':authorization, 
-                'X-Target-Environment':target, 
-                'Ocp-Apim-Subscription-Key':self.subscription_key,
-                'X-Reference-Id':uuid,
-                'Content-Type':'application/json',
-                callkey:callback
-                }
-            
-            response = await self.http.request(Route('POST', 
-                COLLECTION_PATH['withdraw'][Route.ENV[self.http.isLive]],
-                self.http.isLive, 
-                headers, 
-                body))
-
-            if response.status == 202:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-
-    async def isActive(self, account: str, account_type: Optional[str]='msisdn', authorization : Optional[str]=None, target : str = 'sandbox') -> Tuple:
+    async def isActive(self, account: str, account_type: Optional[str]='msisdn', authorization: Optional[str]=None, target : str = 'sandbox') -> Tuple:
         """
         Method to check if an account is active for a collection user
 
         Arguments:
             account: string
             account_type [optional default set to 'msisdn']: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
 
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._get('is_active', authorization, target, self._active_params(account, account_type))
 
-        headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
+    def status_poller(self, target: str, kind: str = 'request_to_pay', authorization: Optional[str] = None, **options: Any) -> StatusPoller:
+        """
+        Method to get a poller waiting for many transactions to finish
 
-        response = await self.http.request(Route('GET',
-            COLLECTION_PATH['is_active'][Route.ENV[self.http.isLive]].format(accountHolderIdType=account_type, accountHolderId=account),
-            self.http.is_Live,
-            headers))
-        
-        if response.status == 200:
-            return (True, self.http.data)
+        Arguments:
+            target: string
+            kind [optional]: 'request_to_pay' or 'withdraw'
+            authorization [optional]: string, None uses the managed access token
+            options [optional]: StatusPoller settings (initial_delay, max_delay, timeout...)
+
+        Returns:
+            StatusPoller
+        """
+        if kind == 'request_to_pay':
+            get_status = self.get_request_to_pay_status
+        elif kind == 'withdraw':
+            get_status = self.get_withdraw_status
         else:
-            errors_manager(response, self.http.data)
+            raise ValueError(f'Unknown status kind {kind!r}')
+
+        async def fetch(uuid: str) -> Tuple:
+            return await get_status(authorization, uuid, target)
 
-    
\ No newline at end of file
+        return StatusPoller(fetch, **options)
@@ -18,16 +18,15 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
 
-from typing import Dict, Tuple, Optional
+from typing import Any, ClassVar, Dict, Tuple, Optional
 
-from ..errors.errors import InvalidBasicToken, InvalidBearerToken
-
-from ..utils.utils import errors_manager, is_valid_basic_token, is_valid_bearer_token, DISBURSEMENTS_PATH
 from .http import HTTPClient
-from .route import Route
+from .payout import PayoutSummary, run_payouts
+from .poller import StatusPoller
+from .product import Product
 
 
-class Disbursements:
+class Disbursements(Product):
     """
     Represent Disbursement Client used by disbursement user
 
@@ -38,9 +37,12 @@ class Disbursements:
     Returns:
         None
     """
-    def __init__(self, http: HTTPClient, subscripyion_key: str)->None:
-        self.http = http
-        self.subscripyion_key = subscripyion_key
+
+    product: ClassVar[str] = 'disbursement'
+    STATUS_KEYS: ClassVar[Dict[str, str]] = {'transfer': 'get_transfer_status', 'deposit': 'get_deposit_status', 'refund': 'get_refund_status'}
+
+    def __init__(self, http: HTTPClient, subscription_key: str)->None:
+        super().__init__(http, subscription_key)
 
     async def create_access_token(self, authorization: str) -> Tuple:
         """
@@ -52,169 +54,83 @@ class Disbursements:
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._access_token(authorization)
 
-        if is_valid_basic_token(authorization):
-            headers = {"Authorization":authorization, "Ocp-Apim-Subscription-Key":self.subscripyion_key}
-            response = await self.http.request(Route('POST', 
-                DISBURSEMENTS_PATH['create_access_token'][Route.ENV[self.http.isLive]],
-                self.http.isLive, 
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBasicToken('Invalid Basic Token Type given')
-
-    async def get_account_balance(self, authorization: str, target: str)->Tuple:
+    async def get_account_balance(self, authorization: Optional[str], target: str)->Tuple:
         """
         Method to get account balance for Disbursement user
 
         Arguments:
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
 
         Returns:
             Tuple: (boolean, data)
         """
-        if is_valid_bearer_token(authorization):
+        return await self._get('get_account_balance', authorization, target)
 
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET', 
-                DISBURSEMENTS_PATH['get_account_balance'][Route.ENV[self.http.isLive]],
-                self.http.isLive,
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def get_account_balance_in(self, currency: str, authorization: str, target: str)->Tuple:
+    async def get_account_balance_in(self, currency: str, authorization: Optional[str], target: str)->Tuple:
         """
         Method to get balance in specific currency for disbursement user
 
         Arguements:
             currency: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target:string
         
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._get('get_account_balance_in', authorization, target, {'currency': currency})
 
-        if is_valid_bearer_token(authorization):
-
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET', 
-                DISBURSEMENTS_PATH['get_account_balance_in'][Route.ENV[self.http.isLive]].format(currency=currency),
-                self.http.isLive,
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def get_basic_user_info(self, msisdn: str, authorization: str, target: str)-> Tuple:
+    async def get_basic_user_info(self, msisdn: str, authorization: Optional[str], target: str)-> Tuple:
         """
         Method to get basic user info without consent for disbursement user
 
         Arguments:
             msisdn: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
 
         Returns:
             Tuple: (boolean, data)
         """
-        if is_valid_bearer_token(authorization):
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET',
-                DISBURSEMENTS_PATH['get_basic_info'][Route.ENV[self.http.isLive]].format(MSISDN=msisdn),
-                self.http.isLive,
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def ask_user_info(self, authorization: str, target: str) -> Tuple:
+        return await self._get('get_basic_info', authorization, target, {'MSISDN': msisdn})
+
+    async def ask_user_info(self, authorization: Optional[str], target: str) -> Tuple:
         """
         Method to get user info with consent for disbursement user
 
         Arguments:
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
 
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._get('get_user_info', authorization, target)
 
-        if is_valid_bearer_token(authorization):
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET',
-                DISBURSEMENTS_PATH['get_user_info'][Route.ENV[self.http.isLive]],
-                self.http.isLive, 
-                headers))
-            
-            if response.status == 200:
-                return(True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def get_deposit_status(self, uuid: str, authorization: str, target: str) -> Tuple:
+    async def get_deposit_status(self, uuid: str, authorization: Optional[str], target: str) -> Tuple:
         """
-        Method to get transfer status for disbursement user
+        Method to get deposit status for disbursement user
 
         Arguments:
             uuid: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
 
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._status('get_deposit_status', authorization, uuid, target)
 
-        if is_valid_bearer_token(authorization):
-
-            self.http.uuid_checker(uuid)
-
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET', 
-                DISBURSEMENTS_PATH['get_tranfer_status'][Route.ENV[self.http.isLive]].format(referenceId=uuid),
-                self.http.isLive, 
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            InvalidBearerToken('Invalid Bearer Token Type given')
-         
-    async def deposit(self, uuid: str, authorization: str, target:str, body: Dict, url_callback: Optional[str]= None) -> Tuple:
+    async def deposit(self, uuid: str, authorization: Optional[str], target:str, body: Dict, url_callback: Optional[str]= None) -> Tuple:
         """
         Method to deposit for disbursement user 
 
         Arguments:
             uuid: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
             body: dictionary
             url_callback [optional]: string
@@ -222,45 +138,15 @@ class Disbursements:
         Returns:
             Tuple: (boolean, data)
         """
-        
-        if is_valid_bearer_token(authorization):
-
-            self.http.uuid_checker(uuid)
-
-            callkey = 'X-Callback-Url'
-            if url_callback is None:
-                url_callback = "No callback url given"
-                callkey = "No-callback-Url"
-
-            headers = {
-                'Authorization':authorization, 
-                'X-Target-Environment':target, 
-                'Ocp-Apim-Subscription-Key':self.subscription_key,
-                'X-Reference-Id':uuid,
-                'Content-Type':'application/json',
-                callkey:url_callback
-            }
-
-            response = await self.http.request(Route('POST', 
-                DISBURSEMENTS_PATH['deposit'][Route.ENV[self.http.isLive]],
-                headers, 
-                body))
-            
-            if response.status == 202:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def transfer(self, uuid: str, authorization: str, target:str, body: Dict, url_callback: Optional[str]= None) -> Tuple:
+        return await self._payment('deposit', authorization, uuid, target, body, url_callback)
+
+    async def transfer(self, uuid: str, authorization: Optional[str], target:str, body: Dict, url_callback: Optional[str]= None) -> Tuple:
         """
         Method to transfer for disbursement user 
 
         Arguments:
             uuid: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
             body: dictionary
             url_callback [optional]: string
@@ -268,46 +154,16 @@ class Disbursements:
         Returns:
             Tuple: (boolean, data)
         """
-        
-        if is_valid_bearer_token(authorization):
-
-            self.http.uuid_checker(uuid)
-
-            callkey = 'X-Callback-Url'
-            if url_callback is None:
-                url_callback = "No callback url given"
-                callkey = "No-callback-Url"
-
-            headers = {
-                'Authorization':authorization, 
-                'X-Target-Environment':target, 
-                'Ocp-Apim-Subscription-Key':self.subscription_key,
-                'X-Reference-Id':uuid,
-                'Content-Type':'application/json',
-                callkey:url_callback
-            }
-
-            response = await self.http.request(Route('POST', 
-                DISBURSEMENTS_PATH['transfer'][Route.ENV[self.http.isLive]],
-                headers, 
-                body))
-            
-            if response.status == 202:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def refund(self, uuid: str, authorization: str, target:str, body: Dict, url_callback: Optional[str]= None) -> Tuple:
+        return await self._payment('transfer', authorization, uuid, target, body, url_callback)
+
+    async def refund(self, uuid: str, authorization: Optional[str], target:str, body: Dict, url_callback: Optional[str]= None) -> Tuple:
 
         """
         Method to transfer for disbursement user 
 
         Arguements:
             uuid: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
             body: dictionary
             url_callback [optional]: string
@@ -315,126 +171,105 @@ class Disbursements:
         Returns:
             Tuple: (boolean, data)
         """
-        
-        if is_valid_bearer_token(authorization):
-
-            self.http.uuid_checker(uuid)
-
-            callkey = 'X-Callback-Url'
-            if url_callback is None:
-                url_callback = "No callback url given"
-                callkey = "No-callback-Url"
-
-            headers = {
-                'Authorization':authorization, 
-                'X-Target-Environment':target, 
-                'Ocp-Apim-Subscription-Key':self.subscription_key,
-                'X-Reference-Id':uuid,
-                'Content-Type':'application/json',
-                callkey:url_callback
-            }
-
-            response = await self.http.request(Route('POST', 
-                DISBURSEMENTS_PATH['refund'][Route.ENV[self.http.isLive]],
-                headers, 
-                body))
-            
-            if response.status == 202:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def get_transfer_status(self, uuid: str, authorization: str, target: str) -> Tuple:
+        return await self._payment('refund', authorization, uuid, target, body, url_callback)
+
+    async def get_transfer_status(self, uuid: str, authorization: Optional[str], target: str) -> Tuple:
         """
         Method to get transfer status for disbursement user
 
         Arguments:
             uuid: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
 
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._status('get_transfer_status', authorization, uuid, target)
 
-        if is_valid_bearer_token(authorization):
-
-            self.http.uuid_checker(uuid)
-
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-            
-            response = await self.http.request(Route('GET',
-                DISBURSEMENTS_PATH['get_transfer_status'][Route.ENV[self.http.isLive]].format(referenceId=uuid),
-                self.http.isLive, 
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-     
-    async def get_refund_status(self, uuid: str, authorization: str, target: str) -> Tuple:
+    async def get_refund_status(self, uuid: str, authorization: Optional[str], target: str) -> Tuple:
         """
         Method to get transfer status for disbursement user
 
         Arguments:
             uuid: string
-            authorization: string
+            authorization: string, None uses the managed access token
             target: string
         
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._status('get_refund_status', authorization, uuid, target)
 
-        if is_valid_bearer_token(authorization):
-
-            self.http.uuid_checker(uuid)
-
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-            
-            response = await self.http.request(Route('GET',
-                DISBURSEMENTS_PATH['get_refund_status'][Route.ENV[self.http.isLive]].format(referenceId=uuid),
-                self.http.isLive, 
-                headers))
-
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
-    async def isActive(self, account: str, authorization : str, account_type: Optional[str]='msisdn',  target : str = 'sandbox') -> Tuple:
+    async def isActive(self, account: str, authorization: Optional[str], account_type: Optional[str]='msisdn',  target : str = 'sandbox') -> Tuple:
         """
         Method to check if an account is active for a disbursement user
 
         Arguements:
             account: string
-            authorization: string
+            authorization: string, None uses the managed access token
             account_type [optional default set to 'msisdn']: string
             target: string
 
         Returns:
             Tuple: (boolean, data)
         """
+        return await self._get('is_active', authorization, target, self._active_params(account, account_type))
+
+    async def payout_file(
+        self,
+        source: str,
+        output: str,
+        target: str,
+        operation: str = 'transfer',
+        authorization: Optional[str] = None,
+        url_callback: Optional[str] = None,
+        concurrency: int = 10,
+        checkpoint: Optional[str] = None,
+        run_id: Optional[str] = None
+        ) -> PayoutSummary:
+        """
+        Method to pay every row of a CSV or JSONL file with constant memory
 
-        if is_valid_bearer_token(authorization):
-            headers = {'Authorization':authorization, 'X-Target-Environment':target, 'Ocp-Apim-Subscription-Key':self.subscription_key}
-
-            response = await self.http.request(Route('GET',
-                DISBURSEMENTS_PATH['is_active'][Route.ENV[self.http.isLive]].format(accountHolderIdType=account_type, accountHolderId=account),
-                self.http.is_Live,
-                headers))
-            
-            if response.status == 200:
-                return (True, self.http.data)
-            else:
-                errors_manager(response, self.http.data)
-        else:
-            raise InvalidBearerToken('Invalid Bearer Token Type given')
-        
+        Arguments:
+            source: string, CSV or JSONL file
+            output: string, JSON lines file the per row results are appended to
+            target: string
+            operation [optional]: 'transfer' or 'deposit'
+            authorization [optional]: string, None uses the managed access token
+            url_callback [optional]: string
+            concurrency [optional]: integer, maximum number of requests in flight
+            checkpoint [optional]: string, file used to resume after a crash
+            run_id [optional]: string, namespace of the reference ids, the source file path by default
+
+        Returns:
+            PayoutSummary
+        """
+        return await run_payouts(self, source, output, target, operation, authorization,
+            url_callback, concurrency, checkpoint, run_id=run_id)
+
+    def status_poller(self, target: str, kind: str = 'transfer', authorization: Optional[str] = None, **options: Any) -> StatusPoller:
+        """
+        Method to get a poller waiting for many transactions to finish
+
+        Arguments:
+            target: string
+            kind [optional]: 'transfer', 'deposit' or 'refund'
+            authorization [optional]: string, None uses the managed access token
+            options [optional]: StatusPoller settings (initial_delay, max_delay, timeout...)
+
+        Returns:
+            StatusPoller
+        """
+        get_status = {
+            'transfer': self.get_transfer_status,
+            'deposit': self.get_deposit_status,
+            'refund': self.get_refund_status
+        }.get(kind)
+        if get_status is None:
+            raise ValueError(f'Unknown status kind {kind!r}')
+
+        async def fetch(uuid: str) -> Tuple:
+            return await get_status(uuid, authorization, target)
+
+        return StatusPoller(fetch, **options)
@@ -23,11 +23,20 @@ import asyncio
 import datetime
 import logging
 import aiohttp
-import json
-from typing import ClassVar, Tuple, Union, Dict, Any, Optional
+import time
+from typing import ClassVar, Tuple, Union, Dict, Any, Mapping, Optional
 from ..utils import utils
-from ..errors.errors import Conflict, MomoException, HTTPException, Unauthorized, MomoServerError, InvalidData, InvalidUniqueIDVersion
-from .route import Route
+from ..errors.errors import Conflict, MomoException, MomoConnectionError, HTTPException, Unauthorized, MomoServerError, InvalidData, InvalidUniqueIDVersion
+from .route import Route, EndpointTable
+from .response import MomoResponse
+from .ratelimit import RateLimiter, parse_retry_after
+from .retry import RetryPolicy
+from .breaker import CircuitBreakers
+from .models import MODELS
+from .metrics import MetricsSink, CallTimings, PHASES, timing_trace_config
+from ..log import logger
+
+_log = logger.getChild('http')
 """
 Note : Authorization is api user ID and api key
 """
@@ -36,32 +45,100 @@ Note : Authorization is api user ID and api key
 
 
 class HTTPClient:
-    """Represent the HTTP client"""
+    """Represent the HTTP client
+
+    The client keeps one :class:`aiohttp.ClientSession` alive between requests so
+    that connections are pooled and reused instead of paying a new TCP + TLS
+    handshake on every call. Call :meth:`close` (or use the owning
+    :class:`~mobilemoney.Client` as an async context manager) when done.
+
+    Arguments:
+        connector [optional]: aiohttp.BaseConnector shared with other clients,
+            it is never closed by this client
+        limit [optional]: integer, total number of pooled connections
+        limit_per_host [optional]: integer, pooled connections per host (0 means no limit)
+        keepalive_timeout [optional]: float, seconds an idle connection is kept open
+        ttl_dns_cache [optional]: integer, seconds DNS lookups are cached
+        rate_limiter [optional]: RateLimiter queueing calls per subscription key,
+            product and route; by default it only slows down after 429 responses
+        retry_policy [optional]: RetryPolicy for connection errors, timeouts, 5xx and 429
+        timeout [optional]: float, seconds allowed for one attempt
+        circuit_breakers [optional]: CircuitBreakers failing fast on routes that keep failing
+        base_url [optional]: string used for both environments, or dictionary of base URL
+            per environment ('sandbox', 'live'), e.g. to use a mock server; Route.BASE by default
+        metrics [optional]: MetricsSink receiving the pool wait, DNS, connect, time to first
+            byte and total time of every attempt, labelled by route, env and status
+        models [optional]: boolean, answer balances, statuses, account holders, API users and
+            access tokens with read only models decoded when read instead of dictionaries
+    """
 
     def __init__(
         self,
         connector: Optional[aiohttp.BaseConnector] = None,
+        *,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 30.0,
+        ttl_dns_cache: Optional[int] = 300,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        timeout: Optional[float] = 30.0,
+        circuit_breakers: Optional[CircuitBreakers] = None,
+        base_url: Optional[Union[str, Mapping[str, str]]] = None,
+        metrics: Optional[MetricsSink] = None,
+        models: bool = False,
         ) -> None:
         self.loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
-        self.connector: aiohttp.BaseConnector = connector,
-        self.__session: aiohttp.ClientSession = None
+        self.connector: Optional[aiohttp.BaseConnector] = connector
+        self.__connector_owner: bool = connector is None
+        self.__connector_options: Dict[str, Any] = {
+            'limit': limit,
+            'limit_per_host': limit_per_host,
+            'keepalive_timeout': keepalive_timeout,
+            'ttl_dns_cache': ttl_dns_cache,
+        }
+        self.__session: Optional[aiohttp.ClientSession] = None
+        self.rate_limiter: RateLimiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.retry_policy: RetryPolicy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.circuit_breakers: CircuitBreakers = circuit_breakers if circuit_breakers is not None else CircuitBreakers()
+        if isinstance(base_url, str):
+            base_url = {env: base_url.rstrip('/') for env in Route.BASE}
+        self.endpoints: EndpointTable = EndpointTable(base_url)
+        self.metrics: Optional[MetricsSink] = metrics
+        self.models = models
         user_agent =  'MobileMoney python version'
         self.user_agent = user_agent
         self.isLogged = False
         self.isLive = True
-        self.data: Optional[Union[Dict[str, Any], str]] = None
 
     async def login(self)-> None:
-        if not self.isLogged:
-            self.__session = aiohttp.ClientSession()
+        """Open the pooled session if it is not already open"""
+        if not self.isLogged or self.__session is None or self.__session.closed:
+            if self.__connector_owner and (self.connector is None or self.connector.closed):
+                # the connector must be created inside a running loop
+                self.connector = aiohttp.TCPConnector(**self.__connector_options)
+            self.__session = aiohttp.ClientSession(
+                connector=self.connector,
+                connector_owner=self.__connector_owner,
+                timeout=self.timeout,
+                #adding our user agent for potential statistic or analyse later, hope MTN store it lmao
+                headers={'User-Agent': self.user_agent},
+                #no trace hooks at all unless someone reads the timings
+                trace_configs=[timing_trace_config()] if self.metrics is not None else None
+            )
             self.isLogged = True
-            
-            
+
     async def logout(self)-> None:
-        if self.isLogged:
+        """Close the pooled session, the next request opens a new one"""
+        if self.isLogged and self.__session is not None:
             await self.__session.close()
-            self.isLogged = False 
-            
+            self.isLogged = False
+
+    async def close(self)-> None:
+        """Close the pooled session and release every connection it holds"""
+        await self.logout()
+        self.__session = None
 
     def is_sandbox(self)-> None:
         """Function to turn the library from live to sandbox environment
@@ -81,37 +158,134 @@ class HTTPClient:
     async def request(
         self,
         route: Route    
-        )-> aiohttp.ClientResponse:
+        )-> MomoResponse:
+        """
+        Send a request to MTN and read its body
+
+        Arguments:
+            route: Route
+
+        Returns:
+            MomoResponse: a read only result owned by this call only
+        """
 
         await self.login()
         method = route.method
         url = route.url
 
-        #creating headers and adding our user agent for potential statistic or analyse later
-        #hope MTN store it lmao
-        route.headers['User-Agent'] = self.user_agent
+        #GET requests have nothing to send, not even a JSON null
+        body = utils._to_json(route.body) if route.body is not None else None
+
+        policy = self.retry_policy
+        retryable = policy.can_retry(route)
+        breaker = self.circuit_breakers.get(route)
+        started = time.monotonic()
+        attempt = 0
+        #an earlier attempt may have reached MTN without us getting its answer
+        ambiguous = False
+
+        while True:
+            attempt += 1
+            #raise CircuitOpen without sending anything while the route is failing
+            breaker.before_call()
+            try:
+                response = await self.__send(route, body, attempt)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                ambiguous = True
+                delay = policy.backoff(attempt, started) if retryable else None
+                if delay is None:
+                    if _log.isEnabledFor(logging.WARNING):
+                        _log.warning('%s %s failed: %r', method, route.key, e, extra=self.__fields(route, None, started, attempt))
+                    raise MomoConnectionError(f'{method} {url} failed after {attempt} attempt(s): {e!r}') from e
+                if _log.isEnabledFor(logging.INFO):
+                    _log.info('retrying %s %s after %r', method, route.key, e, extra=self.__fields(route, None, started, attempt, delay))
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.record(response.status, response.elapsed)
+
+            if response.status == 409 and ambiguous and 'X-Reference-Id' in route.headers:
+                #an earlier attempt reached MTN, the reference id is already accepted
+                #(a 429 is not enough: MTN refused it before taking it)
+                return MomoResponse(method, url, route.accepted, 'Accepted', response.headers,
+                    None, response.elapsed, attempt)
+
+            if retryable and response.status in policy.statuses:
+                ambiguous = ambiguous or response.status >= 500
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                delay = policy.backoff(attempt, started, retry_after)
+                if delay is not None and retry_after is not None and self.rate_limiter.pauses(response.status, response.headers):
+                    #the buckets of the route are paused until Retry-After, the next attempt waits there
+                    delay = max(delay - retry_after, 0.0)
+                if delay is not None:
+                    if _log.isEnabledFor(logging.INFO):
+                        _log.info('retrying %s %s after status %s', method, route.key, response.status,
+                            extra=self.__fields(route, response.status, started, attempt, delay))
+                    await asyncio.sleep(delay)
+                    continue
+
+            if response.status >= 400:
+                #4xx are answers about the request (unknown account, duplicate...), 5xx are MTN failing
+                level = logging.WARNING if response.status >= 500 else logging.INFO
+                if _log.isEnabledFor(level):
+                    _log.log(level, '%s %s answered %s %s', method, route.key, response.status, response.reason,
+                        extra=self.__fields(route, response.status, started, attempt))
+            return response
+
+    @staticmethod
+    def __fields(route: Route, status: Optional[int], started: float, attempt: int, delay: Optional[float] = None) -> Dict[str, Any]:
+        headers = route.headers or {}
+        return {
+            'route': f'{route.product}.{route.key}',
+            'env': Route.ENV[route.production],
+            'reference_id': headers.get('X-Reference-Id'),
+            'status': status,
+            'latency_ms': round((time.monotonic() - started) * 1000, 1),
+            'attempt': attempt,
+            'delay': round(delay, 3) if delay is not None else None,
+        }
 
-        #response: Optional[aiohttp.ClientResponse] = None
-        
-        try:
-            if route.body is not None:
-                body = json.dumps(route.body[0])  
-            else:
-                body = json.dumps(route.body)
-        except KeyError:
-            body = json.dumps(route.body)
-        
+    async def __send(self, route: Route, body: Optional[bytes], attempt: int) -> MomoResponse:
+        await self.rate_limiter.acquire(route)
+        timings = CallTimings() if self.metrics is not None else None
+        model = MODELS.get(route.key) if self.models else None
+        start = time.perf_counter()
+        #past the rate limiter, MTN may get this attempt from now on
+        route.sent += 1
         try:
-            async with self.__session.request(method, url, data=body, headers=route.headers) as response:
-                self.data = await utils.json_or_text(response)
-                await self.logout()
-                return response
-
-
-        except Exception as e:
-            print(f'Something wrong when sending request to mtn : {e}')
-        
-        await self.logout()
+            async with self.__session.request(route.method, route.url, data=body, headers=route.headers, trace_request_ctx=timings) as response:
+                if model is not None and response.status == 200:
+                    #kept as bytes, fields are decoded when read
+                    raw = await response.read()
+                    data = model(raw) if raw.lstrip()[:1] == b'{' else await utils.json_or_text(response)
+                else:
+                    data = await utils.json_or_text(response)
+                self.rate_limiter.feedback(route, response.status, response.headers)
+                elapsed = time.perf_counter() - start
+                if timings is not None:
+                    self.__observe(route, timings, str(response.status))
+                return MomoResponse(
+                    route.method,
+                    route.url,
+                    response.status,
+                    response.reason or '',
+                    response.headers,
+                    data,
+                    elapsed,
+                    attempt
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if timings is not None:
+                self.__observe(route, timings, 'error')
+            raise
+
+    def __observe(self, route: Route, timings: CallTimings, status: str) -> None:
+        labels = {'route': f'{route.product}.{route.key}', 'env': Route.ENV[route.production], 'status': status}
+        for phase, value in timings.phases(time.perf_counter()).items():
+            self.metrics.observe(PHASES[phase], value, labels)
 
     async def create_api_user(self, uuid: str, subscription_key: str, url_callback : Optional[str] = None)->bool:
         """
@@ -137,18 +311,13 @@ class HTTPClient:
             "providerCallbackHost":url_callback
         }
         
-        response: Optional[aiohttp.ClientResponse] = None
-        response = await self.request(Route('POST',
-        utils.PATH['create_apiuser'][Route.ENV[self.isLive]], 
-        self.isLive,
-        headers, 
-        body))
+        response = await self.request(self.endpoints.provisioning['create_apiuser'].route(self.isLive, headers, body))
 
         #if done 
         if response.status == 201:
             return True
         else:
-            utils.errors_manager(response, self.data)
+            utils.errors_manager(response, response.data)
 
     async def get_api_user(self, uuid: str, subscription_key: str) -> Tuple:
         """
@@ -162,18 +331,13 @@ class HTTPClient:
         headers = {
             "Ocp-Apim-Subscription-Key":subscription_key
         }
-        response: Optional[aiohttp.ClientResponse] = None
-        response =  await self.request(Route('GET', 
-        utils.PATH['get_apiuser'][Route.ENV[self.isLive]].format(uuid=uuid), 
-        self.isLive,
-        headers
-        ))
+        response = await self.request(self.endpoints.provisioning['get_apiuser'].route(self.isLive, headers, params={'uuid': uuid}))
 
         #if done
         if response.status == 200:
-            return (True, self.data)
+            return (True, response.data)
         else:
-            utils.errors_manager(response, self.data)
+            utils.errors_manager(response, response.data)
 
     async def create_api_key(self, uuid: str, subscription_key: str) -> Tuple:
         """
@@ -187,16 +351,11 @@ class HTTPClient:
         headers = {
             "Ocp-Apim-Subscription-Key":subscription_key
         }
-        response: Optional[aiohttp.ClientResponse] = None
-        response =  await self.request(Route('POST', 
-        utils.PATH['create_apikey'][Route.ENV[self.isLive]].format(apiuser=uuid),
-        self.isLive, 
-        headers
-        ))
+        response = await self.request(self.endpoints.provisioning['create_apikey'].route(self.isLive, headers, params={'apiuser': uuid}))
         if response.status == 201:
-            return (True, self.data)
+            return (True, response.data)
         else:
-            utils.errors_manager(response, self.data)
+            utils.errors_manager(response, response.data)
     
 
 
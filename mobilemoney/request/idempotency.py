@@ -0,0 +1,248 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..errors.errors import Conflict, DuplicatePayment, HTTPException
+from ..utils.utils import stable_reference_id
+
+REJECT = 'reject'
+COALESCE = 'coalesce'
+
+KeyFunction = Callable[[str, str, Dict[str, Any]], Optional[str]]
+Released = Callable[[BaseException], bool]
+
+"""
+Note : a key is remembered from the moment its payment is sent. It is only
+forgotten when the payment surely did not go through (MTN refused it with a
+4xx other than 409, or it never left the client): after a timeout, a
+connection error or a 5xx MTN may have paid, and a retry under a new
+reference id would pay twice.
+"""
+
+
+class BloomFilter:
+    """
+    Represent a set answering "maybe" or "no", in a fixed amount of memory
+
+    Two generations are kept: once ``capacity`` keys were added to the
+    current one it becomes the previous one and a new one starts, so the
+    filter remembers between ``capacity`` and twice ``capacity`` keys.
+
+    Arguments:
+        capacity: integer, keys per generation
+        error_rate [optional]: float, false positive rate of a full generation
+    """
+
+    __slots__ = ('capacity', 'error_rate', 'size', 'hashes', 'count', 'current', 'previous')
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError('capacity must be at least 1 and error_rate between 0 and 1')
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self.current = bytearray((self.size + 7) // 8)
+        self.previous: Optional[bytearray] = None
+
+    def __positions(self, key: str) -> Tuple[int, ...]:
+        #double hashing, k positions from one 128 bits digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'little')
+        b = int.from_bytes(digest[8:], 'little') | 1
+        return tuple((a + i * b) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        """Method to add a key"""
+        if self.count >= self.capacity:
+            self.previous, self.current, self.count = self.current, bytearray(len(self.current)), 0
+        bits = self.current
+        for position in self.__positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        positions = self.__positions(key)
+        for bits in (self.current, self.previous):
+            if bits is not None and all(bits[p >> 3] & (1 << (p & 7)) for p in positions):
+                return True
+        return False
+
+    @property
+    def memory(self) -> int:
+        """Bytes used by the bit arrays"""
+        return len(self.current) * (2 if self.previous is not None else 1)
+
+
+class IdempotencyGuard:
+    """
+    Send each payment of a business key once
+
+    Payments are keyed by product, route, subscription key and business key,
+    so one guard can be shared by the clients of many accounts. A key sent less
+    than ``window`` seconds ago is found among the ``max_keys`` most recent
+    keys; in ``'reject'`` mode the duplicate raises :exc:`DuplicatePayment`,
+    in ``'coalesce'`` mode it gets the result of the first payment, waiting
+    for it when it is still in flight. With ``bloom_capacity``, keys are also
+    added to a :class:`BloomFilter` remembering them long after the
+    recent keys forgot them; a key only found there always raises, with ``probable`` set.
+
+    The business key is the ``externalId`` of the body by default, pass
+    ``key`` to use another field. Use :meth:`reference_id` to get the
+    X-Reference-Id of a business key, the same on every worker of an account.
+
+    Arguments:
+        window [optional]: float, seconds a key is remembered
+        max_keys [optional]: integer, most recent keys kept
+        mode [optional]: string, 'reject' or 'coalesce'
+        bloom_capacity [optional]: integer, keys per Bloom filter generation, None for no filter
+        bloom_error_rate [optional]: float, false positive rate of the Bloom filter
+        namespace [optional]: string, namespace of the reference ids derived from the keys
+        key [optional]: callable receiving (route key, reference id, body) and returning the business key,
+            None skips the guard for that payment
+    """
+
+    def __init__(
+        self,
+        window: float = 600.0,
+        max_keys: int = 100_000,
+        mode: str = REJECT,
+        bloom_capacity: Optional[int] = None,
+        bloom_error_rate: float = 0.001,
+        namespace: str = 'mobilemoney',
+        key: Optional[KeyFunction] = None
+        ) -> None:
+        if mode not in (REJECT, COALESCE):
+            raise ValueError(f'mode must be {REJECT!r} or {COALESCE!r}')
+        self.window = window
+        self.max_keys = max_keys
+        self.mode = mode
+        self.namespace = namespace
+        self.key = key if key is not None else _external_id
+        self.bloom: Optional[BloomFilter] = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity else None
+        self.duplicates = 0
+        #key -> (expiry, reference id, result of the first payment), oldest first
+        self.__seen: 'OrderedDict[str, Tuple[float, str, asyncio.Future[Any]]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__seen)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__seen
+
+    def reference_id(self, business_key: str, tenant: Optional[str] = None) -> str:
+        """
+        Method to get the X-Reference-Id of a business key
+
+        Arguments:
+            business_key: string
+            tenant [optional]: string, e.g. a digest of the subscription key, two tenants never share an id
+
+        Returns:
+            UUID: string, the same for the same key, namespace and tenant
+        """
+        namespace = self.namespace if tenant is None else f'{self.namespace}:{tenant}'
+        return stable_reference_id(business_key, namespace)
+
+    async def run(self, key: str, reference_id: str, call: Callable[[], Awaitable[Any]], released: Optional[Released] = None) -> Any:
+        """
+        Method to send a payment unless its key was already sent
+
+        A key whose payment failed stays remembered, so its duplicates are
+        refused, unless ``released`` tells the failure proves nothing was paid.
+        Check the status of the first reference id before sending it again.
+
+        Arguments:
+            key: string, e.g. 'disbursement.transfer:<tenant>:INV-42'
+            reference_id: string, X-Reference-Id of this payment
+            call: coroutine function sending the payment
+            released [optional]: callable receiving the error of the call, True when nothing was paid;
+                by default only a 4xx answer other than 409 frees the key
+
+        Returns:
+            result of the call, or of the first call with the same key in 'coalesce' mode
+        """
+        now = time.monotonic()
+        self.__expire(now)
+        seen = self.__seen.get(key)
+        if seen is not None:
+            self.duplicates += 1
+            first = seen[2]
+            #a failed first payment may still have been paid, there is no result to share
+            if self.mode == REJECT or (first.done() and (first.cancelled() or first.exception() is not None)):
+                raise DuplicatePayment(key, seen[1])
+            return await asyncio.shield(first)
+        if self.bloom is not None and key in self.bloom:
+            self.duplicates += 1
+            raise DuplicatePayment(key, None, probable=True)
+
+        future: 'asyncio.Future[Any]' = asyncio.get_running_loop().create_future()
+        self.__seen[key] = (now + self.window, reference_id, future)
+        while len(self.__seen) > self.max_keys:
+            self.__seen.popitem(last=False)
+        try:
+            result = await call()
+        except BaseException as e:
+            if (released or _rejected)(e):
+                #nothing was paid, the key may be used again
+                if self.__seen.get(key, (0, '', None))[2] is future:
+                    del self.__seen[key]
+            elif self.bloom is not None:
+                self.bloom.add(key)
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                #coalesced callers get the error, nobody else has to
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        future.set_result(result)
+        if self.bloom is not None:
+            self.bloom.add(key)
+        return result
+
+    def forget(self, key: str) -> None:
+        """Method to let a key be sent again at once, the Bloom filter still remembers it"""
+        self.__seen.pop(key, None)
+
+    def __expire(self, now: float) -> None:
+        seen = self.__seen
+        while seen:
+            oldest = next(iter(seen.values()))
+            if oldest[0] > now or not oldest[2].done():
+                break
+            seen.popitem(last=False)
+
+
+def _rejected(error: BaseException) -> bool:
+    #MTN answered and did not take the payment
+    return isinstance(error, HTTPException) and 400 <= error.status < 500 and not isinstance(error, Conflict)
+
+
+def _external_id(route_key: str, reference_id: str, body: Dict[str, Any]) -> Optional[str]:
+    value = body.get('externalId') if body else None
+    return str(value) if value not in (None, '') else None
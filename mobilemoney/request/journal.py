@@ -0,0 +1,502 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from ..log import logger
+from ..utils.utils import _from_json, _to_json
+
+_log = logger.getChild('journal')
+
+T = TypeVar('T')
+
+#written before the call is sent
+PENDING = 'pending'
+#the call failed without an answer telling if MTN got it (timeout, 5xx...)
+UNKNOWN = 'unknown'
+#MTN accepted the reference id, now or in an earlier run
+ACCEPTED = 'accepted'
+#MTN answered 409, the reference id was already used
+CONFLICT = 'conflict'
+#MTN refused the call (4xx), nothing was created
+REJECTED = 'rejected'
+#recovery found no transaction with this reference id, it is safe to send it again
+NOT_SENT = 'not_sent'
+
+UNRESOLVED = frozenset({PENDING, UNKNOWN})
+
+"""
+Note : an intent is written and synced before its call is sent, the outcome is
+written afterwards without making the caller wait for the disk. Every record
+added while a sync runs is written by the next one, so many concurrent
+payments share each fsync.
+
+A journal shared by several clients tells their calls apart by subscription
+key and API user: a client only recovers its own calls, the status routes of
+another account answer 404 for them. Only a digest of the subscription key is
+written, never the key itself.
+"""
+
+
+class JournalEntry:
+    """
+    Represent one money-moving call of the journal
+
+    Attributes:
+        reference_id: string, X-Reference-Id of the call
+        product: string, 'collection' or 'disbursement'
+        key: string, e.g. 'transfer'
+        target: string, X-Target-Environment
+        body: dictionary sent to MTN
+        state: string, PENDING, UNKNOWN, ACCEPTED, CONFLICT, REJECTED or NOT_SENT
+        status: HTTP status code or transaction status, None until known
+        created: float, UNIX time of the intent
+        updated: float, UNIX time of the last outcome
+        subscription: string, digest of the subscription key of the client that sent it, None if unknown
+        api_user: string, API user of the client that sent it, None if unknown
+    """
+
+    __slots__ = (
+        'reference_id', 'product', 'key', 'target', 'body', 'state', 'status', 'created', 'updated', 'subscription', 'api_user'
+    )
+
+    def __init__(
+        self,
+        reference_id: str,
+        product: str,
+        key: str,
+        target: str,
+        body: Optional[Dict[str, Any]],
+        state: str = PENDING,
+        status: Any = None,
+        created: Optional[float] = None,
+        updated: Optional[float] = None,
+        subscription: Optional[str] = None,
+        api_user: Optional[str] = None
+        ) -> None:
+        self.reference_id = reference_id
+        self.product = product
+        self.key = key
+        self.target = target
+        self.body = body
+        self.state = state
+        self.status = status
+        self.created = created if created is not None else time.time()
+        self.updated = updated if updated is not None else self.created
+        self.subscription = subscription
+        self.api_user = api_user
+
+    @property
+    def resolved(self) -> bool:
+        return self.state not in UNRESOLVED
+
+    def belongs_to(self, subscription_key: str, api_user: Optional[str] = None) -> bool:
+        """
+        Method to know if the entry was sent by a client of this subscription key and API user
+
+        Arguments:
+            subscription_key: string
+            api_user [optional]: string, None matches any API user
+
+        Returns:
+            boolean, False for the entries of unknown origin
+        """
+        if self.subscription != subscription_digest(subscription_key):
+            return False
+        return api_user is None or self.api_user is None or self.api_user == api_user
+
+    def record(self) -> Dict[str, Any]:
+        """Method to get the intent record of the entry"""
+        return {
+            'op': 'intent', 'ref': self.reference_id, 'product': self.product, 'key': self.key,
+            'target': self.target, 'body': self.body, 'time': self.created,
+            'subscription': self.subscription, 'api_user': self.api_user
+        }
+
+    def __repr__(self) -> str:
+        return f'<JournalEntry {self.product}.{self.key} {self.reference_id} state={self.state} status={self.status}>'
+
+
+class Journal(ABC):
+    """
+    Write-ahead journal of money-moving calls, base of FileJournal and SQLiteJournal
+
+    Only the unresolved entries are kept in memory. Subclasses write batches
+    of records with :meth:`_write`, always from the same worker thread.
+
+    Arguments:
+        None
+    """
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, JournalEntry] = {}
+        self.__batch: List[Tuple[Dict[str, Any], 'asyncio.Future[None]']] = []
+        self.__flusher: Optional['asyncio.Future[None]'] = None
+        #one thread, batches are written in the order they were made
+        self.__executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='mobilemoney-journal')
+        self.syncs = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def unresolved(
+        self,
+        product: Optional[str] = None,
+        subscription_key: Optional[str] = None,
+        api_user: Optional[str] = None
+        ) -> List[JournalEntry]:
+        """
+        Method to get the calls whose outcome is unknown
+
+        Arguments:
+            product [optional]: string, only the entries of this product
+            subscription_key [optional]: string, only the entries sent with this subscription key
+            api_user [optional]: string, with subscription_key, only the entries sent by this API user
+
+        Returns:
+            list of JournalEntry, oldest first
+        """
+        entries = [
+            entry for entry in self.entries.values()
+            if (product is None or entry.product == product)
+            and (subscription_key is None or entry.belongs_to(subscription_key, api_user))
+        ]
+        return sorted(entries, key=lambda entry: entry.created)
+
+    async def intent(
+        self,
+        reference_id: str,
+        product: str,
+        key: str,
+        target: str,
+        body: Optional[Dict[str, Any]],
+        subscription_key: Optional[str] = None,
+        api_user: Optional[str] = None
+        ) -> JournalEntry:
+        """
+        Method to record a call before it is sent, returns once it is on disk
+
+        Arguments:
+            reference_id: string
+            product: string
+            key: string, e.g. 'transfer'
+            target: string
+            body: dictionary
+            subscription_key [optional]: string, only its digest is written
+            api_user [optional]: string
+
+        Returns:
+            JournalEntry
+        """
+        entry = self.entries.get(reference_id)
+        if entry is None:
+            subscription = subscription_digest(subscription_key) if subscription_key is not None else None
+            entry = self.entries[reference_id] = JournalEntry(
+                reference_id, product, key, target, body, subscription=subscription, api_user=api_user
+            )
+        else:
+            #sent again, e.g. by recover: the entry shows the outcome of the last attempt
+            entry.state, entry.status, entry.updated = PENDING, None, time.time()
+        try:
+            await asyncio.shield(self.__append(entry.record()))
+        except asyncio.CancelledError:
+            #the record is still written, recovery finds the call was never sent
+            raise
+        except BaseException:
+            self.entries.pop(reference_id, None)
+            raise
+        return entry
+
+    def outcome(self, reference_id: str, state: str, status: Any = None) -> 'asyncio.Future[None]':
+        """
+        Method to record what became of a call, without waiting for the disk
+
+        Arguments:
+            reference_id: string
+            state: string, e.g. ACCEPTED
+            status [optional]: HTTP status code or transaction status
+
+        Returns:
+            asyncio.Future, done once the record is on disk
+        """
+        entry = self.entries.get(reference_id)
+        if entry is not None:
+            entry.state, entry.status, entry.updated = state, status, time.time()
+            if entry.resolved:
+                del self.entries[reference_id]
+        future = self.__append({'op': 'outcome', 'ref': reference_id, 'state': state, 'status': status, 'time': time.time()})
+        future.add_done_callback(_report)
+        return future
+
+    async def flush(self) -> None:
+        """Method to wait until every record made so far is on disk"""
+        while self.__flusher is not None and not self.__flusher.done():
+            await asyncio.shield(self.__flusher)
+
+    async def close(self) -> None:
+        """Method to write the pending records and release the file"""
+        await self.flush()
+        await self._run(self._close)
+        self.__executor.shutdown()
+
+    async def _run(self, func: Callable[[], T]) -> T:
+        """Method to run a function on the worker thread, after the batches already written"""
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, func)
+
+    def __append(self, record: Dict[str, Any]) -> 'asyncio.Future[None]':
+        future: 'asyncio.Future[None]' = asyncio.get_running_loop().create_future()
+        self.__batch.append((record, future))
+        if self.__flusher is None or self.__flusher.done():
+            self.__flusher = asyncio.ensure_future(self.__flush())
+        return future
+
+    async def __flush(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.__batch:
+            batch, self.__batch = self.__batch, []
+            try:
+                await loop.run_in_executor(self.__executor, self._write, [record for record, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                self.syncs += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+    def _replay(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Method to rebuild the unresolved entries from the records written by earlier runs"""
+        for record in records:
+            if record.get('op') == 'intent':
+                self.entries[record['ref']] = JournalEntry(
+                    record['ref'], record['product'], record['key'], record['target'], record.get('body'), created=record.get('time'),
+                    subscription=record.get('subscription'), api_user=record.get('api_user')
+                )
+            elif record.get('op') == 'outcome':
+                entry = self.entries.get(record['ref'])
+                if entry is None:
+                    continue
+                entry.state, entry.status, entry.updated = record['state'], record.get('status'), record.get('time')
+                if entry.resolved:
+                    del self.entries[record['ref']]
+
+    @abstractmethod
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        """Method to write a batch of records durably, called from the worker thread"""
+
+    def _close(self) -> None:
+        pass
+
+
+def subscription_digest(subscription_key: str) -> str:
+    """
+    Function to get the digest of a subscription key written to the journal
+
+    Arguments:
+        subscription_key: string
+
+    Returns:
+        string, hexadecimal SHA-256
+    """
+    return hashlib.sha256(subscription_key.encode('utf-8')).hexdigest()
+
+
+def _report(future: 'asyncio.Future[None]') -> None:
+    #outcome records are rarely awaited, their failures would go unnoticed
+    if not future.cancelled() and future.exception() is not None:
+        _log.error('journal write failed: %r', future.exception())
+
+
+class FileJournal(Journal):
+    """
+    Journal kept in an append-only file of JSON lines
+
+    The file only grows, call :meth:`compact` when no call is being sent, e.g.
+    at startup after the recovery, to keep only the unresolved entries.
+
+    Arguments:
+        path: string
+        fsync [optional]: boolean, False only trusts the OS cache (faster, not crash safe)
+    """
+
+    def __init__(self, path: str, fsync: bool = True) -> None:
+        super().__init__()
+        self.path = path
+        self.fsync = fsync
+        if os.path.exists(path):
+            self._replay(self.__read(path))
+            self.__repair(path)
+        self.__file = open(path, 'ab')
+
+    @staticmethod
+    def __repair(path: str) -> None:
+        #a line cut short by a crash would be glued to the next record written, drop it
+        with open(path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(4096, position)
+                f.seek(position - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position != end:
+                f.truncate(position)
+
+    @staticmethod
+    def __read(path: str) -> Iterable[Dict[str, Any]]:
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    record = _from_json(line)
+                except ValueError:
+                    #the last line of a crashed run may be cut short, the call was never sent
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        self.__file.write(b''.join(_to_json(record) + b'\n' for record in records))
+        self.__file.flush()
+        if self.fsync:
+            os.fsync(self.__file.fileno())
+
+    def _close(self) -> None:
+        self.__file.close()
+
+    async def compact(self) -> None:
+        """Method to rewrite the file with the unresolved entries only"""
+        await self.flush()
+        records = []
+        for entry in self.unresolved():
+            records.append(entry.record())
+            if entry.state != PENDING:
+                records.append({'op': 'outcome', 'ref': entry.reference_id, 'state': entry.state, 'status': entry.status, 'time': entry.updated})
+
+        def rewrite() -> None:
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(b''.join(_to_json(record) + b'\n' for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+            self.__file.close()
+            os.replace(tmp, self.path)
+            self.__file = open(self.path, 'ab')
+
+        await self._run(rewrite)
+
+
+class SQLiteJournal(Journal):
+    """
+    Journal kept in a SQLite database, one row per call
+
+    Resolved rows are kept for reconciliation, :meth:`prune` deletes the old ones.
+
+    Arguments:
+        path: string
+        synchronous [optional]: string, SQLite synchronous pragma, 'FULL' syncs every batch
+    """
+
+    def __init__(self, path: str, synchronous: str = 'FULL') -> None:
+        super().__init__()
+        self.path = path
+        #only used from the worker thread of the journal once loaded
+        self.__db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__db.execute('PRAGMA journal_mode=WAL')
+        self.__db.execute(f'PRAGMA synchronous={synchronous}')
+        self.__db.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'reference_id TEXT PRIMARY KEY, product TEXT NOT NULL, key TEXT NOT NULL, target TEXT NOT NULL, '
+            'body BLOB, state TEXT NOT NULL, status TEXT, created REAL NOT NULL, updated REAL NOT NULL, '
+            'subscription TEXT, api_user TEXT)'
+        )
+        #databases written before the origin of the calls was kept
+        columns = {row[1] for row in self.__db.execute('PRAGMA table_info(outbox)')}
+        for column in ('subscription', 'api_user'):
+            if column not in columns:
+                self.__db.execute(f'ALTER TABLE outbox ADD COLUMN {column} TEXT')
+        self.__db.execute('CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state)')
+        rows = self.__db.execute(
+            'SELECT reference_id, product, key, target, body, state, status, created, updated, subscription, api_user '
+            'FROM outbox WHERE state IN (?, ?)',
+            tuple(UNRESOLVED)
+        )
+        for reference_id, product, key, target, body, state, status, created, updated, subscription, api_user in rows:
+            self.entries[reference_id] = JournalEntry(
+                reference_id, product, key, target, _from_json(body) if body else None,
+                state, _from_json(status) if status else None, created, updated, subscription, api_user
+            )
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        db = self.__db
+        db.execute('BEGIN')
+        try:
+            for record in records:
+                if record['op'] == 'intent':
+                    db.execute(
+                        'INSERT OR REPLACE INTO outbox '
+                        '(reference_id, product, key, target, body, state, status, created, updated, subscription, api_user) '
+                        'VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?, ?, ?)',
+                        (record['ref'], record['product'], record['key'], record['target'],
+                            _to_json(record['body']) if record['body'] is not None else None, PENDING, record['time'], record['time'],
+                            record.get('subscription'), record.get('api_user'))
+                    )
+                else:
+                    db.execute(
+                        'UPDATE outbox SET state = ?, status = ?, updated = ? WHERE reference_id = ?',
+                        (record['state'], _to_json(record['status']).decode('utf-8'), record['time'], record['ref'])
+                    )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _close(self) -> None:
+        self.__db.close()
+
+    async def prune(self, older_than: float) -> int:
+        """
+        Method to delete the resolved rows not updated for ``older_than`` seconds
+
+        Returns:
+            number of rows deleted
+        """
+        await self.flush()
+        limit = time.time() - older_than
+
+        def delete() -> int:
+            cursor = self.__db.execute(
+                'DELETE FROM outbox WHERE state NOT IN (?, ?) AND updated < ?', tuple(UNRESOLVED) + (limit,)
+            )
+            return cursor.rowcount
+
+        return await self._run(delete)
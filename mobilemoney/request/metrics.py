@@ -0,0 +1,308 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import bisect
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import aiohttp
+
+Labels = Tuple[Tuple[str, str], ...]
+
+#seconds, from a pooled call to a slow MTN answer
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+#name of the histogram of each phase of a call
+PHASES: Dict[str, str] = {
+    'pool_wait': 'mobilemoney_pool_wait_seconds',
+    'dns': 'mobilemoney_dns_seconds',
+    'connect': 'mobilemoney_connect_seconds',
+    'ttfb': 'mobilemoney_ttfb_seconds',
+    'total': 'mobilemoney_request_seconds',
+}
+
+HELP: Dict[str, str] = {
+    'mobilemoney_pool_wait_seconds': 'Time waiting for a free pooled connection',
+    'mobilemoney_dns_seconds': 'Time resolving the MTN host name',
+    'mobilemoney_connect_seconds': 'Time opening a new connection, TCP and TLS handshakes included',
+    'mobilemoney_ttfb_seconds': 'Time from the request sent to the response headers received',
+    'mobilemoney_request_seconds': 'Time of one attempt, from the request start to the body read',
+}
+
+
+class MetricsSink:
+    """
+    Receive the timings of every call, subclass it to forward them elsewhere
+
+    Arguments:
+        None
+    """
+
+    def observe(self, name: str, value: float, labels: Mapping[str, str]) -> None:
+        """
+        Method to record one value
+
+        Arguments:
+            name: string, e.g. 'mobilemoney_request_seconds'
+            value: float, seconds
+            labels: dictionary, route, env and status
+        """
+
+
+class Histogram:
+    """
+    Represent a cumulative histogram with fixed buckets
+
+    Arguments:
+        buckets: sorted upper bounds
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        #the last slot counts the values above every bucket
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Method to record one value"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[Tuple[float, int]]:
+        """Method to get (upper bound, values at or below it), +Inf last"""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q: float) -> float:
+        """
+        Method to estimate a quantile, interpolated within its bucket
+
+        Arguments:
+            q: float between 0 and 1
+
+        Returns:
+            seconds: float, 0.0 when nothing was recorded
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        lower = 0.0
+        seen = 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                if bound == float('inf'):
+                    return lower
+                inside = total - seen
+                return lower + (bound - lower) * ((rank - seen) / inside if inside else 0.0)
+            lower, seen = bound, total
+        return lower
+
+
+class InMemoryMetrics(MetricsSink):
+    """
+    Keep a histogram per metric name and set of labels
+
+    Safe to read from another thread than the one of the event loop, e.g. an
+    HTTP handler serving :meth:`render_prometheus`.
+
+    Arguments:
+        buckets [optional]: sorted upper bounds in seconds
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.__histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.__lock = threading.Lock()
+
+    def observe(self, name: str, value: float, labels: Mapping[str, str]) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.__lock:
+            series = self.__histograms.get(name)
+            if series is None:
+                series = self.__histograms[name] = {}
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        """
+        Method to get the histogram of one metric and set of labels
+
+        Arguments:
+            name: string, e.g. 'mobilemoney_request_seconds'
+            labels: route, env and status
+
+        Returns:
+            Histogram, None when nothing was recorded
+        """
+        with self.__lock:
+            return self.__histograms.get(name, {}).get(tuple(sorted(labels.items())))
+
+    def summary(self, name: str = PHASES['total'], quantiles: Sequence[float] = (0.5, 0.95, 0.99)) -> Dict[Labels, Dict[str, float]]:
+        """
+        Method to get the count and estimated quantiles of every series of a metric
+
+        Arguments:
+            name [optional]: string, the total time of a call by default
+            quantiles [optional]: floats between 0 and 1
+
+        Returns:
+            dictionary of {'count', 'sum', 'p50'...} keyed by labels
+        """
+        with self.__lock:
+            series = dict(self.__histograms.get(name, {}))
+        result: Dict[Labels, Dict[str, float]] = {}
+        for labels, histogram in series.items():
+            values: Dict[str, float] = {'count': histogram.count, 'sum': histogram.sum}
+            for q in quantiles:
+                values[f'p{q * 100:g}'] = histogram.quantile(q)
+            result[labels] = values
+        return result
+
+    def reset(self) -> None:
+        """Method to drop every recorded value"""
+        with self.__lock:
+            self.__histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """
+        Method to render every histogram in the Prometheus text exposition format
+
+        Returns:
+            string, to serve with the 'text/plain; version=0.0.4' content type
+        """
+        lines: List[str] = []
+        with self.__lock:
+            for name in sorted(self.__histograms):
+                lines.append(f'# HELP {name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(self.__histograms[name].items()):
+                    for bound, total in histogram.cumulative():
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {total}')
+                    lines.append(f'{name}_sum{_labels(labels)} {histogram.sum!r}')
+                    lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class CallTimings:
+    """
+    Collect the timestamps of one attempt, filled by the trace hooks
+
+    Every phase is None when it did not happen, e.g. no DNS lookup or connect
+    on a reused connection.
+    """
+
+    __slots__ = ('start', 'queued', 'queue_end', 'create', 'create_end', 'dns', 'dns_end', 'sent', 'headers')
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.queued: Optional[float] = None
+        self.queue_end: Optional[float] = None
+        self.create: Optional[float] = None
+        self.create_end: Optional[float] = None
+        self.dns: Optional[float] = None
+        self.dns_end: Optional[float] = None
+        self.sent: Optional[float] = None
+        self.headers: Optional[float] = None
+
+    def phases(self, end: float) -> Dict[str, float]:
+        """
+        Method to get the duration of every phase that happened
+
+        Arguments:
+            end: float, perf_counter once the body was read
+
+        Returns:
+            dictionary of seconds keyed like PHASES
+        """
+        phases = {'total': end - self.start}
+        if self.queued is not None and self.queue_end is not None:
+            phases['pool_wait'] = self.queue_end - self.queued
+        dns = 0.0
+        if self.dns is not None and self.dns_end is not None:
+            dns = phases['dns'] = self.dns_end - self.dns
+        if self.create is not None and self.create_end is not None:
+            #the connector resolves the host while it creates the connection
+            phases['connect'] = max(self.create_end - self.create - dns, 0.0)
+        if self.headers is not None:
+            #aiohttp < 3.8 has no headers sent signal, count from the connection then
+            sent = self.sent if self.sent is not None else (self.create_end or self.queue_end or self.start)
+            phases['ttfb'] = self.headers - sent
+        return phases
+
+
+def _hook(field: str) -> Any:
+    async def hook(session: Any, context: Any, params: Any) -> None:
+        timings = context.trace_request_ctx
+        if isinstance(timings, CallTimings):
+            setattr(timings, field, time.perf_counter())
+    return hook
+
+
+def timing_trace_config() -> 'aiohttp.TraceConfig':
+    """
+    Function to build the aiohttp trace config filling CallTimings
+
+    Pass a CallTimings as ``trace_request_ctx`` of the request to time it,
+    other requests of the session are ignored.
+
+    Returns:
+        aiohttp.TraceConfig
+    """
+    import aiohttp
+
+    config = aiohttp.TraceConfig()
+    signals = {
+        'on_connection_queued_start': 'queued',
+        'on_connection_queued_end': 'queue_end',
+        'on_connection_create_start': 'create',
+        'on_connection_create_end': 'create_end',
+        'on_dns_resolvehost_start': 'dns',
+        'on_dns_resolvehost_end': 'dns_end',
+        'on_request_headers_sent': 'sent',
+        #fired once the response headers are read, before the body
+        'on_request_end': 'headers',
+    }
+    for signal, field in signals.items():
+        if hasattr(config, signal):
+            getattr(config, signal).append(_hook(field))
+    return config
@@ -0,0 +1,306 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import re
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, Iterator, Optional, Type
+
+from ..utils.utils import _from_json
+
+_MISSING = object()
+
+#statuses a transaction never leaves, shared by the models, the poller and the callback receiver
+TERMINAL_STATUSES: FrozenSet[str] = frozenset({'SUCCESSFUL', 'FAILED', 'REJECTED', 'TIMEOUT'})
+
+#"name": "text without escapes" or "name": number / true / false / null
+_SCALAR = rb'"%s"\s*:\s*(?:"([^"\\]*)"|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null))'
+_LITERALS: Dict[bytes, Any] = {b'true': True, b'false': False, b'null': None}
+#strings, skipped whole, and brackets, to know the depth of a match
+_TOKENS = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+_patterns: Dict[str, 're.Pattern[bytes]'] = {}
+
+"""
+Note : MTN answers are small flat objects, reading one scalar field is done
+with a compiled pattern on the raw bytes. Only a match at the top level of
+the object counts, a field of the same name in a nested object is not the
+one asked for; the whole body is decoded when a field the pattern cannot
+read is asked for, or when the model is used as a dictionary.
+"""
+
+
+def _pattern(name: str) -> 're.Pattern[bytes]':
+    pattern = _patterns.get(name)
+    if pattern is None:
+        pattern = _patterns[name] = re.compile(_SCALAR % re.escape(name.encode('utf-8')))
+    return pattern
+
+
+def _depth(raw: bytes, end: int) -> int:
+    #number of objects and arrays open before end, strings skipped
+    depth = 0
+    for token in _TOKENS.finditer(raw, 0, end):
+        if token.group() in (b'{', b'['):
+            depth += 1
+        elif token.group() in (b'}', b']'):
+            depth -= 1
+    return depth
+
+
+class Model(Mapping):
+    """
+    Represent a JSON answer of MTN, decoded only when read
+
+    Models are read only mappings, so code written for the dictionaries
+    returned by default (``data['status']``, ``data.get('reason')``) keeps
+    working with them.
+
+    Arguments:
+        raw: bytes, the body of the response
+    """
+
+    __slots__ = ('_raw', '_data')
+
+    def __init__(self, raw: bytes) -> None:
+        self._raw = raw
+        self._data: Optional[Dict[str, Any]] = None
+
+    @property
+    def raw(self) -> bytes:
+        """The body as it was received"""
+        return self._raw
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Method to get the whole body decoded"""
+        if self._data is None:
+            data = _from_json(self._raw)
+            self._data = data if isinstance(data, dict) else {}
+        return self._data
+
+    def field(self, name: str, default: Any = None) -> Any:
+        """
+        Method to read one top level field, without decoding the rest when possible
+
+        Arguments:
+            name: string, e.g. 'status'
+            default [optional]: value returned when the field is missing
+
+        Returns:
+            the field value
+        """
+        if self._data is None:
+            value = self.__scan(name)
+            if value is not _MISSING:
+                return value
+        return self.to_dict().get(name, default)
+
+    def __scan(self, name: str) -> Any:
+        raw = self._raw
+        if not raw.lstrip().startswith(b'{'):
+            return _MISSING
+        match = None
+        for found in _pattern(name).finditer(raw):
+            if _depth(raw, found.start()) != 1:
+                continue
+            #the same field twice, the decoder keeps the last one
+            if match is not None:
+                return _MISSING
+            match = found
+        #a missing field, a nested one or an escaped string: decode the body
+        if match is None:
+            return _MISSING
+        text, literal = match.groups()
+        if text is not None:
+            return text.decode('utf-8')
+        if literal in _LITERALS:
+            return _LITERALS[literal]
+        return int(literal) if literal.lstrip(b'-').isdigit() else float(literal)
+
+    def __getitem__(self, name: str) -> Any:
+        value = self.field(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.field(name, default)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_dict())
+
+    def __len__(self) -> int:
+        return len(self.to_dict())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Model):
+            return self._raw == other._raw or self.to_dict() == other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None  # type: ignore
+
+    def __reduce__(self) -> Any:
+        return (type(self), (self._raw,))
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} {self._raw[:120]!r}>'
+
+
+class _Amount:
+    #amount and currency accessors shared by transactions and balances
+    __slots__ = ()
+
+    AMOUNT_FIELD = 'amount'
+
+    @property
+    def amount(self) -> Optional[Decimal]:
+        """Amount as a Decimal, None when missing"""
+        value = self.field(self.AMOUNT_FIELD)  # type: ignore
+        return Decimal(str(value)) if value not in (None, '') else None
+
+    @property
+    def currency(self) -> Optional[str]:
+        return self.field('currency')  # type: ignore
+
+
+class TransactionStatus(_Amount, Model):
+    """Represent the status of a request to pay, withdrawal, transfer, deposit or refund"""
+
+    __slots__ = ()
+
+    FINAL = TERMINAL_STATUSES
+
+    @property
+    def status(self) -> Optional[str]:
+        """'PENDING', 'SUCCESSFUL', 'FAILED'..."""
+        return self.field('status')
+
+    @property
+    def successful(self) -> bool:
+        return self.status == 'SUCCESSFUL'
+
+    @property
+    def final(self) -> bool:
+        return self.status in self.FINAL
+
+    @property
+    def financial_transaction_id(self) -> Optional[str]:
+        return self.field('financialTransactionId')
+
+    @property
+    def external_id(self) -> Optional[str]:
+        return self.field('externalId')
+
+    @property
+    def reason(self) -> Any:
+        """Why the transaction failed, a string or a {'code', 'message'} dictionary"""
+        return self.field('reason')
+
+    @property
+    def party(self) -> Optional[Dict[str, str]]:
+        """The payer of a collection, or the payee of a disbursement"""
+        data = self.to_dict()
+        return data.get('payer') or data.get('payee')
+
+
+class Balance(_Amount, Model):
+    """Represent an account balance"""
+
+    __slots__ = ()
+
+    AMOUNT_FIELD = 'availableBalance'
+
+    @property
+    def available_balance(self) -> Optional[Decimal]:
+        return self.amount
+
+
+class AccountHolder(Model):
+    """Represent an account holder: isActive, get_basic_user_info or ask_user_info answer"""
+
+    __slots__ = ()
+
+    @property
+    def active(self) -> Optional[bool]:
+        """isActive answer, None for the other routes"""
+        return self.field('result')
+
+    @property
+    def given_name(self) -> Optional[str]:
+        return self.field('given_name')
+
+    @property
+    def family_name(self) -> Optional[str]:
+        return self.field('family_name')
+
+    @property
+    def name(self) -> Optional[str]:
+        name = self.field('name')
+        if name is None and (self.given_name or self.family_name):
+            return ' '.join(part for part in (self.given_name, self.family_name) if part)
+        return name
+
+
+class ApiUser(Model):
+    """Represent an API user"""
+
+    __slots__ = ()
+
+    @property
+    def provider_callback_host(self) -> Optional[str]:
+        return self.field('providerCallbackHost')
+
+    @property
+    def target_environment(self) -> Optional[str]:
+        return self.field('targetEnvironment')
+
+
+class AccessToken(Model):
+    """Represent an access token"""
+
+    __slots__ = ()
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.field('access_token')
+
+    @property
+    def token_type(self) -> Optional[str]:
+        return self.field('token_type')
+
+    @property
+    def expires_in(self) -> Optional[int]:
+        return self.field('expires_in')
+
+
+#model of the successful answer of each route, by endpoint key
+MODELS: Dict[str, Type[Model]] = {
+    'get_apiuser': ApiUser,
+    'create_access_token': AccessToken,
+    'get_account_balance': Balance,
+    'get_account_balance_in': Balance,
+    'get_basic_info': AccountHolder,
+    'get_user_info': AccountHolder,
+    'is_active': AccountHolder,
+    'request_to_pay_status': TransactionStatus,
+    'withdraw_status': TransactionStatus,
+    'get_transfer_status': TransactionStatus,
+    'get_deposit_status': TransactionStatus,
+    'get_refund_status': TransactionStatus,
+}
@@ -0,0 +1,343 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import csv
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterator, Optional, Set, Tuple, Union, TYPE_CHECKING
+
+from .bulk import BulkResult, run_bulk
+from .validate import PaymentValidator
+from ..errors.errors import Conflict, InvalidPayment
+from ..utils.utils import stable_reference_id, _from_json
+
+if TYPE_CHECKING:
+    from .disbursements import Disbursements
+
+"""
+Note : a row is sent with a reference id derived from the run and its
+externalId (or its position in the file), so a row sent again after a crash
+reuses the same X-Reference-Id and MTN answers 409 instead of paying twice.
+The run is the source file unless a run id is given: the same externalId
+paid by another file or run (e.g. an employee id every month) gets a new
+reference id. A 409 is never counted as paid, it must be checked.
+"""
+
+OPERATIONS = ('transfer', 'deposit')
+
+
+class Checkpoint:
+    """
+    Represent how far a payout file has been processed
+
+    Rows finish out of order, the saved position is the first row that is not
+    finished yet so every row before it never has to be read again.
+
+    Arguments:
+        path: string, file storing the position
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.position: int = 0
+        self.__done: Set[int] = set()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.position = int(json.load(f)['position'])
+        except FileNotFoundError:
+            pass
+
+    def done(self, index: int) -> None:
+        """Method to mark a row as finished"""
+        self.__done.add(index)
+        while self.position in self.__done:
+            self.__done.remove(self.position)
+            self.position += 1
+
+    def save(self) -> None:
+        """Method to write the position atomically"""
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'position': self.position}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class PayoutSummary:
+    """
+    Represent the totals of a payout run
+
+    Attributes:
+        sent: integer, rows accepted by MTN
+        conflicts: integer, rows whose reference id MTN already had (409), to be checked with the status route
+        failed: integer, rows rejected by MTN or that failed in transit
+        invalid: integer, rows that could not be converted and were never sent
+        skipped: integer, rows before the checkpoint
+        elapsed: float, seconds the run took
+    """
+
+    __slots__ = ('sent', 'conflicts', 'failed', 'invalid', 'skipped', 'elapsed')
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.conflicts = 0
+        self.failed = 0
+        self.invalid = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+
+    def __repr__(self) -> str:
+        return ('<PayoutSummary sent={0.sent} conflicts={0.conflicts} failed={0.failed} '
+            'invalid={0.invalid} skipped={0.skipped} elapsed={0.elapsed:.3f}s>').format(self)
+
+
+def read_rows(path: str, format: Optional[str] = None, decode: bool = True) -> Iterator[Union[Dict[str, Any], str]]:
+    """
+    Read the rows of a CSV or JSONL file one by one
+
+    Arguments:
+        path: string
+        format [optional]: 'csv' or 'jsonl', guessed from the extension when missing
+        decode [optional]: boolean, False yields the JSONL lines undecoded, to decode them with decode_row
+
+    Returns:
+        iterator of dictionaries, or of strings for JSONL lines when decode is False
+    """
+    if format is None:
+        format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if format == 'csv':
+            yield from csv.DictReader(f)
+        elif format in ('jsonl', 'ndjson'):
+            for line in f:
+                if line.strip():
+                    yield _from_json(line) if decode else line
+        else:
+            raise ValueError(f'Unknown payout file format {format!r}')
+
+
+def decode_row(row: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+    """
+    Decode a row yielded by read_rows with decode=False
+
+    Arguments:
+        row: dictionary, or string for a JSONL line
+
+    Returns:
+        dictionary
+
+    Raises:
+        ValueError: the line is not valid JSON, or not a JSON object
+    """
+    if isinstance(row, str):
+        try:
+            row = _from_json(row)
+        except ValueError as e:
+            raise ValueError(f'invalid JSON line: {e}') from None
+    if not isinstance(row, dict):
+        raise ValueError(f'a row must be a JSON object, got {type(row).__name__}')
+    return row
+
+
+def _field(row: Dict[str, Any], *names: str) -> Optional[str]:
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ''):
+            return str(value).strip()
+    return None
+
+
+def row_to_body(row: Dict[str, Any], index: int, source: str = '', run_id: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Convert a payout row to a reference id and a transfer/deposit body
+
+    Columns: amount, currency, msisdn (or partyId), partyIdType [optional],
+    externalId [optional], payerMessage [optional], payeeNote [optional],
+    referenceId [optional]. A leading + of an MSISDN is removed.
+
+    Arguments:
+        row: dictionary
+        index: integer, position of the row in the file
+        source [optional]: string, namespace of the reference ids when there is no run_id
+        run_id [optional]: string, namespace of the reference ids, e.g. 'payroll-2026-10'
+
+    Returns:
+        Tuple: (reference id, body)
+    """
+    amount = _field(row, 'amount')
+    currency = _field(row, 'currency')
+    party_id = _field(row, 'msisdn', 'partyId', 'party_id')
+    external_id = _field(row, 'externalId', 'external_id')
+
+    if amount is None:
+        raise ValueError('missing amount')
+    try:
+        if Decimal(amount) <= 0:
+            raise ValueError(f'amount must be positive, got {amount}')
+    except InvalidOperation:
+        raise ValueError(f'invalid amount {amount!r}') from None
+    if currency is None or len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f'invalid currency {currency!r}')
+    if party_id is None:
+        raise ValueError('missing msisdn')
+    party_id_type = _field(row, 'partyIdType', 'party_id_type') or 'MSISDN'
+    if party_id_type == 'MSISDN' and party_id.startswith('+'):
+        #E.164 numbers are sent without their +
+        party_id = party_id[1:]
+
+    reference_id = _field(row, 'referenceId', 'reference_id')
+    if reference_id is None:
+        namespace = f'payout:{run_id if run_id is not None else source}'
+        reference_id = stable_reference_id(external_id or f'#{index}', namespace)
+
+    body = {
+        'amount': amount,
+        'currency': currency.upper(),
+        'externalId': external_id or str(index),
+        'payee': {
+            'partyIdType': party_id_type,
+            'partyId': party_id
+        },
+        'payerMessage': _field(row, 'payerMessage', 'payer_message') or '',
+        'payeeNote': _field(row, 'payeeNote', 'payee_note') or ''
+    }
+    return reference_id, body
+
+
+async def run_payouts(
+    disbursements: 'Disbursements',
+    source: str,
+    output: str,
+    target: str,
+    operation: str = 'transfer',
+    authorization: Optional[str] = None,
+    url_callback: Optional[str] = None,
+    concurrency: int = 10,
+    checkpoint: Optional[str] = None,
+    format: Optional[str] = None,
+    checkpoint_every: int = 100,
+    run_id: Optional[str] = None
+    ) -> PayoutSummary:
+    """
+    Stream a payout file through Disbursements.transfer or Disbursements.deposit
+
+    Rows are read lazily, results are appended to ``output`` as JSON lines as
+    they complete, and memory use does not depend on the file size. With a
+    ``checkpoint`` file, a new run starts after the last finished row and rows
+    already accepted by MTN are answered 409 instead of being paid twice. A
+    409 is reported as a conflict, not as sent: check the status of its
+    reference id before paying the row again.
+
+    Reference ids are derived from ``run_id`` and the externalId of each row,
+    so an externalId paid by an earlier run is paid again by a new one. Without
+    ``run_id`` the path of the source file is used; give one when the same
+    file name is reused, e.g. 'payroll-2026-10'.
+
+    Arguments:
+        disbursements: Disbursements
+        source: string, CSV or JSONL file
+        output: string, JSON lines file the results are appended to
+        target: string
+        operation [optional]: 'transfer' or 'deposit'
+        authorization [optional]: string, None uses the managed access token
+        url_callback [optional]: string
+        concurrency [optional]: integer, maximum number of requests in flight
+        checkpoint [optional]: string, file storing the progress
+        format [optional]: 'csv' or 'jsonl'
+        checkpoint_every [optional]: integer, rows between two checkpoint writes
+        run_id [optional]: string, the same for every attempt of this run only
+
+    Returns:
+        PayoutSummary
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f'operation must be one of {OPERATIONS}')
+    send = getattr(disbursements, operation)
+    #no set of the reference ids seen, memory must not grow with the file
+    validator = PaymentValidator(operation, unique=False)
+
+    summary = PayoutSummary()
+    progress = Checkpoint(checkpoint) if checkpoint is not None else None
+    start_at = progress.position if progress is not None else 0
+    summary.skipped = start_at
+    start = time.perf_counter()
+    namespace_source = os.path.abspath(source)
+
+    def rows() -> Iterator[Tuple[int, Union[Dict[str, Any], str]]]:
+        #lines are decoded by call, a malformed one only fails its own row
+        for index, row in enumerate(read_rows(source, format, decode=False)):
+            if index >= start_at:
+                yield index, row
+
+    async def call(_: int, item: Tuple[int, Union[Dict[str, Any], str]]) -> BulkResult:
+        index, row = item
+        try:
+            reference_id, body = row_to_body(decode_row(row), index, namespace_source, run_id)
+        except (ValueError, TypeError) as e:
+            return BulkResult(index, None, error=e)
+        problems = validator.check(body, reference_id)
+        if problems:
+            return BulkResult(index, None, error=InvalidPayment(problems))
+        try:
+            _, data = await send(reference_id, authorization, target, body, url_callback)
+        except Exception as e:
+            return BulkResult(index, reference_id, getattr(e, 'status', None), error=e)
+        return BulkResult(index, reference_id, 202, data)
+
+    with open(output, 'a', encoding='utf-8') as out:
+        pending = 0
+        async for result in run_bulk(rows(), call, concurrency):
+            if result.ok:
+                summary.sent += 1
+            elif isinstance(result.error, Conflict):
+                #sent by an earlier attempt of this run, or the reference id is used by another payment
+                summary.conflicts += 1
+            elif result.reference_id is None:
+                summary.invalid += 1
+            else:
+                summary.failed += 1
+
+            out.write(json.dumps({
+                'index': result.index,
+                'reference_id': result.reference_id,
+                'status': result.status,
+                'ok': result.ok,
+                'error': None if result.error is None else str(result.error)
+            }) + '\n')
+
+            if progress is not None:
+                progress.done(result.index)
+                pending += 1
+                if pending >= checkpoint_every:
+                    # results must reach the disk before the checkpoint moves past them
+                    out.flush()
+                    progress.save()
+                    pending = 0
+
+        out.flush()
+        if progress is not None:
+            progress.save()
+
+    summary.elapsed = time.perf_counter() - start
+    return summary
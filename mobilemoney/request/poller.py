@@ -0,0 +1,232 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
+
+from .models import TERMINAL_STATUSES
+
+
+class _Pending:
+    __slots__ = ('future', 'attempt', 'errors', 'deadline')
+
+    def __init__(self, future: 'asyncio.Future[Any]', deadline: Optional[float]) -> None:
+        self.future = future
+        self.attempt = 0
+        self.errors = 0
+        self.deadline = deadline
+
+
+class StatusPoller:
+    """
+    Poll many pending transactions until they reach a terminal status
+
+    Every reference id has its own exponential backoff with jitter. All of them
+    share one scheduler task driven by a heap of due times, and at most
+    ``concurrency`` status requests are in flight at once.
+
+    Arguments:
+        fetch: coroutine function taking a reference id and returning the
+            ``(boolean, data)`` tuple of a status method
+        initial_delay [optional]: float, seconds before the first poll
+        factor [optional]: float, backoff multiplier between two polls
+        max_delay [optional]: float, longest wait between two polls
+        jitter [optional]: float, random spread applied to each wait (0.25 is +/- 25%)
+        timeout [optional]: float, seconds after which a reference id gives up
+        max_errors [optional]: integer, consecutive failed polls before giving up
+        concurrency [optional]: integer, maximum number of polls in flight
+        terminal [optional]: set of statuses that end the polling
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Tuple[bool, Any]]],
+        *,
+        initial_delay: float = 1.0,
+        factor: float = 2.0,
+        max_delay: float = 30.0,
+        jitter: float = 0.25,
+        timeout: Optional[float] = 300.0,
+        max_errors: int = 5,
+        concurrency: int = 20,
+        terminal: FrozenSet[str] = TERMINAL_STATUSES
+        ) -> None:
+        self.fetch = fetch
+        self.initial_delay = initial_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.timeout = timeout
+        self.max_errors = max_errors
+        self.concurrency = concurrency
+        self.terminal = terminal
+        self.__pending: Dict[str, _Pending] = {}
+        self.__heap: List[Tuple[float, int, str]] = []
+        self.__counter = itertools.count()
+        self.__wake: Optional[asyncio.Event] = None
+        self.__slots: Optional[asyncio.Semaphore] = None
+        self.__task: Optional['asyncio.Future[None]'] = None
+        #status requests in flight, cancelled by close
+        self.__polls: Set['asyncio.Future[None]'] = set()
+
+    def __len__(self) -> int:
+        return len(self.__pending)
+
+    def track(self, reference_id: str) -> 'asyncio.Future[Any]':
+        """
+        Method to start polling a reference id
+
+        Arguments:
+            reference_id: string
+
+        Returns:
+            Future resolved with the status data once it is terminal
+        """
+        entry = self.__pending.get(reference_id)
+        if entry is not None:
+            return entry.future
+
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.timeout if self.timeout is not None else None
+        entry = _Pending(loop.create_future(), deadline)
+        self.__pending[reference_id] = entry
+        self.__schedule(reference_id, self.initial_delay)
+
+        if self.__task is None or self.__task.done():
+            self.__wake = asyncio.Event()
+            self.__slots = asyncio.Semaphore(self.concurrency)
+            self.__task = asyncio.ensure_future(self.__run())
+        return entry.future
+
+    async def wait(self, reference_id: str) -> Any:
+        """
+        Method to poll a reference id and wait for its terminal status
+
+        Arguments:
+            reference_id: string
+
+        Returns:
+            status data: dictionary
+        """
+        return await asyncio.shield(self.track(reference_id))
+
+    def untrack(self, reference_id: str) -> None:
+        """Method to stop polling a reference id, its future is cancelled"""
+        entry = self.__pending.pop(reference_id, None)
+        if entry is not None and not entry.future.done():
+            entry.future.cancel()
+
+    async def close(self) -> None:
+        """Method to stop the scheduler, the status requests in flight and cancel every pending future"""
+        for reference_id in list(self.__pending):
+            self.untrack(reference_id)
+        self.__heap.clear()
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+        polls = list(self.__polls)
+        for poll in polls:
+            poll.cancel()
+        #nothing may still use the session once close returns
+        await asyncio.gather(*polls, return_exceptions=True)
+
+    def __schedule(self, reference_id: str, delay: float) -> None:
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        due = asyncio.get_event_loop().time() + delay
+        heapq.heappush(self.__heap, (due, next(self.__counter), reference_id))
+        if self.__wake is not None and self.__heap[0][2] == reference_id:
+            self.__wake.set()
+
+    async def __run(self) -> None:
+        loop = asyncio.get_event_loop()
+        assert self.__wake is not None and self.__slots is not None
+        while self.__pending:
+            if not self.__heap:
+                # every pending reference id is being polled right now
+                self.__wake.clear()
+                await self.__wake.wait()
+                continue
+
+            due, _, reference_id = self.__heap[0]
+            delay = due - loop.time()
+            if delay > 0:
+                self.__wake.clear()
+                try:
+                    await asyncio.wait_for(self.__wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self.__heap)
+            if reference_id not in self.__pending:
+                continue
+            await self.__slots.acquire()
+            poll = asyncio.ensure_future(self.__poll(reference_id))
+            self.__polls.add(poll)
+            poll.add_done_callback(self.__polls.discard)
+
+    async def __poll(self, reference_id: str) -> None:
+        assert self.__slots is not None and self.__wake is not None
+        data: Any = None
+        error: Optional[BaseException] = None
+        try:
+            _, data = await self.fetch(reference_id)
+        except Exception as e:
+            error = e
+        finally:
+            self.__slots.release()
+
+        entry = self.__pending.get(reference_id)
+        if entry is None:
+            return
+
+        status = data.get('status') if isinstance(data, Mapping) else None
+        if status in self.terminal:
+            del self.__pending[reference_id]
+            if not entry.future.done():
+                entry.future.set_result(data)
+            return
+
+        entry.attempt += 1
+        entry.errors = entry.errors + 1 if error is not None else 0
+        delay = min(self.max_delay, self.initial_delay * self.factor ** entry.attempt)
+
+        if error is not None and entry.errors >= self.max_errors:
+            self.__fail(reference_id, entry, error)
+        elif entry.deadline is not None and asyncio.get_event_loop().time() + delay > entry.deadline:
+            self.__fail(reference_id, entry, asyncio.TimeoutError(f'{reference_id} is still {status or "unknown"}'))
+        else:
+            self.__schedule(reference_id, delay)
+        self.__wake.set()
+
+    def __fail(self, reference_id: str, entry: _Pending, error: BaseException) -> None:
+        del self.__pending[reference_id]
+        if not entry.future.done():
+            entry.future.set_exception(error)
+            # nobody may be waiting on it
+            entry.future.add_done_callback(lambda f: f.cancelled() or f.exception())
@@ -0,0 +1,489 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import base64
+import binascii
+from typing import Any, Awaitable, Callable, ClassVar, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple, TYPE_CHECKING
+
+from .bulk import BulkResult, run_bulk
+from .cache import TTLCache
+from .http import HTTPClient
+from .idempotency import IdempotencyGuard
+from .journal import Journal, ACCEPTED, CONFLICT, REJECTED, UNKNOWN, NOT_SENT, subscription_digest
+from .route import Endpoint, Route
+from .token import AccessTokenManager
+from ..utils.utils import stable_reference_id, b64_encode, is_valid_basic_token, is_valid_bearer_token, errors_manager
+from ..errors.errors import Conflict, HTTPException, InvalidBasicToken, InvalidBearerToken, NotFound, Unauthorized
+
+if TYPE_CHECKING:
+    from .callback import CallbackReceiver
+
+
+class Product:
+    """
+    Represent what the Collection and Disbursements clients have in common
+
+    Arguments:
+        http: a HTTP client class
+        subscription_key: a string
+
+    Returns:
+        None
+    """
+
+    #name of the product in the endpoint table, set by every product client
+    product: ClassVar[str] = ''
+
+    #routes answered from the balance cache, and routes moving money out of date it
+    BALANCE_KEYS: ClassVar[FrozenSet[str]] = frozenset({'get_account_balance', 'get_account_balance_in'})
+    MONEY_MOVEMENTS: ClassVar[FrozenSet[str]] = frozenset({'transfer', 'deposit', 'refund', 'withdraw'})
+    #account holder lookups, the same for every product so their cache can be shared
+    ACCOUNT_KEYS: ClassVar[FrozenSet[str]] = frozenset({'is_active', 'get_basic_info'})
+    #status route of every call written to the journal, set by every product client
+    STATUS_KEYS: ClassVar[Dict[str, str]] = {}
+
+    def __init__(self, http: HTTPClient, subscription_key: str) -> None:
+        self.http = http
+        self.endpoints: Dict[str, Endpoint] = http.endpoints[self.product]
+        self.subscription_key = subscription_key
+        self.__authorization: Optional[str] = None
+        self.__api_user: Optional[str] = None
+        self.token = AccessTokenManager(self.__fetch_token)
+        self.callbacks: Optional['CallbackReceiver'] = None
+        self.balances: Optional[TTLCache] = None
+        self.accounts: Optional[TTLCache] = None
+        self.journal: Optional[Journal] = None
+        self.idempotency: Optional[IdempotencyGuard] = None
+
+    @property
+    def subscription_key(self) -> str:
+        return self.__subscription_key
+
+    @property
+    def api_user(self) -> Optional[str]:
+        """API user of the Basic token given with set_credentials or set_authorization, None before"""
+        return self.__api_user
+
+    @subscription_key.setter
+    def subscription_key(self, subscription_key: str) -> None:
+        #headers shared by every call, copied instead of rebuilt per request
+        self.__subscription_key = subscription_key
+        #tells the accounts apart in the idempotency keys and reference ids, without the secret
+        self.__tenant = subscription_digest(subscription_key)[:16]
+        self.__headers: Dict[str, str] = {'Ocp-Apim-Subscription-Key': subscription_key}
+        self.__payment_headers: Dict[str, str] = {'Ocp-Apim-Subscription-Key': subscription_key, 'Content-Type': 'application/json'}
+
+    def set_credentials(self, apiuser: str, apikey: str) -> None:
+        """
+        Method to let the client create and refresh its own access token
+
+        Once set, pass ``None`` as ``authorization`` to any method to use the
+        managed Bearer token.
+
+        Arguments:
+            apiuser: string
+            apikey: string
+        """
+        self.set_authorization(f'Basic {b64_encode(f"{apiuser}:{apikey}")}')
+
+    def set_authorization(self, authorization: str) -> None:
+        """
+        Method to give the Basic token used to create access tokens
+
+        Arguments:
+            authorization: string
+        """
+        if not is_valid_basic_token(authorization):
+            raise InvalidBasicToken('Invalid Basic Token Type given')
+        if authorization != self.__authorization:
+            self.__authorization = authorization
+            self.__api_user = _api_user(authorization)
+            #a refresh in flight uses the old credentials, new callers must not join it
+            self.token.reset()
+
+    def use_callbacks(self, receiver: Optional['CallbackReceiver']) -> None:
+        """
+        Method to receive callbacks instead of polling
+
+        Transactions sent without a callback URL get one from the receiver. A
+        callback makes the receiver read the status from MTN, and status
+        methods answer from the statuses read this way once they are final.
+
+        Arguments:
+            receiver: CallbackReceiver, None to stop using it
+        """
+        self.callbacks = receiver
+
+    def cache_balances(self, ttl: Optional[float] = 5.0, max_size: int = 64) -> None:
+        """
+        Method to answer balance reads from a cache for ``ttl`` seconds
+
+        Concurrent reads of the same balance share one request, and the cache
+        is emptied whenever this client sends a transfer, deposit, refund or
+        withdraw.
+
+        Arguments:
+            ttl [optional]: float, None to stop caching
+            max_size [optional]: integer, number of balances kept
+        """
+        self.balances = TTLCache(ttl, max_size=max_size) if ttl is not None else None
+
+    def use_account_cache(self, cache: Optional[TTLCache]) -> None:
+        """
+        Method to answer isActive and get_basic_user_info from a cache
+
+        The cache can be shared by several clients. Inactive accounts and
+        unknown numbers (404) are cached too, for the cache ``negative_ttl``.
+
+        Arguments:
+            cache: TTLCache, e.g. TTLCache(3600, negative_ttl=300), None to stop caching
+        """
+        self.accounts = cache
+
+    def use_journal(self, journal: Optional[Journal]) -> None:
+        """
+        Method to write every money-moving call to a journal before it is sent
+
+        After a crash, :meth:`recover` checks the calls whose outcome was never
+        written instead of sending them again blindly.
+
+        Arguments:
+            journal: FileJournal or SQLiteJournal, it can be shared by several clients, None to stop using it
+        """
+        self.journal = journal
+
+    def use_idempotency(self, guard: Optional[IdempotencyGuard]) -> None:
+        """
+        Method to send each payment of a business key (the externalId by default) once
+
+        Arguments:
+            guard: IdempotencyGuard, it can be shared by several clients, None to stop using it
+        """
+        self.idempotency = guard
+
+    def reference_id(self, business_key: str) -> str:
+        """
+        Method to get the X-Reference-Id of a business key, the same on every run and worker
+
+        The subscription key is part of it, two accounts paying the same
+        business key get different reference ids.
+
+        Arguments:
+            business_key: string, e.g. an invoice number
+
+        Returns:
+            UUID: string
+        """
+        if self.idempotency is not None:
+            return self.idempotency.reference_id(business_key, self.__tenant)
+        return stable_reference_id(business_key, f'mobilemoney:{self.__tenant}')
+
+    async def recover(self, authorization: Optional[str] = None, concurrency: int = 10, resend: bool = False) -> Dict[str, Optional[str]]:
+        """
+        Method to resolve the calls of the journal whose outcome is unknown
+
+        The status route of each call tells if MTN got it. Calls MTN never got
+        are marked NOT_SENT, or sent again with the same reference id when
+        ``resend`` is True (MTN answers 409 if it got the first one after all).
+        Only the calls sent with the subscription key of this client, and its
+        API user when known, are read: a journal shared by several accounts
+        keeps the calls of the others for their own clients.
+
+        Arguments:
+            authorization [optional]: string, None uses the managed access token
+            concurrency [optional]: integer, maximum number of status requests in flight
+            resend [optional]: boolean, send the calls MTN never got
+
+        Returns:
+            dictionary: reference id -> new state, None when the status could not be read
+        """
+        journal = self.journal
+        if journal is None:
+            raise ValueError('No journal set, call use_journal() first')
+
+        async def call(index: int, entry: Any) -> BulkResult:
+            reference_id = entry.reference_id
+            try:
+                _, data = await self._status(self.STATUS_KEYS[entry.key], authorization, reference_id, entry.target)
+            except NotFound:
+                if not resend:
+                    journal.outcome(reference_id, NOT_SENT, 404)
+                    return BulkResult(index, reference_id, 404, NOT_SENT)
+                try:
+                    await self._payment(entry.key, authorization, reference_id, entry.target, entry.body)
+                except Exception as e:
+                    #the entry holds the outcome written by the failed attempt
+                    return BulkResult(index, reference_id, getattr(e, 'status', None), entry.state)
+                return BulkResult(index, reference_id, self.endpoints[entry.key].success, ACCEPTED)
+            except Exception as e:
+                return BulkResult(index, reference_id, getattr(e, 'status', None), error=e)
+            journal.outcome(reference_id, ACCEPTED, data.get('status') if isinstance(data, Mapping) else None)
+            return BulkResult(index, reference_id, 200, ACCEPTED)
+
+        results: Dict[str, Optional[str]] = {}
+        async for result in run_bulk(journal.unresolved(self.product, self.subscription_key, self.api_user), call, concurrency):
+            results[result.reference_id] = result.data if result.ok else None  # type: ignore
+        await journal.flush()
+        return results
+
+    def callback_url(self, uuid: str, callback: Optional[str] = None, key: Optional[str] = None, target: Optional[str] = None, authorization: Optional[str] = None) -> Optional[str]:
+        """Method to resolve the X-Callback-Url sent with a transaction, its callbacks read the status of ``key`` on ``target``"""
+        if callback is None and self.callbacks is not None and key in self.STATUS_KEYS and target is not None:
+            status_key = self.STATUS_KEYS[key]
+            return self.callbacks.url_for(uuid, lambda reference_id: self._get(status_key, authorization, target, {'referenceId': reference_id}))
+        return callback
+
+    def final_status(self, uuid: str) -> Optional[Mapping[str, Any]]:
+        """Method to get the final status of a transaction read from MTN after its callback"""
+        if self.callbacks is not None:
+            return self.callbacks.final_status(uuid)
+        return None
+
+    async def bearer(self, authorization: Optional[str] = None) -> str:
+        """
+        Method to resolve the Bearer token of a call
+
+        Arguments:
+            authorization [optional]: string, None uses the managed access token
+
+        Returns:
+            Bearer token: string
+        """
+        if authorization is not None:
+            return authorization
+        return await self.token.get()
+
+    async def __fetch_token(self) -> Tuple[bool, Dict[str, Any]]:
+        if self.__authorization is None:
+            raise InvalidBasicToken('No credentials set, call set_credentials() first')
+        return await self.create_access_token(self.__authorization)
+
+    async def verify_accounts(
+        self,
+        msisdns: Iterable[str],
+        target: str,
+        authorization: Optional[str] = None,
+        account_type: str = 'msisdn',
+        concurrency: int = 10
+        ) -> Dict[str, Optional[bool]]:
+        """
+        Method to check if many accounts are active
+
+        Duplicates are checked once, accounts found in the account cache are
+        answered without a request and only the others are sent, at most
+        ``concurrency`` at a time.
+
+        Arguments:
+            msisdns: iterable of strings
+            target: string
+            authorization [optional]: string, None uses the managed access token
+            account_type [optional]: string
+            concurrency [optional]: integer, maximum number of requests in flight
+
+        Returns:
+            dictionary: account -> True (active), False (inactive or unknown), None (the check failed)
+        """
+        accounts = list(dict.fromkeys(msisdns))
+        results: Dict[str, Optional[bool]] = {}
+        misses: List[str] = []
+        for account in accounts:
+            entry = None
+            if self.accounts is not None:
+                entry = self.accounts.lookup(self.__account_key('is_active', target, self._active_params(account, account_type)))
+            if entry is None:
+                misses.append(account)
+            else:
+                #a cached error is an unknown number
+                results[account] = entry[1] is None and not _inactive(entry[0])
+
+        async def call(index: int, account: str) -> BulkResult:
+            try:
+                result = await self._get('is_active', authorization, target, self._active_params(account, account_type))
+            except NotFound as e:
+                return BulkResult(index, account, e.status, False)
+            except Exception as e:
+                return BulkResult(index, account, getattr(e, 'status', None), error=e)
+            return BulkResult(index, account, 200, not _inactive(result))
+
+        async for result in run_bulk(misses, call, concurrency):
+            results[result.reference_id] = result.data if result.ok else None  # type: ignore
+        return {account: results[account] for account in accounts}
+
+    @staticmethod
+    def _active_params(account: str, account_type: Optional[str]) -> Dict[str, str]:
+        return {'accountHolderIdType': account_type or 'msisdn', 'accountHolderId': account}
+
+    @staticmethod
+    def __account_key(key: str, target: str, params: Optional[Dict[str, str]]) -> Tuple:
+        return (target, key) + tuple(sorted(params.items())) if params else (target, key)
+
+    async def _send(self, key: str, headers: Dict[str, str], body: Optional[Dict] = None, params: Optional[Dict[str, str]] = None) -> Tuple:
+        return await self._request(self.endpoints[key].route(self.http.isLive, headers, body, params))
+
+    async def _request(self, route: Route) -> Tuple:
+        response = await self.http.request(route)
+
+        if response.status == route.accepted:
+            return (True, response.data)
+        else:
+            errors_manager(response, response.data)
+
+    async def _access_token(self, authorization: str) -> Tuple:
+        if is_valid_basic_token(authorization):
+            headers = self.__headers.copy()
+            headers['Authorization'] = authorization
+            return await self._send('create_access_token', headers)
+        else:
+            raise InvalidBasicToken('Invalid Basic Token Type given')
+
+    async def _get(self, key: str, authorization: Optional[str], target: str, params: Optional[Dict[str, str]] = None) -> Tuple:
+        if self.balances is not None and key in self.BALANCE_KEYS:
+            currency = params.get('currency') if params else None
+            return await self.balances.get_or_load((target, key, currency), lambda: self.__get(key, authorization, target, params))
+        if self.accounts is not None and key in self.ACCOUNT_KEYS:
+            return await self.accounts.get_or_load(
+                self.__account_key(key, target, params),
+                lambda: self.__get(key, authorization, target, params),
+                negative=_inactive,
+                errors=(NotFound,)
+            )
+        return await self.__get(key, authorization, target, params)
+
+    async def __get(self, key: str, authorization: Optional[str], target: str, params: Optional[Dict[str, str]] = None) -> Tuple:
+        async def send(bearer: str) -> Tuple:
+            headers = self.__headers.copy()
+            headers['Authorization'] = bearer
+            headers['X-Target-Environment'] = target
+            return await self._send(key, headers, params=params)
+
+        return await self.__authorized(authorization, send)
+
+    async def __authorized(self, authorization: Optional[str], send: Callable[[str], Awaitable[Tuple]]) -> Tuple:
+        bearer = await self.bearer(authorization)
+        if not is_valid_bearer_token(bearer):
+            raise InvalidBearerToken('Invalid Bearer Token Type given')
+        try:
+            return await send(bearer)
+        except Unauthorized:
+            if authorization is not None:
+                raise
+            #the managed token was revoked before it expired, get a new one and try once more
+            self.token.invalidate(bearer)
+            return await send(await self.token.get())
+
+    async def _status(self, key: str, authorization: Optional[str], uuid: str, target: str) -> Tuple:
+        self.http.uuid_checker(uuid)
+
+        cached = self.final_status(uuid)
+        if cached is not None:
+            return (True, cached)
+
+        return await self._get(key, authorization, target, {'referenceId': uuid})
+
+    async def _payment(self, key: str, authorization: Optional[str], uuid: str, target: str, body: Dict, callback: Optional[str] = None) -> Tuple:
+        guard = self.idempotency
+        if guard is not None and key in self.STATUS_KEYS:
+            business_key = guard.key(key, uuid, body)
+            if business_key is not None:
+                routes: List[Route] = []
+                return await guard.run(
+                    f'{self.product}.{key}:{self.__tenant}:{business_key}', uuid,
+                    lambda: self.__payment(key, authorization, uuid, target, body, callback, routes),
+                    #the key is only freed when the payment surely did not go through, like in the journal
+                    lambda error: _journal_state(error, routes[-1] if routes else None) in (REJECTED, NOT_SENT)
+                )
+        return await self.__payment(key, authorization, uuid, target, body, callback)
+
+    async def __payment(
+        self,
+        key: str,
+        authorization: Optional[str],
+        uuid: str,
+        target: str,
+        body: Dict,
+        callback: Optional[str] = None,
+        routes: Optional[List[Route]] = None
+        ) -> Tuple:
+        #check if uuid is valid and raise error if not
+        self.http.uuid_checker(uuid)
+
+        callback = self.callback_url(uuid, callback, key, target, authorization)
+
+        async def send(bearer: str) -> Tuple:
+            headers = self.__payment_headers.copy()
+            headers['Authorization'] = bearer
+            headers['X-Target-Environment'] = target
+            headers['X-Reference-Id'] = uuid
+            #callback url is optional, the header is only sent when there is one
+            if callback is not None:
+                headers['X-Callback-Url'] = callback
+
+            journal = self.journal if key in self.STATUS_KEYS else None
+            if journal is not None:
+                #on disk before anything is sent
+                await journal.intent(uuid, self.product, key, target, body, self.subscription_key, self.api_user)
+
+            route = self.endpoints[key].route(self.http.isLive, headers, body)
+            if routes is not None:
+                routes.append(route)
+            try:
+                result = await self._request(route)
+            except BaseException as e:
+                if journal is not None:
+                    journal.outcome(uuid, _journal_state(e, route), getattr(e, 'status', None))
+                raise
+            else:
+                if journal is not None:
+                    journal.outcome(uuid, ACCEPTED, self.endpoints[key].success)
+                return result
+            finally:
+                #even a failed call may have moved money, e.g. on a timeout
+                if self.balances is not None and key in self.MONEY_MOVEMENTS:
+                    self.balances.invalidate()
+
+        return await self.__authorized(authorization, send)
+
+
+def _journal_state(error: BaseException, route: Optional[Route]) -> str:
+    #failed before leaving the client: circuit open, cancelled in the rate limiter queue...
+    if route is None or not route.sent:
+        return NOT_SENT
+    #only an answer from MTN tells the call was not taken, anything else may have moved money
+    if isinstance(error, Conflict):
+        return CONFLICT
+    if isinstance(error, HTTPException) and 400 <= error.status < 500:
+        return REJECTED
+    return UNKNOWN
+
+
+def _api_user(authorization: str) -> Optional[str]:
+    #'Basic base64(apiuser:apikey)'
+    try:
+        credentials = base64.b64decode(authorization[len('Basic '):], validate=True).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    api_user, separator, _ = credentials.partition(':')
+    return api_user if separator else None
+
+
+def _inactive(result: Tuple) -> bool:
+    #isActive answers {"result": false} for inactive accounts
+    data = result[1] if result else None
+    return isinstance(data, Mapping) and data.get('result') is False
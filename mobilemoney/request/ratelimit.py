@@ -0,0 +1,212 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from .route import Route
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convert a Retry-After header to seconds
+
+    Arguments:
+        value: string, delay in seconds or HTTP date
+
+    Returns:
+        seconds: float, None when the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Represent a token bucket, callers wait in order for a token
+
+    The rate is lowered when MTN answers 429 and climbs back to its configured
+    value as calls succeed again.
+
+    Arguments:
+        rate: float, tokens added per second, None for no limit
+        burst: integer, maximum number of tokens stored
+    """
+
+    __slots__ = ('rate', 'burst', 'base_rate', 'tokens', 'updated', 'paused_until', '_lock')
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None) -> None:
+        self.rate = rate
+        self.base_rate = rate
+        self.burst = burst if burst is not None else max(int(rate or 1), 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        """Method to wait until a call may be sent"""
+        if self.rate is None and self.paused_until <= time.monotonic():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # the lock keeps waiting callers in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self.paused_until > now:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.rate is None:
+                    return
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttle(self, retry_after: Optional[float], decrease: float, default_pause: float) -> None:
+        """Method to pause the bucket and lower its rate after a 429, one call may go once the pause is over"""
+        pause = retry_after if retry_after is not None else default_pause
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        if self.rate is not None:
+            self.rate = max(self.rate * decrease, 0.1)
+            #the pause replaces the refill wait, no burst once it is over
+            self.tokens = 1.0
+            self.updated = self.paused_until
+
+    def recover(self, increase: float) -> None:
+        """Method to raise the rate back toward its configured value"""
+        if self.rate is not None and self.base_rate is not None and self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * increase)
+
+
+class RateLimiter:
+    """
+    Queue calls so they stay under the limits of each subscription key
+
+    Limits are set per product (``'collection'``, ``'disbursement'``,
+    ``'provisioning'``) or per route key (``'collection.request_to_pay'``) and
+    apply to every subscription key separately. A call waits for both its
+    product and its route bucket. Every subscription key also gets a product
+    bucket without limit that is paused when MTN answers 429.
+
+    Arguments:
+        limits [optional]: dictionary of scope to (rate per second, burst)
+        decrease [optional]: float, rate multiplier applied on 429
+        increase [optional]: float, share of the configured rate recovered per success
+        default_pause [optional]: float, pause in seconds after a 429 without Retry-After
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Mapping[str, Tuple[float, Optional[int]]]] = None,
+        *,
+        decrease: float = 0.5,
+        increase: float = 0.05,
+        default_pause: float = 1.0
+        ) -> None:
+        self.limits: Dict[str, Tuple[float, Optional[int]]] = dict(limits or {})
+        self.decrease = decrease
+        self.increase = increase
+        self.default_pause = default_pause
+        self.__buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def __len__(self) -> int:
+        return len(self.__buckets)
+
+    def set_limit(self, scope: str, rate: float, burst: Optional[int] = None) -> None:
+        """
+        Method to set the limit of a product or of a route key
+
+        Arguments:
+            scope: string, e.g. 'collection' or 'disbursement.transfer'
+            rate: float, calls per second
+            burst [optional]: integer, calls allowed at once
+        """
+        self.limits[scope] = (rate, burst)
+        #buckets are rebuilt with the new limit on their next use
+        self.__buckets = {k: v for k, v in self.__buckets.items() if k[1] != scope}
+
+    def forget(self, subscription_key: str) -> int:
+        """
+        Method to drop the buckets of a subscription key, e.g. once its client is gone
+
+        A later call with the key starts from full buckets.
+
+        Arguments:
+            subscription_key: string
+
+        Returns:
+            number of buckets dropped
+        """
+        keys = [key for key in self.__buckets if key[0] == subscription_key]
+        for key in keys:
+            del self.__buckets[key]
+        return len(keys)
+
+    def buckets(self, route: Route) -> List[TokenBucket]:
+        """Method to get the buckets a route must go through"""
+        subscription_key = (route.headers or {}).get('Ocp-Apim-Subscription-Key', '')
+        scopes = [route.product]
+        if route.key is not None:
+            scope = f'{route.product}.{route.key}'
+            if scope in self.limits:
+                scopes.append(scope)
+
+        buckets = []
+        for scope in scopes:
+            bucket = self.__buckets.get((subscription_key, scope))
+            if bucket is None:
+                rate, burst = self.limits.get(scope, (None, None))
+                bucket = self.__buckets[(subscription_key, scope)] = TokenBucket(rate, burst)
+            buckets.append(bucket)
+        return buckets
+
+    async def acquire(self, route: Route) -> None:
+        """Method to wait until a route may be sent"""
+        for bucket in self.buckets(route):
+            await bucket.acquire()
+
+    @staticmethod
+    def pauses(status: int, headers: Mapping[str, str]) -> bool:
+        """Method to check if a response pauses the buckets of its route, for its Retry-After"""
+        return status == 429 or (status == 503 and 'Retry-After' in headers)
+
+    def feedback(self, route: Route, status: int, headers: Mapping[str, str]) -> None:
+        """Method to adapt the buckets of a route to the response received"""
+        if self.pauses(status, headers):
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            for bucket in self.buckets(route):
+                bucket.throttle(retry_after, self.decrease, self.default_pause)
+        elif status < 400:
+            for bucket in self.buckets(route):
+                bucket.recover(self.increase)
@@ -1,13 +1,20 @@
 
 
+from typing import Any, Optional, TYPE_CHECKING
+
 from .http import HTTPClient
-from .collection import Collection
-from .disbursements import Disbursements
+
+if TYPE_CHECKING:
+    from .collection import Collection
+    from .disbursements import Disbursements
+
+#collection and disbursements are imported on first use, a worker that only
+#pays out never loads the collection module
 
 
 class Request:
-    def __init__(self):
-        self.__http = HTTPClient()
+    def __init__(self, **options: Any):
+        self.__http = HTTPClient(**options)
         self.__collection = None
         self.__disbursement = None
 
@@ -23,30 +30,42 @@ class Request:
         """
 
         return self.__http
-    def collection(self, subscription_key: str,  http : HTTPClient) -> Collection:
+    def collection(self, subscription_key: str, http: HTTPClient, apiuser: Optional[str] = None, apikey: Optional[str] = None) -> 'Collection':
         """
         Method to get the collection client
 
         Arguments:
             subscription_key: string
             http: HTTPClient
+            apiuser [optional]: string
+            apikey [optional]: string
         
         Returns:
             Collection client : Collection
         """
+        from .collection import Collection
+
         self.__collection = Collection(http, subscription_key)
+        if apiuser is not None and apikey is not None:
+            self.__collection.set_credentials(apiuser, apikey)
         return self.__collection
-    def disbursements(self, subscription_key: str, http: HTTPClient) -> Disbursements:
+    def disbursements(self, subscription_key: str, http: HTTPClient, apiuser: Optional[str] = None, apikey: Optional[str] = None) -> 'Disbursements':
         """
         Method to get the Disbursements client
 
         Arguments:
             subscription_key: string
             http: HTTPClient
+            apiuser [optional]: string
+            apikey [optional]: string
         
         Returns:
             Disbursements client : Disbursements
         """
 
+        from .disbursements import Disbursements
+
         self.__disbursement = Disbursements(http, subscription_key)
+        if apiuser is not None and apikey is not None:
+            self.__disbursement.set_credentials(apiuser, apikey)
         return self.__disbursement
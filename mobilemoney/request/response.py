@@ -0,0 +1,81 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from typing import Any, Dict, Mapping, Optional, Union
+
+
+class MomoResponse:
+    """
+    Represent the result of one request sent to MTN
+
+    Every call gets its own instance, so many requests can run concurrently on
+    the same :class:`HTTPClient` without sharing state. Instances are read only.
+
+    Attributes:
+        method: string
+        url: string
+        status: integer, HTTP status code
+        reason: string, HTTP reason phrase
+        headers: mapping of the response headers
+        data: parsed JSON body, or text when the body is not JSON
+        elapsed: float, seconds between sending the request and reading the body
+        attempts: integer, number of times the request was sent
+    """
+
+    __slots__ = ('method', 'url', 'status', 'reason', 'headers', 'data', 'elapsed', 'attempts')
+
+    method: str
+    url: str
+    status: int
+    reason: str
+    headers: Mapping[str, str]
+    data: Optional[Union[Dict[str, Any], str]]
+    elapsed: float
+    attempts: int
+
+    def __init__(
+        self,
+        method: str,
+        url: str,
+        status: int,
+        reason: str,
+        headers: Mapping[str, str],
+        data: Optional[Union[Dict[str, Any], str]],
+        elapsed: float,
+        attempts: int = 1
+        ) -> None:
+        setter = object.__setattr__
+        setter(self, 'method', method)
+        setter(self, 'url', url)
+        setter(self, 'status', status)
+        setter(self, 'reason', reason)
+        setter(self, 'headers', headers)
+        setter(self, 'data', data)
+        setter(self, 'elapsed', elapsed)
+        setter(self, 'attempts', attempts)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f'{type(self).__name__} is read only')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f'{type(self).__name__} is read only')
+
+    def __repr__(self) -> str:
+        return f'<MomoResponse {self.method} {self.url} status={self.status} elapsed={self.elapsed:.3f}s>'
@@ -0,0 +1,92 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import random
+import time
+from typing import FrozenSet, Optional
+
+from .route import Route
+
+RETRY_STATUSES: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """
+    Represent when and how long to wait before sending a request again
+
+    Only requests that are safe to send twice are retried: GET requests, the
+    access token request, and POST requests carrying an X-Reference-Id, which
+    MTN deduplicates. The same X-Reference-Id is sent on every attempt.
+
+    Arguments:
+        max_attempts [optional]: integer, attempts including the first one (1 disables retries)
+        base_delay [optional]: float, seconds of the first backoff
+        max_delay [optional]: float, longest backoff in seconds
+        deadline [optional]: float, seconds after the first attempt when no retry starts anymore
+        jitter [optional]: boolean, pick each backoff at random up to its maximum
+        statuses [optional]: set of HTTP status codes that are retried
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 5.0,
+        deadline: Optional[float] = 30.0,
+        jitter: bool = True,
+        statuses: FrozenSet[int] = RETRY_STATUSES
+        ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.jitter = jitter
+        self.statuses = statuses
+
+    def can_retry(self, route: Route) -> bool:
+        """Method to check if a route may be sent more than once"""
+        if self.max_attempts <= 1:
+            return False
+        if route.method == 'GET' or route.key == 'create_access_token':
+            return True
+        return 'X-Reference-Id' in (route.headers or {})
+
+    def backoff(self, attempt: int, started: float, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Method to get the wait before the next attempt
+
+        Arguments:
+            attempt: integer, number of attempts already made
+            started: float, time.monotonic() of the first attempt
+            retry_after [optional]: float, delay asked by MTN
+
+        Returns:
+            seconds: float, None when no attempt is left
+        """
+        if attempt >= self.max_attempts:
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if self.deadline is not None and time.monotonic() + delay - started > self.deadline:
+            return None
+        return delay
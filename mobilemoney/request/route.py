@@ -17,11 +17,13 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-from typing import ClassVar, Optional, Any, Union, Dict as Dict
+from typing import ClassVar, Optional, Any, Union, Dict as Dict, Mapping, Tuple
 
 class Route:
     """Classe in charge or all different paths"""
 
+    __slots__ = ('method', 'path', 'production', 'body', 'headers', 'url', 'product', 'key', 'accepted', 'sent')
+
     BASE : ClassVar[Dict[str, str]] = {
         'sandbox':'https://sandbox.momodeveloper.mtn.com',
         'live':'https://proxy.momoapi.mtn.com'
@@ -31,10 +33,120 @@ class Route:
         True:'live'
     }
 
-    def __init__(self, method : str, path: str, production : bool, headers : Dict = None, body : Optional[Any] = None) -> None:
+    def __init__(self, method : str, path: str, production : bool, headers : Dict = None, body : Optional[Any] = None, product: str = 'provisioning', key: Optional[str] = None, accepted: int = 202) -> None:
         self.method: str = method
         self.path: str = path
         self.production: bool = production
         self.body: str = body
         self.headers: str = headers
         self.url: str = self.BASE[self.ENV[self.production]] + self.path
+        #product and route key from the PATH tables, used by rate limiting
+        self.product: str = product
+        self.key: Optional[str] = key
+        #status returned by MTN when a request with X-Reference-Id is accepted
+        self.accepted: int = accepted
+        #attempts that left the client, 0 when it failed before anything was sent
+        self.sent: int = 0
+
+
+#status MTN answers with when a POST succeeds, every other route is a GET answering 200
+POST_SUCCESS : Dict[str, int] = {
+    'create_apiuser': 201,
+    'create_apikey': 201,
+    'create_access_token': 200,
+    'request_to_pay': 202,
+    'withdraw': 202,
+    'deposit': 202,
+    'transfer': 202,
+    'refund': 202
+}
+
+class Endpoint:
+    """
+    Represent one entry of a PATH table, compiled once
+
+    The base URL of both environments is joined to the path when the table is
+    compiled, so building a route only fills the path parameters, if any.
+    """
+
+    __slots__ = ('product', 'key', 'method', 'success', 'paths', 'urls', 'templated')
+
+    def __init__(self, product: str, key: str, paths: Mapping[str, str], base: Mapping[str, str]) -> None:
+        self.product: str = product
+        self.key: str = key
+        self.method: str = 'POST' if key in POST_SUCCESS else 'GET'
+        self.success: int = POST_SUCCESS.get(key, 200)
+        #indexed by the isLive flag of the HTTP client
+        self.paths: Tuple[str, str] = (paths['sandbox'], paths['live'])
+        self.urls: Tuple[str, str] = (base['sandbox'] + paths['sandbox'], base['live'] + paths['live'])
+        self.templated: bool = '{' in paths['sandbox'] or '{' in paths['live']
+
+    def route(self, production: bool, headers: Dict[str, str], body: Optional[Any] = None, params: Optional[Dict[str, str]] = None) -> Route:
+        """
+        Method to build the route of one call
+
+        Arguments:
+            production: boolean, isLive flag of the HTTP client
+            headers: dictionary
+            body [optional]: dictionary
+            params [optional]: dictionary of path parameters
+
+        Returns:
+            Route
+        """
+        route = Route.__new__(Route)
+        route.method = self.method
+        if self.templated and params:
+            route.path = self.paths[production].format_map(params)
+            route.url = self.urls[production].format_map(params)
+        else:
+            route.path = self.paths[production]
+            route.url = self.urls[production]
+        route.production = production
+        route.headers = headers
+        route.body = body
+        route.product = self.product
+        route.key = self.key
+        route.accepted = self.success
+        route.sent = 0
+        return route
+
+    def __repr__(self) -> str:
+        return f'<Endpoint {self.method} {self.product}.{self.key}>'
+
+
+def compile_endpoints(product: str, table: Mapping[str, Mapping[str, str]], base: Mapping[str, str]) -> Dict[str, Endpoint]:
+    """
+    Compile a PATH table into endpoints keyed like the table
+
+    Arguments:
+        product: string, 'provisioning', 'collection' or 'disbursement'
+        table: dictionary, e.g. COLLECTION_PATH
+        base: dictionary of base URL per environment, e.g. Route.BASE
+
+    Returns:
+        dictionary of Endpoint
+    """
+    return {key: Endpoint(product, key, paths, base) for key, paths in table.items()}
+
+
+class EndpointTable:
+    """
+    Represent every MTN endpoint compiled for one pair of base URLs
+
+    Arguments:
+        base [optional]: dictionary of base URL per environment, Route.BASE by default
+    """
+
+    __slots__ = ('base', 'provisioning', 'collection', 'disbursement')
+
+    def __init__(self, base: Optional[Mapping[str, str]] = None) -> None:
+        from ..utils.utils import PATH, COLLECTION_PATH, DISBURSEMENTS_PATH
+
+        self.base: Dict[str, str] = dict(base if base is not None else Route.BASE)
+        self.provisioning: Dict[str, Endpoint] = compile_endpoints('provisioning', PATH, self.base)
+        self.collection: Dict[str, Endpoint] = compile_endpoints('collection', COLLECTION_PATH, self.base)
+        self.disbursement: Dict[str, Endpoint] = compile_endpoints('disbursement', DISBURSEMENTS_PATH, self.base)
+
+    def __getitem__(self, product: str) -> Dict[str, Endpoint]:
+        return getattr(self, product)
@@ -0,0 +1,147 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class AccessTokenManager:
+    """
+    Cache an access token and refresh it before it expires
+
+    The token is kept until ``leeway`` seconds before ``expires_in``. Once it
+    gets within ``refresh_before`` seconds of expiring, the next caller starts a
+    refresh in the background and keeps using the current token. Concurrent
+    callers that need a new token all wait on the same in-flight request.
+
+    Arguments:
+        fetch: coroutine function returning the ``(boolean, data)`` tuple of
+            ``create_access_token``
+        leeway [optional]: float, seconds removed from ``expires_in``
+        refresh_before [optional]: float, seconds before expiry a background refresh starts
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Tuple[bool, Dict[str, Any]]]],
+        *,
+        leeway: float = 30.0,
+        refresh_before: float = 300.0
+        ) -> None:
+        self.fetch = fetch
+        self.leeway = leeway
+        self.refresh_before = refresh_before
+        self.__bearer: Optional[str] = None
+        self.__expires_at: float = 0.0
+        self.__refresh_at: float = 0.0
+        self.__task: Optional['asyncio.Future[str]'] = None
+        #bumped by reset and close, a refresh started before it is never stored
+        self.__generation = 0
+        self.__closed = False
+
+    @property
+    def bearer(self) -> Optional[str]:
+        """The cached Bearer token, None when nothing valid is cached"""
+        if self.__bearer is not None and time.monotonic() < self.__expires_at:
+            return self.__bearer
+        return None
+
+    async def get(self) -> str:
+        """
+        Method to get a valid Bearer token, fetching one only when needed
+
+        Returns:
+            Bearer token: string
+        """
+        now = time.monotonic()
+        if self.__bearer is not None and now < self.__expires_at:
+            if now >= self.__refresh_at and self.__task is None and not self.__closed:
+                self.__start()
+            return self.__bearer
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        """
+        Method to fetch a new token, joining the in-flight request if there is one
+
+        Returns:
+            Bearer token: string
+        """
+        while True:
+            task = self.__task
+            if task is None:
+                task = self.__start()
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                #the refresh was cancelled by close, not this caller: fetch again
+                if not task.cancelled():
+                    raise
+
+    def invalidate(self, bearer: Optional[str] = None) -> None:
+        """
+        Method to drop the cached token, e.g. after a 401 response
+
+        Arguments:
+            bearer [optional]: string, the token refused; nothing is dropped when a newer one is cached
+        """
+        if bearer is None or bearer == self.__bearer:
+            self.__bearer = None
+            self.__expires_at = 0.0
+
+    def reset(self) -> None:
+        """Method to drop the cached token and leave the refresh in flight, e.g. when the credentials changed"""
+        self.invalidate()
+        #callers already waiting on it still get its answer, new callers start a new one
+        self.__generation += 1
+        self.__task = None
+
+    def close(self) -> None:
+        """Method to cancel the refresh still running and stop starting background ones, e.g. when the client is dropped"""
+        self.__closed = True
+        self.__generation += 1
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+
+    def __start(self) -> 'asyncio.Future[str]':
+        task = asyncio.ensure_future(self.__refresh())
+        # a failed background refresh is retried by the next caller
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.__task = task
+        return task
+
+    async def __refresh(self) -> str:
+        generation = self.__generation
+        try:
+            _, data = await self.fetch()
+            bearer = f"Bearer {data['access_token']}"
+            if generation == self.__generation:
+                now = time.monotonic()
+                expires_in = float(data.get('expires_in', 3600))
+                lifetime = max(expires_in - self.leeway, 0.0)
+                self.__bearer = bearer
+                self.__expires_at = now + lifetime
+                self.__refresh_at = now + max(lifetime - self.refresh_before, lifetime / 2)
+            return bearer
+        finally:
+            if generation == self.__generation:
+                self.__task = None
@@ -0,0 +1,229 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import re
+from typing import Any, Collection, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+from ..errors.errors import InvalidPayment
+from ..utils.utils import UUID4_PATTERN
+
+#positive, at most 15 digits before the point and 6 after it
+AMOUNT_PATTERN = re.compile(r'(?!0*(?:\.0*)?$)\d{1,15}(?:\.\d{1,6})?')
+CURRENCY_PATTERN = re.compile(r'[A-Z]{3}')
+#ITU-T E.164 without the leading +
+MSISDN_PATTERN = re.compile(r'\d{7,15}')
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+PARTY_CODE_PATTERN = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+
+PARTY_PATTERNS: Dict[str, 're.Pattern[str]'] = {
+    'MSISDN': MSISDN_PATTERN,
+    'EMAIL': EMAIL_PATTERN,
+    'PARTY_CODE': PARTY_CODE_PATTERN,
+}
+
+#party of the body of each payment route, a refund goes back to the payer of the refunded payment
+PARTIES: Dict[str, Optional[str]] = {
+    'request_to_pay': 'payer',
+    'withdraw': 'payer',
+    'transfer': 'payee',
+    'deposit': 'payee',
+    'refund': None,
+}
+
+#maximum length of the free text fields
+LIMITS: Dict[str, int] = {
+    'externalId': 64,
+    'payerMessage': 160,
+    'payeeNote': 160,
+}
+
+Item = Union[Dict[str, Any], Tuple[str, Dict[str, Any]]]
+Problems = List[Tuple[str, str]]
+
+
+class ValidationReport:
+    """
+    Represent the outcome of the validation of a batch
+
+    Attributes:
+        valid: list of (index, item) of the rows that can be sent, in input order
+        errors: dictionary of InvalidPayment keyed by the index of the rejected rows
+    """
+
+    __slots__ = ('valid', 'errors')
+
+    def __init__(self) -> None:
+        self.valid: List[Tuple[int, Item]] = []
+        self.errors: Dict[int, InvalidPayment] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def items(self) -> List[Item]:
+        """The rows that can be sent, e.g. for request_to_pay_many"""
+        return [item for _, item in self.valid]
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Method to get one {'index', 'field', 'message'} dictionary per problem found"""
+        return [
+            {'index': index, 'field': field, 'message': message}
+            for index, error in sorted(self.errors.items())
+            for field, message in error.errors
+        ]
+
+    def __len__(self) -> int:
+        return len(self.valid) + len(self.errors)
+
+    def __repr__(self) -> str:
+        return f'<ValidationReport valid={len(self.valid)} invalid={len(self.errors)}>'
+
+
+class PaymentValidator:
+    """
+    Check payment bodies before anything is sent
+
+    Every problem of a body is reported, not only the first one. Bodies are
+    checked against compiled patterns, with no request to MTN.
+
+    Arguments:
+        route: string, 'request_to_pay', 'withdraw', 'transfer', 'deposit' or 'refund'
+        currencies [optional]: collection of accepted currency codes, any 3 letters code by default
+        limits [optional]: dictionary of maximum lengths, LIMITS by default
+        unique [optional]: boolean, reject a reference id already seen by this validator
+    """
+
+    def __init__(
+        self,
+        route: str,
+        currencies: Optional[Collection[str]] = None,
+        limits: Optional[Mapping[str, int]] = None,
+        unique: bool = True
+        ) -> None:
+        if route not in PARTIES:
+            raise ValueError(f'route must be one of {tuple(PARTIES)}')
+        self.route = route
+        self.party = PARTIES[route]
+        self.currencies = frozenset(currencies) if currencies is not None else None
+        self.limits: Dict[str, int] = dict(LIMITS if limits is None else limits)
+        self.unique = unique
+        self.__seen: Set[str] = set()
+
+    def check(self, body: Any, reference_id: Optional[str] = None) -> Problems:
+        """
+        Method to get every problem of one body
+
+        Arguments:
+            body: dictionary
+            reference_id [optional]: string, X-Reference-Id the body will be sent with
+
+        Returns:
+            list of (field, message), empty when the body can be sent
+        """
+        problems: Problems = []
+        if reference_id is not None:
+            if not (isinstance(reference_id, str) and UUID4_PATTERN.fullmatch(reference_id)):
+                problems.append(('referenceId', 'must be a lowercase UUID version 4'))
+            elif self.unique:
+                if reference_id in self.__seen:
+                    problems.append(('referenceId', 'used by another payment of the batch'))
+                else:
+                    self.__seen.add(reference_id)
+
+        if not isinstance(body, dict):
+            problems.append(('body', 'must be a dictionary'))
+            return problems
+
+        amount = body.get('amount')
+        if amount is None or amount == '':
+            problems.append(('amount', 'missing'))
+        elif isinstance(amount, bool) or not AMOUNT_PATTERN.fullmatch(str(amount)):
+            problems.append(('amount', f'must be a positive number with at most 6 decimals, got {amount!r}'))
+
+        currency = body.get('currency')
+        if not isinstance(currency, str) or not CURRENCY_PATTERN.fullmatch(currency):
+            problems.append(('currency', f'must be an uppercase ISO 4217 code, got {currency!r}'))
+        elif self.currencies is not None and currency not in self.currencies:
+            problems.append(('currency', f'{currency} is not accepted'))
+
+        if self.party is not None:
+            problems.extend(_check_party(self.party, body.get(self.party)))
+
+        if self.route == 'refund':
+            refunded = body.get('referenceIdToRefund')
+            if not (isinstance(refunded, str) and UUID4_PATTERN.fullmatch(refunded)):
+                problems.append(('referenceIdToRefund', 'must be a lowercase UUID version 4'))
+
+        for field, limit in self.limits.items():
+            value = body.get(field)
+            if value is not None and len(str(value)) > limit:
+                problems.append((field, f'longer than {limit} characters'))
+        return problems
+
+    def validate(self, items: Iterable[Item]) -> ValidationReport:
+        """
+        Method to check a whole batch
+
+        Arguments:
+            items: iterable of bodies, or of (uuid, body) tuples
+
+        Returns:
+            ValidationReport
+        """
+        report = ValidationReport()
+        for index, item in enumerate(items):
+            if isinstance(item, tuple):
+                problems = self.check(item[1], item[0])
+            else:
+                problems = self.check(item)
+            if problems:
+                report.errors[index] = InvalidPayment(problems)
+            else:
+                report.valid.append((index, item))
+        return report
+
+
+def _check_party(name: str, party: Any) -> Problems:
+    if not isinstance(party, dict):
+        return [(name, 'missing')]
+    id_type = party.get('partyIdType')
+    pattern = PARTY_PATTERNS.get(id_type) if isinstance(id_type, str) else None
+    party_id = party.get('partyId')
+    if pattern is None:
+        return [(f'{name}.partyIdType', f'must be one of {tuple(PARTY_PATTERNS)}, got {id_type!r}')]
+    if not isinstance(party_id, str) or not pattern.fullmatch(party_id):
+        return [(f'{name}.partyId', f'invalid {id_type} {party_id!r}')]
+    return []
+
+
+def validate_payments(items: Iterable[Item], route: str, **options: Any) -> ValidationReport:
+    """
+    Function to check a batch of payment bodies before sending them
+
+    Arguments:
+        items: iterable of bodies, or of (uuid, body) tuples
+        route: string, e.g. 'transfer'
+        options [optional]: PaymentValidator options (currencies, limits, unique)
+
+    Returns:
+        ValidationReport
+    """
+    return PaymentValidator(route, **options).validate(items)
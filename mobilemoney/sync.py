@@ -0,0 +1,259 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2022-present rewriteapi
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Optional, TypeVar, TYPE_CHECKING
+
+from .client import Client
+
+if TYPE_CHECKING:
+    import aiohttp
+
+T = TypeVar('T')
+
+"""
+Note : every coroutine runs on one event loop owned by a background thread, so
+the pooled connections, the access tokens and the rate limiter are shared by
+all the threads calling the client.
+"""
+
+
+class SyncProxy:
+    """
+    Expose the coroutine methods of an object as blocking methods
+
+    Async generator methods (e.g. iter_request_to_pay) become blocking
+    generators. Other attributes are returned as they are.
+
+    Arguments:
+        runner: SyncClient running the coroutines
+        target: object wrapped, e.g. Collection
+    """
+
+    def __init__(self, runner: 'SyncClient', target: Any) -> None:
+        self.__runner = runner
+        self.__target = target
+
+    @property
+    def target(self) -> Any:
+        """The wrapped asynchronous object"""
+        return self.__target
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self.__target, name)
+        if inspect.isasyncgenfunction(value):
+            @functools.wraps(value)
+            def iterate(*args: Any, **kwargs: Any) -> Iterator[Any]:
+                return self.__runner.iterate(value(*args, **kwargs))
+
+            return iterate
+        if not inspect.iscoroutinefunction(value):
+            return value
+
+        @functools.wraps(value)
+        def call(*args: Any, **kwargs: Any) -> Any:
+            return self.__runner.run(value(*args, **kwargs))
+
+        return call
+
+    def __repr__(self) -> str:
+        return f'<SyncProxy {self.__target!r}>'
+
+
+class SyncClient:
+    """
+    Blocking client agent, safe to share between threads
+
+    One background thread runs an event loop and a :class:`Client`; calls made
+    from any thread are sent to that loop with
+    :func:`asyncio.run_coroutine_threadsafe` and wait for their result. Use it
+    as a context manager or call :meth:`close` when you are done with it.
+
+    Arguments:
+        connector [optional]: aiohttp.BaseConnector
+        options [optional]: Client options (limit, rate_limiter, retry_policy...)
+    """
+
+    def __init__(self, connector: Optional['aiohttp.BaseConnector'] = None, **options: Any) -> None:
+        self.__closed = False
+        self.loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__run_loop, name='mobilemoney-loop', daemon=True)
+        self.__thread.start()
+        #aiohttp and asyncio objects must be created on the loop they are used on
+        self.client: Client = self.run(self.__call(Client, connector, **options))
+
+    def __enter__(self) -> 'SyncClient':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @staticmethod
+    async def __call(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return func(*args, **kwargs)
+
+    def submit(self, func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> 'concurrent.futures.Future[T]':
+        """
+        Method to schedule a coroutine function without waiting for it
+
+        Arguments:
+            func: coroutine function, e.g. collection.request_to_pay (of the async client or of a SyncProxy)
+            args, kwargs: arguments of the call
+
+        Returns:
+            concurrent.futures.Future
+        """
+        if not inspect.iscoroutinefunction(func):
+            #blocking method of a SyncProxy, schedule the coroutine it wraps
+            func = inspect.unwrap(func)
+        return self.__submit(func(*args, **kwargs))
+
+    def map(self, func: Callable[..., Awaitable[T]], *iterables: Iterable[Any], timeout: Optional[float] = None) -> Iterator[T]:
+        """
+        Method to call a coroutine function for every set of arguments concurrently
+
+        Results are returned in the order of the arguments, like Executor.map.
+
+        Arguments:
+            func: coroutine function
+            iterables: iterables of arguments
+            timeout [optional]: float, seconds to wait for all the results
+
+        Returns:
+            iterator of results
+        """
+        futures = [self.submit(func, *args) for args in zip(*iterables)]
+        done, not_done = concurrent.futures.wait(futures, timeout)
+        if not_done:
+            for future in not_done:
+                future.cancel()
+            raise concurrent.futures.TimeoutError()
+        return (future.result() for future in futures)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """
+        Method to run a coroutine on the client loop and wait for its result
+
+        Arguments:
+            coro: coroutine
+            timeout [optional]: float, seconds to wait
+
+        Returns:
+            result of the coroutine
+        """
+        if threading.current_thread() is self.__thread:
+            getattr(coro, 'close', lambda: None)()
+            raise RuntimeError('SyncClient.run cannot be called from its own loop, await the coroutine instead')
+        future = self.__submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, iterator: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Method to iterate over an async iterator from a blocking thread
+
+        Every item is produced on the client loop; breaking out of the loop
+        closes the async iterator there.
+
+        Arguments:
+            iterator: async iterator, e.g. collection.iter_request_to_pay(...) of the async client
+
+        Returns:
+            iterator of the same items
+        """
+        try:
+            while True:
+                try:
+                    yield self.run(self.__next(iterator))
+                except StopAsyncIteration:
+                    return
+        finally:
+            aclose = getattr(iterator, 'aclose', None)
+            if aclose is not None and not self.__closed:
+                self.run(aclose())
+
+    @staticmethod
+    async def __next(iterator: AsyncIterator[T]) -> T:
+        return await iterator.__anext__()
+
+    def __submit(self, coro: Awaitable[T]) -> 'concurrent.futures.Future[T]':
+        if self.__closed:
+            getattr(coro, 'close', lambda: None)()
+            raise RuntimeError('SyncClient is closed')
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)  # type: ignore
+
+    def close(self) -> None:
+        """Method to close the pooled connections and stop the loop thread"""
+        if self.__closed:
+            return
+        try:
+            self.run(self.client.close())
+        finally:
+            self.__closed = True
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.__thread.join()
+            self.loop.close()
+
+    def collection(self, subscription_key: str, apiuser: Optional[str] = None, apikey: Optional[str] = None) -> SyncProxy:
+        """
+        Method to get the blocking collection client
+
+        Arguments:
+            subscription_key: string
+            apiuser [optional]: string, with apikey the client manages its own access token
+            apikey [optional]: string
+
+        Returns:
+            Collection client : SyncProxy
+        """
+        product = self.run(self.__call(self.client.collection, subscription_key, apiuser, apikey))
+        return SyncProxy(self, product)
+
+    def disbursements(self, subscription_key: str, apiuser: Optional[str] = None, apikey: Optional[str] = None) -> SyncProxy:
+        """
+        Method to get the blocking Disbursements client
+
+        Arguments:
+            subscription_key: string
+            apiuser [optional]: string, with apikey the client manages its own access token
+            apikey [optional]: string
+
+        Returns:
+            Disbursements client : SyncProxy
+        """
+        product = self.run(self.__call(self.client.disbursements, subscription_key, apiuser, apikey))
+        return SyncProxy(self, product)
+
+    def __getattr__(self, name: str) -> Any:
+        #create_api_user, get_api_user, basic_token... of the async client
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(SyncProxy(self, self.client), name)
@@ -19,19 +19,19 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import json
-from typing import Any, Dict, Union, TYPE_CHECKING, Optional
+from typing import Any, Callable, Dict, Tuple, Union, TYPE_CHECKING, Optional
 import base64
 from urllib.parse import urlencode
+import re
 import uuid
-import aiohttp
 from ..errors.errors import *
 
+if TYPE_CHECKING:
+    from aiohttp import ClientResponse
+    from requests import Response
+    from ..request.response import MomoResponse
 
-
-from aiohttp import ClientResponse, ClientWebSocketResponse
-from requests import Response
-
-_ResponseType = Union[ClientResponse, Response]
+    _ResponseType = Union[MomoResponse, ClientResponse, Response]
 
 def encode_params(params: Any):
     
@@ -40,10 +40,51 @@ def encode_params(params: Any):
     
     return urlencode(params)
 
-def _to_json(obj: Any) -> str:
-    return json.dumps(obj, separators=(',', ':'), ensure_ascii=True)
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def _default_codec() -> Tuple[str, Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]:
+    try:
+        import orjson
+        return ('orjson', orjson.dumps, orjson.loads)
+    except ImportError:
+        pass
+    try:
+        import ujson
+        return ('ujson', lambda obj: ujson.dumps(obj, ensure_ascii=False).encode('utf-8'), ujson.loads)
+    except ImportError:
+        pass
+    return ('json', _stdlib_dumps, json.loads)
+
+#resolved on first use so importing the library never imports a JSON backend
+_codec: Optional[Tuple[str, Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]] = None
+
+def set_json_codec(dumps: Optional[Callable[[Any], bytes]] = None, loads: Optional[Callable[[Union[bytes, str]], Any]] = None, name: str = 'custom')-> None:
+    """A method replacing the JSON codec used for every request and response
+        parameter : dumps (object to bytes), loads (bytes to object), name [optional]
+        Without arguments the default is restored : orjson, then ujson, then json
+    """
+    global _codec
+    if dumps is None or loads is None:
+        _codec = _default_codec()
+    else:
+        _codec = (name, dumps, loads)
 
-_from_json = json.loads
+def json_codec()-> str:
+    """A method returning the name of the JSON codec in use"""
+    if _codec is None:
+        set_json_codec()
+    return _codec[0]
+
+def _to_json(obj: Any) -> bytes:
+    if _codec is None:
+        set_json_codec()
+    return _codec[1](obj)
+
+def _from_json(data: Union[bytes, str]) -> Any:
+    if _codec is None:
+        set_json_codec()
+    return _codec[2](data)
 
 def b64_encode(data: str)->str:
     """This function encode data to base64"""
@@ -66,16 +107,22 @@ def is_valid_basic_token(token: str)->bool:
     else:
         return False
 
-async def json_or_text(response: aiohttp.ClientResponse) -> Union[Dict[str, Any], str]:
-    text = await response.text(encoding='utf-8')
+async def json_or_text(response: 'ClientResponse') -> Optional[Union[Dict[str, Any], str]]:
+    #201 and 202 answers usually carry no body, nothing to read or parse
+    if response.status in (201, 202) and response.content_length == 0:
+        return None
 
-    try:
-        if response.headers['content-type'] == 'application/json;charset=utf-8' or response.headers['content-type'] == 'application/json':
-            return _from_json(text)
-    except KeyError:
-        pass
+    data = await response.read()
+    if not data:
+        return None
+
+    if 'json' in response.headers.get('Content-Type', ''):
+        try:
+            return _from_json(data)
+        except ValueError:
+            pass
 
-    return text
+    return data.decode('utf-8', errors='replace')
 
 def get_reference_id()->str:
     """A method helping api user to get X-Reference-id
@@ -86,22 +133,27 @@ def get_reference_id()->str:
     unique_id = uuid.uuid4()
     return str(unique_id)
 
+def stable_reference_id(key: str, namespace: str = 'mobilemoney')->str:
+    """A method deriving the same X-Reference-id every time from a business key
+        parameter : key, namespace [optional]
+        Return : UUID shaped as a version 4
+        Return type : str
+    """
+    digest = uuid.uuid5(uuid.NAMESPACE_URL, f'{namespace}:{key}').bytes
+    return str(uuid.UUID(bytes=digest, version=4))
+
+UUID4_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}')
+
 def is_valid_id_4(unique_id: str)->bool:
     """A method checking if X-Reference-id is a valid UUID version 4
         parameter : X-Reference-id
         Return type : bool
     """
-    try:
-        id_convert_test = uuid.UUID(unique_id, version=4)
-    except ValueError:
-        return False
-    return str(id_convert_test) == unique_id
-
-def errors_manager(response: _ResponseType, data: Optional[Union[str, Dict[str, Any]]] = "")-> None:
-
-    print(response)
-    print(data)
+    #the canonical form uuid.UUID(unique_id, version=4) gives back, without building the object
+    return isinstance(unique_id, str) and UUID4_PATTERN.fullmatch(unique_id) is not None
 
+def errors_manager(response: '_ResponseType', data: Optional[Union[str, Dict[str, Any]]] = "")-> None:
+    """Raise the exception matching the status of a failed response, it is logged by HTTPClient.request"""
     if response.status == 400:
         raise InvalidData(response, data)
     elif response.status == 409:
@@ -155,6 +207,10 @@ COLLECTION_PATH = {
         "sandbox":"/collection/v1_0/requesttopay",
         "live":"/collection/v1_0/requesttopay"
     },
+    "request_to_pay_status":{
+        "sandbox":"/collection/v1_0/requesttopay/{referenceId}",
+        "live":"/collection/v1_0/requesttopay/{referenceId}"
+    },
     "withdraw":{
         "sandbox":"/collection/v2_0/requesttowithdraw",
         "live":"/collection/v2_0/requesttowithdraw"
@@ -194,9 +250,9 @@ DISBURSEMENTS_PATH = {
         "sandbox":"/disbursement/v1_0/accountholder/{accountHolderIdType}/{accountHolderId}/active",
         "live":"/disbursement/v1_0/accountholder/{accountHolderIdType}/{accountHolderId}/active"
     },
-    "get_transfer_status":{
-        "sandbox":"/disbursement/v1_0/transfer/{referenceId}",
-        "live":"/disbursement/v1_0/transfer/{referenceId}"
+    "get_deposit_status":{
+        "sandbox":"/disbursement/v1_0/deposit/{referenceId}",
+        "live":"/disbursement/v1_0/deposit/{referenceId}"
     },
     "deposit":{
         "sandbox":"/disbursement/v2_0/deposit",
@@ -0,0 +1,33 @@
+import pytest_asyncio
+
+from mobilemoney import Client
+from mobilemoney.mock import MockServer
+
+SUBSCRIPTION_KEY = 'subscription-key'
+APIUSER = 'f9b0a4d6-3b1c-4c6e-9a53-6a1c2b1f0e7d'
+APIKEY = 'api-key'
+
+
+@pytest_asyncio.fixture
+async def server():
+    async with MockServer(strict_auth=True, seed=0) as server:
+        server.users[APIUSER] = {'providerCallbackHost': 'localhost', 'targetEnvironment': 'sandbox'}
+        server.keys[APIUSER] = APIKEY
+        yield server
+
+
+@pytest_asyncio.fixture
+async def client(server):
+    async with Client(base_url=server.url) as client:
+        client.is_sandbox()
+        yield client
+
+
+@pytest_asyncio.fixture
+async def collection(client):
+    return client.collection(SUBSCRIPTION_KEY, APIUSER, APIKEY)
+
+
+@pytest_asyncio.fixture
+async def disbursements(client):
+    return client.disbursements(SUBSCRIPTION_KEY, APIUSER, APIKEY)
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+
+from mobilemoney.request.callback import CallbackReceiver
+from mobilemoney.utils.utils import get_reference_id
+
+PENDING_PAYER = '46733123453'
+
+
+def body(payer):
+    return {
+        'amount': '10', 'currency': 'EUR', 'externalId': 'INV-1',
+        'payer': {'partyIdType': 'MSISDN', 'partyId': payer}, 'payerMessage': '', 'payeeNote': ''
+    }
+
+
+@pytest_asyncio.fixture
+async def receiver(collection):
+    receiver = CallbackReceiver('http://unused')
+    server = TestServer(receiver.application())
+    await server.start_server()
+    receiver.public_url = str(server.make_url('')).rstrip('/')
+    collection.use_callbacks(receiver)
+    yield receiver
+    await receiver.stop()
+    await server.close()
+
+
+async def post(url, data):
+    async with ClientSession() as session:
+        async with session.put(url, json=data) as response:
+            return response.status
+
+
+@pytest.mark.asyncio
+async def test_callback_is_read_back_from_mtn(collection, receiver):
+    uuid = get_reference_id()
+    future = receiver.expect(uuid)
+    await collection.request_to_pay(None, uuid, 'sandbox', body('46733123459'))
+
+    data = await asyncio.wait_for(future, 5)
+
+    assert data['status'] == 'SUCCESSFUL'
+    assert data['financialTransactionId']
+
+
+@pytest.mark.asyncio
+async def test_forged_callbacks_are_refused(collection, receiver, server):
+    uuid = get_reference_id()
+    await collection.request_to_pay(None, uuid, 'sandbox', body(PENDING_PAYER))
+    url = collection.callback_url(uuid, None, 'request_to_pay', 'sandbox')
+
+    assert await post(f'{receiver.public_url}/momo/callback/{uuid}/guess', {'status': 'SUCCESSFUL'}) == 404
+    assert await post(f'{receiver.public_url}/momo/callback/{get_reference_id()}/x', {'status': 'SUCCESSFUL'}) == 404
+
+    #even on the right URL the body is ignored, the status is read from MTN
+    reads = server.requests['collection.request_to_pay_status']
+    assert await post(url, {'status': 'SUCCESSFUL'}) == 200
+    for _ in range(100):
+        if server.requests['collection.request_to_pay_status'] > reads:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+
+    assert receiver.final_status(uuid) is None
+    _, data = await collection.get_request_to_pay_status(None, uuid, 'sandbox')
+    assert data['status'] == 'PENDING'
+
+
+@pytest.mark.asyncio
+async def test_wait_drops_the_waiter_on_timeout(receiver):
+    uuid = get_reference_id()
+    with pytest.raises(asyncio.TimeoutError):
+        await receiver.wait(uuid, 0.01)
+    assert uuid not in receiver._CallbackReceiver__waiters
@@ -0,0 +1,81 @@
+import pytest
+
+from mobilemoney import Client, DuplicatePayment
+from mobilemoney.errors.errors import InvalidData, MomoConnectionError
+from mobilemoney.mock import constant
+from mobilemoney.request.idempotency import COALESCE, IdempotencyGuard
+from mobilemoney.request.retry import RetryPolicy
+from mobilemoney.utils.utils import get_reference_id
+
+from conftest import APIKEY, APIUSER, SUBSCRIPTION_KEY
+
+
+def body(external_id, amount='10'):
+    return {'amount': amount, 'currency': 'EUR', 'externalId': external_id,
+        'payee': {'partyIdType': 'MSISDN', 'partyId': '46733123459'}, 'payerMessage': '', 'payeeNote': ''}
+
+
+def references(server, external_id):
+    return {ref for (_, key, ref), transaction in server.transactions.items()
+        if key == 'transfer' and transaction['externalId'] == external_id}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('mode', ['reject', COALESCE])
+async def test_timed_out_payment_keeps_its_key(server, mode):
+    server.latency = {'transfer': constant(0.3)}
+    async with Client(base_url=server.url, timeout=0.1, retry_policy=RetryPolicy(max_attempts=1)) as client:
+        client.is_sandbox()
+        disbursements = client.disbursements(SUBSCRIPTION_KEY, APIUSER, APIKEY)
+        disbursements.use_idempotency(IdempotencyGuard(mode=mode))
+
+        first = get_reference_id()
+        with pytest.raises(MomoConnectionError):
+            await disbursements.transfer(first, None, 'sandbox', body('INV-9'))
+        #the client gave up, MTN still got it
+        with pytest.raises(DuplicatePayment) as duplicate:
+            await disbursements.transfer(get_reference_id(), None, 'sandbox', body('INV-9'))
+
+    assert duplicate.value.reference_id == first
+    assert references(server, 'INV-9') <= {first}
+
+
+@pytest.mark.asyncio
+async def test_rejected_payment_frees_its_key(disbursements, server):
+    disbursements.use_idempotency(IdempotencyGuard())
+
+    with pytest.raises(InvalidData):
+        await disbursements.transfer(get_reference_id(), None, 'sandbox', body('INV-10', amount='0'))
+    second = get_reference_id()
+    await disbursements.transfer(second, None, 'sandbox', body('INV-10'))
+
+    assert references(server, 'INV-10') == {second}
+
+
+@pytest.mark.asyncio
+async def test_payment_failing_before_sending_frees_its_key(disbursements):
+    guard = disbursements.idempotency = IdempotencyGuard()
+
+    with pytest.raises(Exception):
+        await disbursements.transfer(get_reference_id(), 'Basic not-a-bearer', 'sandbox', body('INV-11'))
+    assert len(guard) == 0
+    await disbursements.transfer(get_reference_id(), None, 'sandbox', body('INV-11'))
+
+
+@pytest.mark.asyncio
+async def test_tenants_sharing_a_guard_do_not_collide(client, server):
+    guard = IdempotencyGuard()
+    first = client.disbursements(SUBSCRIPTION_KEY, APIUSER, APIKEY)
+    second = client.disbursements('other-subscription-key', APIUSER, APIKEY)
+    first.use_idempotency(guard)
+    second.use_idempotency(guard)
+
+    assert first.reference_id('INV-1') != second.reference_id('INV-1')
+    assert first.reference_id('INV-1') == client.disbursements(SUBSCRIPTION_KEY).reference_id('INV-1')
+
+    await first.transfer(first.reference_id('INV-1'), None, 'sandbox', body('INV-1'))
+    await second.transfer(second.reference_id('INV-1'), None, 'sandbox', body('INV-1'))
+    with pytest.raises(DuplicatePayment):
+        await first.transfer(get_reference_id(), None, 'sandbox', body('INV-1'))
+
+    assert len(references(server, 'INV-1')) == 2
@@ -0,0 +1,185 @@
+import time
+
+import pytest
+
+from mobilemoney.errors.errors import CircuitOpen
+from mobilemoney.request.breaker import CircuitBreakers
+from mobilemoney.request.journal import (
+    ACCEPTED, CONFLICT, NOT_SENT, PENDING, REJECTED, UNKNOWN, FileJournal, Journal, SQLiteJournal
+)
+from mobilemoney.utils.utils import get_reference_id
+
+from conftest import APIKEY, APIUSER, SUBSCRIPTION_KEY
+
+BODY = {'amount': '10', 'currency': 'EUR', 'externalId': 'INV-1', 'payee': {'partyIdType': 'MSISDN', 'partyId': '46733123459'}}
+
+
+@pytest.fixture(params=['file', 'sqlite'])
+def open_journal(request, tmp_path):
+    def open_journal():
+        if request.param == 'file':
+            return FileJournal(str(tmp_path / 'journal.jsonl'))
+        return SQLiteJournal(str(tmp_path / 'journal.db'))
+    return open_journal
+
+
+def test_journal_is_abstract():
+    with pytest.raises(TypeError):
+        Journal()  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_unresolved_entries_are_replayed(open_journal):
+    journal = open_journal()
+    refs = [get_reference_id() for _ in range(5)]
+    for ref in refs:
+        await journal.intent(ref, 'disbursement', 'transfer', 'sandbox', BODY)
+    journal.outcome(refs[0], ACCEPTED, 202)
+    journal.outcome(refs[1], REJECTED, 400)
+    journal.outcome(refs[2], CONFLICT, 409)
+    journal.outcome(refs[3], UNKNOWN, None)
+    await journal.close()
+
+    journal = open_journal()
+    try:
+        states = {entry.reference_id: entry.state for entry in journal.unresolved()}
+        assert states == {refs[3]: UNKNOWN, refs[4]: PENDING}
+        assert journal.unresolved()[0].body == BODY
+    finally:
+        await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_torn_last_line_is_dropped(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = FileJournal(path)
+    first = get_reference_id()
+    await journal.intent(first, 'disbursement', 'transfer', 'sandbox', BODY)
+    await journal.close()
+    with open(path, 'ab') as f:
+        f.write(b'{"op":"intent","ref":"cut-sh')
+
+    journal = FileJournal(path)
+    second = get_reference_id()
+    await journal.intent(second, 'disbursement', 'transfer', 'sandbox', BODY)
+    await journal.close()
+
+    journal = FileJournal(path)
+    try:
+        assert [entry.reference_id for entry in journal.unresolved()] == [first, second]
+    finally:
+        await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_compact_keeps_the_unresolved_entries(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = FileJournal(str(path))
+    refs = [get_reference_id() for _ in range(20)]
+    for ref in refs:
+        await journal.intent(ref, 'disbursement', 'transfer', 'sandbox', BODY)
+    for ref in refs[1:]:
+        journal.outcome(ref, ACCEPTED, 202)
+    journal.outcome(refs[0], UNKNOWN, 504)
+    await journal.compact()
+    await journal.close()
+
+    assert len(path.read_bytes().splitlines()) == 2
+    journal = FileJournal(str(path))
+    try:
+        [entry] = journal.unresolved()
+        assert (entry.reference_id, entry.state, entry.status) == (refs[0], UNKNOWN, 504)
+    finally:
+        await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_prune_deletes_old_resolved_rows(tmp_path):
+    journal = SQLiteJournal(str(tmp_path / 'journal.db'))
+    try:
+        resolved, pending = get_reference_id(), get_reference_id()
+        await journal.intent(resolved, 'disbursement', 'transfer', 'sandbox', BODY)
+        await journal.intent(pending, 'disbursement', 'transfer', 'sandbox', BODY)
+        await journal.outcome(resolved, ACCEPTED, 202)
+
+        assert await journal.prune(3600) == 0
+        time.sleep(0.01)
+        assert await journal.prune(0) == 1
+        assert [entry.reference_id for entry in journal.unresolved()] == [pending]
+    finally:
+        await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_recover(disbursements, open_journal):
+    journal = open_journal()
+    disbursements.use_journal(journal)
+    try:
+        #reached MTN, the client crashed before the answer
+        taken = get_reference_id()
+        await journal.intent(taken, 'disbursement', 'transfer', 'sandbox', BODY, SUBSCRIPTION_KEY)
+        disbursements.use_journal(None)
+        await disbursements.transfer(taken, None, 'sandbox', BODY)
+        disbursements.use_journal(journal)
+        #never reached MTN
+        lost, resent = get_reference_id(), get_reference_id()
+        await journal.intent(lost, 'disbursement', 'transfer', 'sandbox', BODY, SUBSCRIPTION_KEY)
+
+        assert await disbursements.recover() == {taken: ACCEPTED, lost: NOT_SENT}
+        assert journal.unresolved() == []
+
+        await journal.intent(resent, 'disbursement', 'transfer', 'sandbox', BODY, SUBSCRIPTION_KEY)
+        assert await disbursements.recover(resend=True) == {resent: ACCEPTED}
+        _, data = await disbursements.get_transfer_status(resent, None, 'sandbox')
+        assert data['status'] == 'SUCCESSFUL'
+    finally:
+        await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_recover_only_reads_the_calls_of_its_subscription_key(client, server, open_journal):
+    journal = open_journal()
+    tenant = client.disbursements(SUBSCRIPTION_KEY, APIUSER, APIKEY)
+    other = client.disbursements('other-subscription-key', APIUSER, APIKEY)
+    tenant.use_journal(journal)
+    other.use_journal(journal)
+    try:
+        ref = get_reference_id()
+        await tenant.transfer(ref, None, 'sandbox', BODY)
+        await journal.intent(ref, 'disbursement', 'transfer', 'sandbox', BODY, SUBSCRIPTION_KEY, APIUSER)
+        await journal.close()
+
+        #after a restart, the other account must neither read nor resend the call
+        journal = open_journal()
+        tenant.use_journal(journal)
+        other.use_journal(journal)
+        [entry] = journal.unresolved()
+        assert entry.belongs_to(SUBSCRIPTION_KEY, APIUSER) and not entry.belongs_to('other-subscription-key')
+        assert SUBSCRIPTION_KEY not in repr(entry.record())
+        assert await other.recover(resend=True) == {}
+        assert len(server.transactions) == 1
+        assert await tenant.recover() == {ref: ACCEPTED}
+    finally:
+        await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_is_recorded_as_not_sent(disbursements, tmp_path):
+    journal = FileJournal(str(tmp_path / 'journal.jsonl'))
+    disbursements.use_journal(journal)
+    http = disbursements.http
+    http.circuit_breakers = CircuitBreakers(failure_threshold=1)
+    route = disbursements.endpoints['transfer'].route(http.isLive, {}, None)
+    http.circuit_breakers.get(route).record_failure()
+
+    ref = get_reference_id()
+    try:
+        with pytest.raises(CircuitOpen):
+            await disbursements.transfer(ref, None, 'sandbox', BODY)
+        await journal.flush()
+        assert journal.unresolved() == []
+    finally:
+        await journal.close()
+
+    with open(journal.path, 'rb') as f:
+        assert f.read().splitlines()[-1].find(NOT_SENT.encode()) > 0
@@ -0,0 +1,36 @@
+import logging
+import threading
+
+from mobilemoney.log import configure_logging, logger, stop_logging
+
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+        self.written = threading.Event()
+
+    def emit(self, record):
+        self.threads.append(threading.current_thread())
+        self.written.set()
+
+
+def test_records_are_written_once_off_the_calling_thread():
+    root = Collect()
+    queued = Collect()
+    logging.getLogger().addHandler(root)
+    try:
+        configure_logging([queued], burst=None)
+        logger.info('hello')
+        assert queued.written.wait(1)
+        stop_logging()
+
+        assert root.threads == []
+        assert queued.threads[0] is not threading.current_thread()
+        assert logger.propagate
+
+        logger.warning('after')
+        assert root.threads == [threading.current_thread()]
+    finally:
+        logging.getLogger().removeHandler(root)
+        stop_logging()
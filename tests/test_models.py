@@ -0,0 +1,52 @@
+import pytest
+
+from mobilemoney.request.callback import CallbackReceiver
+from mobilemoney.request.models import TERMINAL_STATUSES, TransactionStatus
+from mobilemoney.request.poller import StatusPoller
+from mobilemoney.utils.utils import _to_json
+
+
+BODIES = [
+    #a nested field of the name asked for, before and without the top level one
+    b'{"payer": {"partyIdType": "MSISDN", "partyId": "46733123453"}, "partyId": "top"}',
+    b'{"payer": {"partyIdType": "MSISDN", "partyId": "46733123453"}, "status": "PENDING"}',
+    b'{"reason": {"code": "X", "status": "nested"}, "status": "FAILED"}',
+    #brackets and field names inside strings
+    b'{"payerMessage": "{\\"status\\": \\"fake\\"}", "status": "SUCCESSFUL"}',
+    b'{"payeeNote": "[{", "status": "SUCCESSFUL", "list": [{"status": "x"}]}',
+    #escaped top level value, the same field twice
+    b'{"status": "SUC\\u0043ESSFUL"}',
+    b'{"status": "PENDING", "status": "SUCCESSFUL"}',
+    b'[{"status": "SUCCESSFUL"}]',
+]
+
+
+@pytest.mark.parametrize('raw', BODIES)
+@pytest.mark.parametrize('name', ['status', 'partyId', 'missing'])
+def test_fields_agree_with_the_decoded_body(raw, name):
+    decoded = TransactionStatus(raw).to_dict()
+
+    assert TransactionStatus(raw).get(name) == decoded.get(name)
+    assert (name in TransactionStatus(raw)) == (name in decoded)
+    if name not in decoded:
+        with pytest.raises(KeyError):
+            TransactionStatus(raw)[name]
+
+
+def test_nested_party_id_is_not_a_top_level_key():
+    status = TransactionStatus(b'{"payer": {"partyIdType": "MSISDN", "partyId": "46733123453"}, "status": "PENDING"}')
+
+    #read without decoding the body
+    assert status.status == 'PENDING' and status._data is None
+    assert status.get('partyId') is None
+    assert 'partyId' not in status
+    assert status.party == {'partyIdType': 'MSISDN', 'partyId': '46733123453'}
+
+
+def test_one_set_of_terminal_statuses():
+    assert TransactionStatus.FINAL is TERMINAL_STATUSES
+    assert StatusPoller(None).terminal is TERMINAL_STATUSES
+    assert CallbackReceiver('http://localhost:8080').terminal is TERMINAL_STATUSES
+    for status in TERMINAL_STATUSES:
+        assert TransactionStatus(_to_json({'status': status})).final
+    assert not TransactionStatus(b'{"status": "PENDING"}').final
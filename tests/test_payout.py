@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from mobilemoney.request.payout import row_to_body
+
+
+def write_payroll(path, rows=3):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('externalId,amount,currency,msisdn\n')
+        for i in range(rows):
+            f.write(f'EMP-{i},100,EUR,+2376{i:08d}\n')
+
+
+def test_msisdn_plus_is_removed():
+    _, body = row_to_body({'amount': '5', 'currency': 'EUR', 'msisdn': '+237600000000'}, 0)
+    assert body['payee']['partyId'] == '237600000000'
+
+
+def test_reference_ids_are_scoped_to_the_run():
+    row = {'amount': '5', 'currency': 'EUR', 'msisdn': '237600000000', 'externalId': 'EMP-1'}
+    assert row_to_body(row, 0, run_id='2026-09')[0] == row_to_body(row, 4, run_id='2026-09')[0]
+    assert row_to_body(row, 0, run_id='2026-09')[0] != row_to_body(row, 0, run_id='2026-10')[0]
+    assert row_to_body(row, 0, 'september.csv')[0] != row_to_body(row, 0, 'october.csv')[0]
+
+
+@pytest.mark.asyncio
+async def test_same_external_id_is_paid_by_every_run(disbursements, tmp_path):
+    source = tmp_path / 'payroll.csv'
+    write_payroll(source)
+
+    september = await disbursements.payout_file(str(source), str(tmp_path / 'out.jsonl'), 'sandbox', run_id='2026-09')
+    october = await disbursements.payout_file(str(source), str(tmp_path / 'out.jsonl'), 'sandbox', run_id='2026-10')
+
+    assert (september.sent, september.invalid) == (3, 0)
+    assert (october.sent, october.conflicts) == (3, 0)
+
+
+@pytest.mark.asyncio
+async def test_conflicts_are_not_counted_as_sent(disbursements, tmp_path):
+    source = tmp_path / 'payroll.csv'
+    output = tmp_path / 'out.jsonl'
+    write_payroll(source)
+
+    await disbursements.payout_file(str(source), str(output), 'sandbox')
+    again = await disbursements.payout_file(str(source), str(output), 'sandbox')
+
+    assert (again.sent, again.conflicts, again.failed) == (0, 3, 0)
+    results = [json.loads(line) for line in output.read_text().splitlines()][3:]
+    assert all(result['status'] == 409 and not result['ok'] for result in results)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('bad', ['{"amount": "100", "currency": ', '[1, 2]', '"EMP-4"'])
+async def test_bad_jsonl_lines_only_fail_their_row(disbursements, tmp_path, bad):
+    source = tmp_path / 'payroll.jsonl'
+    output = tmp_path / 'out.jsonl'
+    checkpoint = tmp_path / 'payroll.checkpoint'
+    lines = [json.dumps({'externalId': f'EMP-{i}', 'amount': '100', 'currency': 'EUR', 'msisdn': f'2376{i:08d}'}) for i in range(20)]
+    lines[4] = bad
+    source.write_text('\n'.join(lines) + '\n')
+
+    summary = await disbursements.payout_file(str(source), str(output), 'sandbox', checkpoint=str(checkpoint))
+
+    assert (summary.sent, summary.invalid, summary.failed) == (19, 1, 0)
+    results = {result['index']: result for result in map(json.loads, output.read_text().splitlines())}
+    assert len(results) == 20
+    assert results[4]['reference_id'] is None and not results[4]['ok'] and results[4]['error']
+    assert json.loads(checkpoint.read_text())['position'] == 20
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from mobilemoney.request.poller import StatusPoller
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_the_polls_in_flight():
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def fetch(reference_id):
+        started.set()
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return True, {'status': 'SUCCESSFUL'}
+
+    poller = StatusPoller(fetch, initial_delay=0, jitter=0)
+    future = poller.track('ref')
+    await asyncio.wait_for(started.wait(), 1)
+
+    await poller.close()
+
+    assert cancelled.is_set()
+    assert future.cancelled()
@@ -0,0 +1,35 @@
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from mobilemoney.request.http import HTTPClient
+from mobilemoney.request.ratelimit import RateLimiter
+
+HEADERS = {'Ocp-Apim-Subscription-Key': 'key', 'Authorization': 'Bearer token', 'X-Target-Environment': 'sandbox'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('limits', [None, {'collection': (1, 1)}])
+async def test_retry_after_is_waited_once(limits):
+    calls = []
+
+    async def balance(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return web.Response(status=429, headers={'Retry-After': '0.4'})
+        return web.json_response({'availableBalance': '1', 'currency': 'EUR'})
+
+    app = web.Application()
+    app.router.add_get('/collection/v1_0/account/balance', balance)
+    async with TestServer(app) as server:
+        http = HTTPClient(base_url=str(server.make_url('')), rate_limiter=RateLimiter(limits))
+        http.is_sandbox()
+        try:
+            response = await http.request(http.endpoints['collection']['get_account_balance'].route(False, HEADERS))
+        finally:
+            await http.close()
+
+    assert response.status == 200
+    assert 0.35 < calls[1] - calls[0] < 0.7
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from mobilemoney import ClientRegistry
+
+from conftest import APIKEY, APIUSER
+
+
+@pytest.mark.asyncio
+async def test_eviction_stops_the_token_refresh(server):
+    async with ClientRegistry(max_size=1, base_url=server.url) as registry:
+        first = registry.collection('key-1', apiuser=APIUSER, apikey=APIKEY)
+        refresh = asyncio.ensure_future(first.token.refresh())
+        await asyncio.sleep(0)
+
+        registry.collection('key-2', apiuser=APIUSER, apikey=APIKEY)
+        assert ('collection', 'key-1', 'sandbox') not in registry
+
+        #callers already waiting fetch the token themselves
+        assert (await refresh).startswith('Bearer ')
+        tokens = server.requests['collection.create_access_token']
+
+        #no background refresh starts for the evicted tenant
+        first.token._AccessTokenManager__refresh_at = 0.0
+        await first.token.get()
+        await asyncio.sleep(0.05)
+        assert server.requests['collection.create_access_token'] == tokens
+
+
+@pytest.mark.asyncio
+async def test_eviction_forgets_the_rate_limiter_buckets(server):
+    async with ClientRegistry(max_size=2, base_url=server.url) as registry:
+        for i in range(20):
+            client = registry.collection(f'key-{i}', apiuser=APIUSER, apikey=APIKEY)
+            await client.get_account_balance(None, 'sandbox')
+
+        assert len(registry) == 2
+        #one product bucket per live subscription key, not per key ever seen
+        assert len(registry.rate_limiter) == 2
+
+        #pushes key-18 out, key-19 is now used by two clients
+        registry.disbursements('key-19')
+        assert len(registry.rate_limiter) == 1
+        assert registry.evict('collection', 'key-19')
+        assert len(registry.rate_limiter) == 1
+        assert registry.evict('disbursement', 'key-19')
+        assert len(registry.rate_limiter) == 0
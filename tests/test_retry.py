@@ -0,0 +1,75 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from mobilemoney.errors.errors import Conflict
+from mobilemoney.request.disbursements import Disbursements
+from mobilemoney.request.http import HTTPClient
+from mobilemoney.request.retry import RetryPolicy
+from mobilemoney.utils.utils import get_reference_id
+
+BEARER = 'Bearer token'
+BODY = {'amount': '10', 'currency': 'EUR', 'externalId': 'INV-1', 'payee': {'partyIdType': 'MSISDN', 'partyId': '46733123459'}}
+
+
+def scripted(statuses):
+    calls = []
+
+    async def handle(request):
+        calls.append(request.headers.get('X-Reference-Id'))
+        return web.json_response({'code': 'ERROR', 'message': 'scripted'}, status=statuses[min(len(calls), len(statuses)) - 1])
+
+    return calls, handle
+
+
+async def transfer_with(statuses):
+    calls, handle = scripted(statuses)
+    app = web.Application()
+    app.router.add_post('/disbursement/v1_0/transfer', handle)
+    async with TestServer(app) as server:
+        http = HTTPClient(base_url=str(server.make_url('')), retry_policy=RetryPolicy(base_delay=0.01))
+        http.is_sandbox()
+        try:
+            result = await Disbursements(http, 'key').transfer(get_reference_id(), BEARER, 'sandbox', BODY)
+        finally:
+            await http.close()
+    return calls, result
+
+
+@pytest.mark.asyncio
+async def test_409_after_a_failed_attempt_is_accepted():
+    calls, result = await transfer_with([500, 409])
+
+    assert result[0] is True
+    assert len(calls) == 2 and calls[0] == calls[1]
+
+
+@pytest.mark.asyncio
+async def test_409_on_the_first_attempt_raises():
+    with pytest.raises(Conflict):
+        await transfer_with([409])
+
+
+@pytest.mark.asyncio
+async def test_post_without_reference_id_is_not_retried():
+    calls, handle = scripted([500, 201])
+    app = web.Application()
+    app.router.add_post('/v1_0/apiuser/{apiuser}/apikey', handle)
+    async with TestServer(app) as server:
+        http = HTTPClient(base_url=str(server.make_url('')), retry_policy=RetryPolicy(base_delay=0.01))
+        http.is_sandbox()
+        try:
+            route = http.endpoints.provisioning['create_apikey'].route(False, {'Ocp-Apim-Subscription-Key': 'key'}, params={'apiuser': get_reference_id()})
+            response = await http.request(route)
+        finally:
+            await http.close()
+
+    assert response.status == 500
+    assert calls == [None]
+
+
+@pytest.mark.asyncio
+async def test_409_after_a_429_raises():
+    #MTN refused the first attempt without taking it, the reference id belongs to another call
+    with pytest.raises(Conflict):
+        await transfer_with([429, 409])
@@ -0,0 +1,37 @@
+import socket
+
+from mobilemoney import SyncClient
+from mobilemoney.mock import MockServer
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def body(i):
+    return {
+        'amount': '10', 'currency': 'EUR', 'externalId': f'INV-{i}',
+        'payer': {'partyIdType': 'MSISDN', 'partyId': '46733123459'}, 'payerMessage': '', 'payeeNote': ''
+    }
+
+
+def test_async_generators_are_iterated_on_the_loop():
+    server = MockServer(port=free_port())
+    with SyncClient(base_url=f'http://127.0.0.1:{server.port}') as sync:
+        #the mock runs on the loop of the client
+        sync.run(server.start())
+        try:
+            sync.is_sandbox()
+            collection = sync.collection('key', 'user', 'secret')
+
+            results = list(collection.iter_request_to_pay([body(i) for i in range(5)], 'sandbox'))
+            assert sorted(result.index for result in results) == list(range(5))
+            assert all(result.ok for result in results)
+
+            #leaving early closes the async generator on the loop
+            for result in collection.iter_request_to_pay([body(i) for i in range(5, 10)], 'sandbox'):
+                break
+        finally:
+            sync.run(server.stop())
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from mobilemoney.request.token import AccessTokenManager
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_refreshed_once(collection, server):
+    await collection.get_account_balance(None, 'sandbox')
+    server.tokens.clear()
+
+    _, balance = await collection.get_account_balance(None, 'sandbox')
+
+    assert 'availableBalance' in balance
+    assert server.requests['collection.create_access_token'] == 2
+
+
+@pytest.mark.asyncio
+async def test_given_token_is_not_replaced(collection, server):
+    from mobilemoney.errors.errors import Unauthorized
+
+    with pytest.raises(Unauthorized):
+        await collection.get_account_balance('Bearer revoked', 'sandbox')
+    assert server.requests['collection.create_access_token'] == 0
+
+
+@pytest.mark.asyncio
+async def test_reset_detaches_the_refresh_in_flight():
+    credentials = ['old']
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fetch():
+        used = credentials[0]
+        started.set()
+        if used == 'old':
+            await release.wait()
+        return True, {'access_token': used, 'expires_in': 3600}
+
+    manager = AccessTokenManager(fetch)
+    first = asyncio.ensure_future(manager.get())
+    await started.wait()
+
+    credentials[0] = 'new'
+    manager.reset()
+    assert await manager.get() == 'Bearer new'
+
+    release.set()
+    #callers already waiting get the old answer, it is not cached
+    assert await first == 'Bearer old'
+    assert manager.bearer == 'Bearer new'
+
+
+def test_invalidate_keeps_a_newer_token():
+    manager = AccessTokenManager(None)  # type: ignore
+    manager._AccessTokenManager__bearer = 'Bearer new'
+    manager._AccessTokenManager__expires_at = float('inf')
+
+    manager.invalidate('Bearer old')
+    assert manager.bearer == 'Bearer new'
+    manager.invalidate('Bearer new')
+    assert manager.bearer is None
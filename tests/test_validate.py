@@ -0,0 +1,65 @@
+import pytest
+
+from mobilemoney.request.validate import PaymentValidator, validate_payments
+from mobilemoney.utils.utils import get_reference_id
+
+
+def transfer(**changes):
+    body = {'amount': '10', 'currency': 'EUR', 'externalId': 'INV-1',
+        'payee': {'partyIdType': 'MSISDN', 'partyId': '46733123459'}, 'payerMessage': '', 'payeeNote': ''}
+    body.update(changes)
+    return body
+
+
+def refund(**changes):
+    body = {'amount': '10', 'currency': 'EUR', 'externalId': 'INV-1', 'payerMessage': '', 'payeeNote': '',
+        'referenceIdToRefund': get_reference_id()}
+    body.update(changes)
+    return body
+
+
+def fields(problems):
+    return [field for field, _ in problems]
+
+
+def test_a_valid_body_has_no_problem():
+    assert PaymentValidator('transfer').check(transfer(), get_reference_id()) == []
+
+
+def test_every_problem_is_reported():
+    body = transfer(amount='0', currency='eur', payee={'partyIdType': 'MSISDN', 'partyId': '+4673'}, payeeNote='x' * 161)
+
+    assert fields(PaymentValidator('transfer').check(body, 'not-a-uuid')) == [
+        'referenceId', 'amount', 'currency', 'payee.partyId', 'payeeNote'
+    ]
+
+
+@pytest.mark.parametrize('route, party', [('request_to_pay', 'payer'), ('withdraw', 'payer'), ('deposit', 'payee')])
+def test_the_party_of_the_route_is_required(route, party):
+    assert fields(PaymentValidator(route).check(transfer(payee=None))) == [party]
+
+
+def test_refunds_have_no_party():
+    assert PaymentValidator('refund').check(refund()) == []
+    assert fields(PaymentValidator('refund').check(refund(referenceIdToRefund='INV-0'))) == ['referenceIdToRefund']
+
+
+def test_refund_batch_is_valid():
+    report = validate_payments([refund() for _ in range(3)], 'refund')
+
+    assert report.ok and len(report.items) == 3
+
+
+def test_batch_report_keeps_the_valid_rows_and_the_index_of_the_others():
+    ref = get_reference_id()
+    items = [(ref, transfer()), (ref, transfer()), transfer(currency='EURO'), transfer()]
+
+    report = validate_payments(items, 'transfer', currencies={'EUR'})
+
+    assert [index for index, _ in report.valid] == [0, 3]
+    assert [(row['index'], row['field']) for row in report.rows()] == [(1, 'referenceId'), (2, 'currency')]
+
+
+def test_unknown_route():
+    with pytest.raises(ValueError):
+        PaymentValidator('payout')